@@ -1,8 +1,10 @@
 import os
 import random
 import string
+import threading
 import time
 import uuid
+from contextlib import contextmanager
 from time import monotonic
 
 from celery import current_task
@@ -17,6 +19,7 @@ from flask import (
 )
 from flask_marshmallow import Marshmallow
 from flask_migrate import Migrate
+from flask_sqlalchemy import SignallingSession
 from flask_sqlalchemy import SQLAlchemy as _SQLAlchemy
 from gds_metrics import GDSMetrics
 from gds_metrics.metrics import Gauge, Histogram
@@ -25,7 +28,7 @@ from notifications_utils.clients.encryption.encryption_client import Encryption
 from notifications_utils.clients.redis.redis_client import RedisClient
 from notifications_utils.clients.statsd.statsd_client import StatsdClient
 from notifications_utils.clients.zendesk.zendesk_client import ZendeskClient
-from sqlalchemy import event
+from sqlalchemy import event, orm, text
 from werkzeug.exceptions import HTTPException as WerkzeugHTTPException
 from werkzeug.local import LocalProxy
 
@@ -38,9 +41,44 @@ from app.clients.email.aws_ses_stub import AwsSesStubClient
 from app.clients.sms.firetext import FiretextClient
 from app.clients.sms.mmg import MMGClient
 
+REPLICA_BIND = 'replica'
+
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class RoutingSession(SignallingSession):
+    """
+    Sends queries to the read replica while `db.reading_from_replica()` is in effect. Flushes always go to the
+    primary, so autoflushing changes made before a replica safe read still works.
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if self.db.is_reading_from_replica() and not self._flushing:
+            return self.db.get_engine(self.app, bind=REPLICA_BIND)
+        return super().get_bind(mapper, clause)
+
 
 class SQLAlchemy(_SQLAlchemy):
-    """We need to subclass SQLAlchemy in order to override create_engine options"""
+    """
+    We need to subclass SQLAlchemy in order to override create_engine options, and to route replica safe reads to
+    the read replica set up in SQLALCHEMY_BINDS.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica_context = threading.local()
+        self.replica_lag_checked_at = None
+        self.replica_is_usable = False
 
     def apply_driver_hacks(self, app, info, options):
         super().apply_driver_hacks(app, info, options)
@@ -50,6 +88,51 @@ class SQLAlchemy(_SQLAlchemy):
             int(app.config['SQLALCHEMY_STATEMENT_TIMEOUT']) * 1000
         )
 
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def is_reading_from_replica(self):
+        return getattr(self.replica_context, 'active', False)
+
+    @contextmanager
+    def reading_from_replica(self):
+        """
+        Sends queries made inside the block to the read replica, if there is one and it isn't too far behind the
+        primary. Otherwise they go to the primary as usual.
+
+        Only use this for reads that can be a few seconds out of date and don't need to see changes made earlier in
+        the same transaction.
+        """
+        previous = self.is_reading_from_replica()
+        self.replica_context.active = previous or self._check_replica()
+        try:
+            yield
+        finally:
+            self.replica_context.active = previous
+
+    def _check_replica(self):
+        app = self.get_app()
+        if not app.config['SQLALCHEMY_BINDS'] or REPLICA_BIND not in app.config['SQLALCHEMY_BINDS']:
+            return False
+
+        now = time.monotonic()
+        if (
+            self.replica_lag_checked_at is None or
+            now - self.replica_lag_checked_at >= app.config['SQLALCHEMY_REPLICA_LAG_CHECK_INTERVAL']
+        ):
+            self.replica_lag_checked_at = now
+            try:
+                with self.get_engine(app, bind=REPLICA_BIND).connect() as connection:
+                    lag = connection.execute(REPLICA_LAG_QUERY).scalar()
+            except Exception:
+                app.logger.exception('Could not check read replica lag, reading from the primary')
+                lag = None
+            self.replica_is_usable = lag is not None and lag <= app.config['SQLALCHEMY_REPLICA_MAX_LAG']
+            if lag is not None and not self.replica_is_usable:
+                app.logger.warning('Read replica is {} seconds behind, reading from the primary'.format(lag))
+
+        return self.replica_is_usable
+
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -120,6 +203,8 @@ def create_app(application):
     register_blueprint(application)
     register_v2_blueprints(application)
 
+    init_schema_validation(application)
+
     # avoid circular imports by importing this file later
     from app.commands import setup_commands
     setup_commands(application)
@@ -130,6 +215,17 @@ def create_app(application):
     return application
 
 
+def init_schema_validation(application):
+    from app import schema_validation
+    from app.v2.notifications.notification_schemas import (
+        post_email_request,
+        post_letter_request,
+        post_sms_request,
+    )
+
+    schema_validation.init_app(application, schemas=[post_sms_request, post_email_request, post_letter_request])
+
+
 def register_blueprint(application):
     from app.authentication.auth import (
         requires_admin_auth,
@@ -56,6 +56,11 @@ def get_job_from_s3(service_id, job_id):
     return obj.get()['Body'].read().decode('utf-8')
 
 
+def get_job_byte_range_from_s3(service_id, job_id, first_byte, last_byte):
+    obj = get_s3_object(*get_job_location(service_id, job_id))
+    return obj.get(Range='bytes={}-{}'.format(first_byte, last_byte))['Body'].read().decode('utf-8')
+
+
 def get_job_metadata_from_s3(service_id, job_id):
     obj = get_s3_object(*get_job_location(service_id, job_id))
     return obj.get()['Metadata']
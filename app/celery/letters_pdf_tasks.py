@@ -25,9 +25,9 @@ from app.dao.templates_dao import dao_get_template_by_id
 from app.errors import VirusScanError
 from app.exceptions import NotificationTechnicalFailureException
 from app.letters.utils import (
+    LetterPDFIndex,
     LetterPDFNotFound,
     ScanErrorType,
-    find_letter_pdf_in_s3,
     generate_letter_pdf_filename,
     get_billable_units_for_letter_page_count,
     get_file_names_from_error_bucket,
@@ -135,9 +135,14 @@ def collate_letter_pdfs_to_be_sent():
     )
     _get_letters_and_sheets_volumes_and_send_to_dvla(print_run_deadline)
 
+    # shared between postage classes as they are all stored in the same daily folders
+    letter_pdf_index = LetterPDFIndex(current_app.config['LETTERS_PDF_BUCKET_NAME'])
+
     for postage in POSTAGE_TYPES:
         current_app.logger.info(f"starting collate-letter-pdfs-to-be-sent processing for postage class {postage}")
-        letters_to_print = get_key_and_size_of_letters_to_be_sent_to_print(print_run_deadline, postage)
+        letters_to_print = get_key_and_size_of_letters_to_be_sent_to_print(
+            print_run_deadline, postage, letter_pdf_index=letter_pdf_index
+        )
 
         for i, letters in enumerate(group_letters(letters_to_print)):
             filenames = [letter['Key'] for letter in letters]
@@ -228,14 +233,17 @@ def send_letters_volume_email_to_dvla(letters_volumes, date):
         send_notification_to_queue(saved_notification, False, queue=QueueNames.NOTIFY)
 
 
-def get_key_and_size_of_letters_to_be_sent_to_print(print_run_deadline, postage):
+def get_key_and_size_of_letters_to_be_sent_to_print(print_run_deadline, postage, letter_pdf_index=None):
+    if letter_pdf_index is None:
+        letter_pdf_index = LetterPDFIndex(current_app.config['LETTERS_PDF_BUCKET_NAME'])
+
     letters_awaiting_sending = dao_get_letters_to_be_printed(print_run_deadline, postage)
     for letter in letters_awaiting_sending:
         try:
-            letter_pdf = find_letter_pdf_in_s3(letter)
+            key, size = letter_pdf_index.find(letter.reference, letter.created_at)
             yield {
-                "Key": letter_pdf.key,
-                "Size": letter_pdf.size,
+                "Key": key,
+                "Size": size,
                 "ServiceId": str(letter.service_id)
             }
         except (BotoClientError, LetterPDFNotFound) as e:
@@ -18,6 +18,7 @@ from app.dao.inbound_sms_dao import delete_inbound_sms_older_than_retention
 from app.dao.jobs_dao import (
     dao_archive_job,
     dao_get_jobs_older_than_data_retention,
+    dao_mark_job_statistics_stale,
 )
 from app.dao.notifications_dao import (
     dao_get_notifications_processing_time_stats,
@@ -33,10 +34,12 @@ from app.models import (
     KEY_TYPE_NORMAL,
     LETTER_TYPE,
     NOTIFICATION_SENDING,
+    NOTIFICATION_TECHNICAL_FAILURE,
     SMS_TYPE,
     FactProcessingTime,
     Notification,
 )
+from app.performance_dashboard.cache import performance_dashboard_changed
 from app.utils import get_london_midnight_in_utc
 
 
@@ -127,24 +130,39 @@ def delete_letter_notifications_older_than_retention():
 @notify_celery.task(name='timeout-sending-notifications')
 @cronitor('timeout-sending-notifications')
 def timeout_notifications():
-    technical_failure_notifications, temporary_failure_notifications = \
-        dao_timeout_notifications(current_app.config.get('SENDING_NOTIFICATIONS_TIMEOUT_PERIOD'))
+    service_callback_apis = {}
+    technical_failure_notification_ids = []
+    timed_out_job_ids = set()
+    timed_out_count = 0
+
+    for notification in dao_timeout_notifications(current_app.config.get('SENDING_NOTIFICATIONS_TIMEOUT_PERIOD')):
+        timed_out_count += 1
+        if notification.status == NOTIFICATION_TECHNICAL_FAILURE:
+            technical_failure_notification_ids.append(str(notification.id))
+        if notification.job_id:
+            timed_out_job_ids.add(notification.job_id)
+
+        # timeouts often come in bulk for a handful of services, so only look up each service's callback once
+        if notification.service_id not in service_callback_apis:
+            service_callback_apis[notification.service_id] = get_service_delivery_status_callback_api_for_service(
+                service_id=notification.service_id
+            )
+        service_callback_api = service_callback_apis[notification.service_id]
 
-    notifications = technical_failure_notifications + temporary_failure_notifications
-    for notification in notifications:
         # queue callback task only if the service_callback_api exists
-        service_callback_api = get_service_delivery_status_callback_api_for_service(service_id=notification.service_id)
         if service_callback_api:
             encrypted_notification = create_delivery_status_callback_data(notification, service_callback_api)
             send_delivery_status_to_service.apply_async([str(notification.id), encrypted_notification],
                                                         queue=QueueNames.CALLBACKS)
 
+    # the jobs may have been started before the statistics were last reconciled, so make sure they are reconciled
+    dao_mark_job_statistics_stale(timed_out_job_ids)
     current_app.logger.info(
-        "Timeout period reached for {} notifications, status has been updated.".format(len(notifications)))
-    if technical_failure_notifications:
+        "Timeout period reached for {} notifications, status has been updated.".format(timed_out_count))
+    if technical_failure_notification_ids:
         message = "{} notifications have been updated to technical-failure because they " \
                   "have timed out and are still in created.Notification ids: {}".format(
-                      len(technical_failure_notifications), [str(x.id) for x in technical_failure_notifications])
+                      len(technical_failure_notification_ids), technical_failure_notification_ids)
         raise NotificationTechnicalFailureException(message)
 
 
@@ -283,3 +301,4 @@ def save_daily_notification_processing_time(bst_date=None):
             messages_within_10_secs=result.messages_within_10_secs
         )
     )
+    performance_dashboard_changed()
@@ -9,6 +9,7 @@ from app import notify_celery, statsd_client
 from app.clients.email.aws_ses import get_aws_responses
 from app.config import QueueNames
 from app.dao import notifications_dao
+from app.dao.jobs_dao import dao_record_job_notification_status_change
 from app.models import NOTIFICATION_PENDING, NOTIFICATION_SENDING
 from app.notifications.notifications_ses_callback import (
     _check_and_queue_callback_task,
@@ -62,10 +63,14 @@ def process_ses_results(self, response):
             )
             return
         else:
+            # the update commits, which expires the notification's old status
+            old_status = notification.status
             notifications_dao.dao_update_notifications_by_reference(
                 references=[reference],
                 update_dict={'status': notification_status}
             )
+            if notification.job_id:
+                dao_record_job_notification_status_change(notification.job_id, old_status, notification_status)
 
         statsd_client.incr('callback.ses.{}'.format(notification_status))
 
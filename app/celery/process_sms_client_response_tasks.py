@@ -2,7 +2,6 @@ import uuid
 from datetime import datetime
 
 from flask import current_app
-from notifications_utils.template import SMSMessageTemplate
 
 from app import notify_celery, statsd_client
 from app.celery.service_callback_tasks import (
@@ -18,7 +17,18 @@ from app.dao.service_callback_api_dao import (
     get_service_delivery_status_callback_api_for_service,
 )
 from app.dao.templates_dao import dao_get_template_by_id
-from app.models import NOTIFICATION_PENDING
+from app.delivery.sms_delivery_latency import (
+    record_sms_delivered,
+    record_sms_failed,
+)
+from app.delivery.template_cache import sms_fragment_count
+from app.models import (
+    KEY_TYPE_TEST,
+    NOTIFICATION_DELIVERED,
+    NOTIFICATION_PENDING,
+    NOTIFICATION_STATUS_TYPES_FAILED,
+)
+from app.serialised_models import SerialisedService
 
 sms_response_mapper = {
     'MMG': get_mmg_responses,
@@ -79,18 +89,26 @@ def _process_for_status(notification_status, client_name, provider_reference, de
             datetime.utcnow(),
             notification.sent_at
         )
+        # test key and research mode notifications get fake receipts and weren't counted when they were sent
+        if (
+            notification.key_type != KEY_TYPE_TEST and
+            not SerialisedService.from_id(notification.service_id).research_mode
+        ):
+            if notification_status == NOTIFICATION_DELIVERED:
+                record_sms_delivered(client_name.lower(), notification.sent_at, datetime.utcnow())
+            elif notification_status in NOTIFICATION_STATUS_TYPES_FAILED:
+                record_sms_failed(client_name.lower(), notification.sent_at)
 
     if notification.billable_units == 0:
         service = notification.service
         template_model = dao_get_template_by_id(notification.template_id, notification.template_version)
 
-        template = SMSMessageTemplate(
+        notification.billable_units = sms_fragment_count(
             template_model.__dict__,
-            values=notification.personalisation,
+            notification.personalisation,
             prefix=service.name,
             show_prefix=service.prefix_sms,
         )
-        notification.billable_units = template.fragment_count
         notifications_dao.dao_update_notification(notification)
 
     if notification_status != NOTIFICATION_PENDING:
@@ -3,18 +3,32 @@ from datetime import datetime, timedelta
 from flask import current_app
 from notifications_utils.timezones import convert_utc_to_bst
 
-from app import notify_celery
+from app import notify_celery, redis_store
 from app.config import QueueNames
 from app.cronitor import cronitor
 from app.dao.fact_billing_dao import (
     fetch_billing_data_for_day,
+    get_rates_for_billing,
     update_fact_billing,
 )
+from app.dao.fact_monthly_snapshot_dao import (
+    next_month,
+    update_monthly_snapshot,
+)
 from app.dao.fact_notification_status_dao import (
+    delete_fact_template_usage_intraday_older_than,
     fetch_notification_status_for_day,
     update_fact_notification_status,
+    update_fact_template_usage_intraday,
 )
 from app.models import EMAIL_TYPE, LETTER_TYPE, SMS_TYPE
+from app.performance_dashboard.cache import performance_dashboard_changed
+from app.utils import DATETIME_FORMAT
+
+INTRADAY_TEMPLATE_USAGE_WATERMARK_CACHE_KEY = 'intraday-template-usage-watermark'
+# a notification can be committed a little after its created_at or updated_at, so look back past the last run by this
+# much to catch anything that wasn't visible yet when it ran
+INTRADAY_TEMPLATE_USAGE_OVERLAP = timedelta(minutes=1)
 
 
 @notify_celery.task(name="create-nightly-billing")
@@ -55,8 +69,9 @@ def create_nightly_billing_for_day(process_day):
         f'create-nightly-billing-for-day task for {process_day}: data fetched in {(end - start).seconds} seconds'
     )
 
+    rates = get_rates_for_billing()
     for data in transit_data:
-        update_fact_billing(data, process_day)
+        update_fact_billing(data, process_day, rates=rates)
 
     current_app.logger.info(
         f"create-nightly-billing-for-day task for {process_day}: "
@@ -64,6 +79,50 @@ def create_nightly_billing_for_day(process_day):
     )
 
 
+@notify_celery.task(name="create-intraday-billing")
+def create_intraday_billing():
+    """
+    Keeps today's rows in ft_billing up to date, so the usage endpoints can read ft_billing on its own rather than
+    working out today's usage on every request.
+    """
+    today = convert_utc_to_bst(datetime.utcnow()).date()
+
+    start = datetime.utcnow()
+    transit_data = fetch_billing_data_for_day(process_day=today)
+    rates = get_rates_for_billing()
+    for data in transit_data:
+        update_fact_billing(data, today, rates=rates)
+
+    current_app.logger.info(
+        f"create-intraday-billing task for {today}: {len(transit_data)} rows updated in "
+        f"{(datetime.utcnow() - start).seconds} seconds"
+    )
+
+
+@notify_celery.task(name="update-intraday-template-usage")
+def update_intraday_template_usage():
+    """
+    Keeps today's rows in ft_template_usage_intraday up to date, so the template usage endpoints don't have to count
+    today's notifications on every request. Only the hours with notifications created or updated since the last run
+    are counted again. If there's no record of the last run, the whole day is.
+    """
+    start = datetime.utcnow()
+
+    watermark = redis_store.get(INTRADAY_TEMPLATE_USAGE_WATERMARK_CACHE_KEY)
+    if isinstance(watermark, bytes):
+        watermark = watermark.decode('utf-8')
+    since = datetime.strptime(watermark, DATETIME_FORMAT) - INTRADAY_TEMPLATE_USAGE_OVERLAP if watermark else None
+
+    update_fact_template_usage_intraday(since)
+    delete_fact_template_usage_intraday_older_than(convert_utc_to_bst(start).date() - timedelta(days=1))
+
+    redis_store.set(
+        INTRADAY_TEMPLATE_USAGE_WATERMARK_CACHE_KEY,
+        start.strftime(DATETIME_FORMAT),
+        ex=int(timedelta(days=1).total_seconds())
+    )
+
+
 @notify_celery.task(name="create-nightly-notification-status")
 @cronitor("create-nightly-notification-status")
 def create_nightly_notification_status():
@@ -111,8 +170,27 @@ def create_nightly_notification_status_for_day(process_day, notification_type):
     )
 
     update_fact_notification_status(transit_data, process_day, notification_type)
+    performance_dashboard_changed()
 
     current_app.logger.info(
         f'create-nightly-notification-status-for-day task for {process_day} type {notification_type}: '
         f'task complete - {len(transit_data)} rows updated'
     )
+
+
+@notify_celery.task(name="create-monthly-fact-snapshots")
+def create_monthly_fact_snapshots():
+    """
+    Rebuilds the monthly snapshots the platform wide reports read for any month that has finished and had a day
+    reprocessed by the nightly tasks. Letter statuses are reprocessed for the last 10 days, the longest of any.
+    """
+    yesterday = convert_utc_to_bst(datetime.utcnow()).date() - timedelta(days=1)
+    months = {
+        process_day.replace(day=1)
+        for process_day in (yesterday - timedelta(days=i) for i in range(10))
+        if next_month(process_day) <= yesterday + timedelta(days=1)
+    }
+
+    for month in sorted(months):
+        update_monthly_snapshot(month)
+        current_app.logger.info(f"create-monthly-fact-snapshots task: snapshot updated for {month:%Y-%m}")
@@ -4,7 +4,7 @@ from flask import current_app
 from sqlalchemy import between
 from sqlalchemy.exc import SQLAlchemyError
 
-from app import notify_celery, zendesk_client
+from app import db, notify_celery, zendesk_client
 from app.celery.broadcast_message_tasks import trigger_link_test
 from app.celery.letters_pdf_tasks import get_pdf_for_templated_letter
 from app.celery.tasks import (
@@ -21,10 +21,13 @@ from app.dao.invited_user_dao import (
     delete_invitations_created_more_than_two_days_ago,
 )
 from app.dao.jobs_dao import (
+    dao_get_jobs_to_reconcile,
+    dao_mark_job_statistics_stale,
+    dao_reconcile_job_statistics,
     dao_set_scheduled_jobs_to_pending,
     dao_update_job,
     find_jobs_with_missing_rows,
-    find_missing_row_for_job,
+    find_missing_rows_for_job,
 )
 from app.dao.notifications_dao import (
     dao_old_letters_with_created_status,
@@ -42,6 +45,8 @@ from app.dao.services_dao import (
     dao_find_services_with_high_failure_rates,
 )
 from app.dao.users_dao import delete_codes_older_created_more_than_a_day_ago
+from app.delivery import sms_delivery_latency
+from app.delivery.provider_routing import provider_routing_table
 from app.models import (
     EMAIL_TYPE,
     JOB_STATUS_ERROR,
@@ -50,7 +55,9 @@ from app.models import (
     SMS_TYPE,
     Job,
 )
-from app.notifications.process_notifications import send_notification_to_queue
+from app.notifications.process_notifications import (
+    send_notification_to_queue_detached,
+)
 
 
 @notify_celery.task(name="run-scheduled-jobs")
@@ -98,11 +105,19 @@ def switch_current_sms_provider_on_slow_delivery():
     in the last ten minutes. If both providers are slow, don't do anything. If we changed the providers in the
     last ten minutes, then don't update them again either.
     """
-    slow_delivery_notifications = is_delivery_slow_for_providers(
+    slow_delivery_notifications = sms_delivery_latency.is_delivery_slow_for_providers(
+        providers=[provider.identifier for provider in provider_routing_table.get_active_providers(SMS_TYPE)],
         threshold=0.3,
-        created_at=datetime.utcnow() - timedelta(minutes=10),
+        window=timedelta(minutes=10),
         delivery_time=timedelta(minutes=4),
     )
+    # redis is disabled or unavailable, so count the notifications instead
+    if slow_delivery_notifications is None:
+        slow_delivery_notifications = is_delivery_slow_for_providers(
+            threshold=0.3,
+            created_at=datetime.utcnow() - timedelta(minutes=10),
+            delivery_time=timedelta(minutes=4),
+        )
 
     # only adjust if some values are true and some are false - ie, don't adjust if all providers are fast or
     # all providers are slow
@@ -177,13 +192,20 @@ def replay_created_notifications():
             notification_type
         )
 
-        if len(notifications_to_resend) > 0:
-            current_app.logger.info("Sending {} {} notifications "
-                                    "to the delivery queue because the notification "
-                                    "status was created.".format(len(notifications_to_resend), notification_type))
-
+        resent_count = 0
         for n in notifications_to_resend:
-            send_notification_to_queue(notification=n, research_mode=n.service.research_mode)
+            send_notification_to_queue_detached(
+                key_type=n.key_type,
+                notification_type=n.notification_type,
+                notification_id=n.id,
+                research_mode=n.research_mode,
+            )
+            resent_count += 1
+
+        if resent_count > 0:
+            current_app.logger.info("Sent {} {} notifications "
+                                    "to the delivery queue because the notification "
+                                    "status was created.".format(resent_count, notification_type))
 
     # if the letter has not be send after an hour, then create a zendesk ticket
     letters = letters_missing_from_sending_bucket(resend_created_notifications_older_than)
@@ -245,13 +267,32 @@ def check_if_letters_still_in_created():
 def check_for_missing_rows_in_completed_jobs():
     jobs = find_jobs_with_missing_rows()
     for job in jobs:
+        missing_rows = set(find_missing_rows_for_job(job.id, job.notification_count))
+        if not missing_rows:
+            continue
+
         recipient_csv, template, sender_id = get_recipient_csv_and_template_and_sender_id(job)
-        missing_rows = find_missing_row_for_job(job.id, job.notification_count)
-        for row_to_process in missing_rows:
-            row = recipient_csv[row_to_process.missing_row]
-            current_app.logger.info(
-                "Processing missing row: {} for job: {}".format(row_to_process.missing_row, job.id))
-            process_row(row, template, job, job.service, sender_id=sender_id)
+        # go through the file once, and stop after the last row we need
+        last_missing_row = max(missing_rows)
+        for row in recipient_csv.get_rows():
+            if row.index in missing_rows:
+                current_app.logger.info(
+                    "Processing missing row: {} for job: {}".format(row.index, job.id))
+                process_row(row, template, job, job.service, sender_id=sender_id)
+            if row.index >= last_missing_row:
+                break
+
+
+@notify_celery.task(name='reconcile-job-statistics')
+def reconcile_job_statistics():
+    # runs every 10 minutes, so each job is reconciled at least once after it finishes
+    for job in dao_get_jobs_to_reconcile(datetime.utcnow() - timedelta(minutes=20)):
+        try:
+            dao_reconcile_job_statistics(job)
+        except Exception:
+            current_app.logger.exception('Failed to reconcile statistics for job {}'.format(job.id))
+            db.session.rollback()
+            dao_mark_job_statistics_stale([job.id])
 
 
 @notify_celery.task(name='check-for-services-with-high-failure-rates-or-sending-to-tv-numbers')
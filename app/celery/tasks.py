@@ -1,3 +1,4 @@
+import csv
 import json
 from collections import defaultdict, namedtuple
 from datetime import datetime
@@ -10,7 +11,13 @@ from notifications_utils.timezones import convert_utc_to_bst
 from requests import HTTPError, RequestException, request
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
-from app import create_random_identifier, create_uuid, encryption, notify_celery
+from app import (
+    create_random_identifier,
+    create_uuid,
+    encryption,
+    notify_celery,
+    statsd_client,
+)
 from app.aws import s3
 from app.celery import letters_pdf_tasks, provider_tasks, research_mode_tasks
 from app.config import QueueNames
@@ -18,9 +25,19 @@ from app.dao.daily_sorted_letter_dao import (
     dao_create_or_update_daily_sorted_letter,
 )
 from app.dao.inbound_sms_dao import dao_get_inbound_sms_by_id
-from app.dao.jobs_dao import dao_get_job_by_id, dao_update_job
+from app.dao.jobs_dao import (
+    dao_finish_job_resume_shard,
+    dao_get_job_by_id,
+    dao_get_job_shard_progress,
+    dao_get_saved_job_row_numbers,
+    dao_record_job_row_saved,
+    dao_record_job_shard_progress,
+    dao_start_job_resume,
+    dao_start_job_statistics,
+    dao_update_job,
+    find_missing_rows_for_job,
+)
 from app.dao.notifications_dao import (
-    dao_get_last_notification_added_for_job_id,
     dao_get_notification_or_history_by_reference,
     dao_update_notifications_by_reference,
     get_notification_by_id,
@@ -30,9 +47,7 @@ from app.dao.provider_details_dao import (
     get_provider_details_by_notification_type,
 )
 from app.dao.returned_letters_dao import insert_or_update_returned_letters
-from app.dao.service_email_reply_to_dao import dao_get_reply_to_by_id
 from app.dao.service_inbound_api_dao import get_service_inbound_api_for_service
-from app.dao.service_sms_sender_dao import dao_get_service_sms_senders_by_id
 from app.dao.services_dao import fetch_todays_total_message_count
 from app.dao.templates_dao import dao_get_template_by_id
 from app.exceptions import DVLAException, NotificationTechnicalFailureException
@@ -55,10 +70,18 @@ from app.models import (
     DailySortedLetter,
 )
 from app.notifications.process_notifications import persist_notification
-from app.serialised_models import SerialisedService, SerialisedTemplate
+from app.serialised_models import (
+    SerialisedService,
+    SerialisedServiceEmailReplyTo,
+    SerialisedServiceSmsSender,
+    SerialisedTemplate,
+)
 from app.service.utils import service_allowed_to_send_to
 from app.utils import DATETIME_FORMAT, get_reference_from_personalisation
 
+# how many rows of a job are sent between recording the progress of the shard they are in
+JOB_SHARD_PROGRESS_INTERVAL = 1000
+
 
 @notify_celery.task(name="process-job")
 def process_job(job_id, sender_id=None):
@@ -84,6 +107,7 @@ def process_job(job_id, sender_id=None):
     job.job_status = JOB_STATUS_IN_PROGRESS
     job.processing_started = start
     dao_update_job(job)
+    dao_start_job_statistics(job.id)
 
     recipient_csv, template, sender_id = get_recipient_csv_and_template_and_sender_id(job)
 
@@ -91,6 +115,8 @@ def process_job(job_id, sender_id=None):
 
     for row in recipient_csv.get_rows():
         process_row(row, template, job, service, sender_id=sender_id)
+        if (row.index + 1) % JOB_SHARD_PROGRESS_INTERVAL == 0:
+            dao_record_job_shard_progress(job.id, get_job_shard_first_row(row.index), row.index)
 
     job_complete(job, start=start)
 
@@ -112,9 +138,56 @@ def job_complete(job, resumed=False, start=None):
         )
 
 
+def get_job_shard_first_row(row_number):
+    return row_number - row_number % current_app.config['JOB_RESUME_SHARD_SIZE']
+
+
+def get_job_shard_byte_ranges(contents, shards):
+    """
+    Returns the header of the job's CSV file, and the first and last byte of each shard's rows in the file, so each
+    shard can download just its own rows. Rows can span more than one line, so the file is split up into rows the
+    same way RecipientCSV reads it.
+    """
+    shard_size = current_app.config['JOB_RESUME_SHARD_SIZE']
+    stripped_contents = contents.strip()
+    lines = stripped_contents.splitlines(keepends=True)
+
+    # the byte each line starts at, and finally the end of the file
+    line_offsets = [len(contents[:len(contents) - len(contents.lstrip())].encode('utf-8'))]
+    for line in lines:
+        line_offsets.append(line_offsets[-1] + len(line.encode('utf-8')))
+
+    lines_read = 0
+
+    def read_lines():
+        nonlocal lines_read
+        for line in stripped_contents.splitlines():
+            lines_read += 1
+            yield line
+
+    # the first line of each row, starting with the header, and finally the number of lines
+    row_first_lines = [0]
+    for _ in csv.reader(read_lines(), quoting=csv.QUOTE_MINIMAL, skipinitialspace=True):
+        row_first_lines.append(lines_read)
+    row_count = len(row_first_lines) - 2
+
+    byte_ranges = {}
+    for first_row in shards:
+        end_row = min(first_row + shard_size, row_count)
+        byte_ranges[first_row] = (
+            line_offsets[row_first_lines[first_row + 1]],
+            line_offsets[row_first_lines[end_row + 1]] - 1,
+        )
+
+    return ''.join(lines[:row_first_lines[1]]), byte_ranges
+
+
+def get_job_template(job):
+    return dao_get_template_by_id(job.template_id, job.template_version)._as_utils_template()
+
+
 def get_recipient_csv_and_template_and_sender_id(job):
-    db_template = dao_get_template_by_id(job.template_id, job.template_version)
-    template = db_template._as_utils_template()
+    template = get_job_template(job)
 
     contents, meta_data = s3.get_job_and_metadata_from_s3(service_id=str(job.service_id), job_id=str(job.id))
     recipient_csv = RecipientCSV(contents, template=template)
@@ -188,7 +261,7 @@ def save_sms(self,
     )
 
     if sender_id:
-        reply_to_text = dao_get_service_sms_senders_by_id(service_id, sender_id).sms_sender
+        reply_to_text = SerialisedServiceSmsSender.from_id(service_id, sender_id).sms_sender
     else:
         reply_to_text = template.reply_to_text
 
@@ -214,6 +287,10 @@ def save_sms(self,
             notification_id=notification_id,
             reply_to_text=reply_to_text
         )
+        if saved_notification.job_id:
+            dao_record_job_row_saved(
+                saved_notification.job_id, saved_notification.job_row_number, saved_notification.status
+            )
 
         provider_tasks.deliver_sms.apply_async(
             [str(saved_notification.id)],
@@ -247,7 +324,7 @@ def save_email(self,
     )
 
     if sender_id:
-        reply_to_text = dao_get_reply_to_by_id(service_id, sender_id).email_address
+        reply_to_text = SerialisedServiceEmailReplyTo.from_id(service_id, sender_id).email_address
     else:
         reply_to_text = template.reply_to_text
 
@@ -271,6 +348,10 @@ def save_email(self,
             notification_id=notification_id,
             reply_to_text=reply_to_text
         )
+        if saved_notification.job_id:
+            dao_record_job_row_saved(
+                saved_notification.job_id, saved_notification.job_row_number, saved_notification.status
+            )
 
         provider_tasks.deliver_email.apply_async(
             [str(saved_notification.id)],
@@ -380,6 +461,10 @@ def save_letter(
             reply_to_text=template.reply_to_text,
             status=status
         )
+        if saved_notification.job_id:
+            dao_record_job_row_saved(
+                saved_notification.job_id, saved_notification.job_row_number, saved_notification.status
+            )
 
         if not service.research_mode:
             letters_pdf_tasks.get_pdf_for_templated_letter.apply_async(
@@ -624,26 +709,125 @@ def process_incomplete_jobs(job_ids):
 
 
 def process_incomplete_job(job_id):
+    """
+    Sends the job's rows that haven't been saved. If they are spread over more than one shard, each shard is resumed
+    by its own task so they can be sent in parallel, and the last one to finish completes the job.
+    """
     job = dao_get_job_by_id(job_id)
 
-    last_notification_added = dao_get_last_notification_added_for_job_id(job_id)
-
-    if last_notification_added:
-        resume_from_row = last_notification_added.job_row_number
-    else:
-        resume_from_row = -1  # The first row in the csv with a number is row 0
+    shard_size = current_app.config['JOB_RESUME_SHARD_SIZE']
+    shards = sorted({
+        get_job_shard_first_row(row_number)
+        for row_number in find_missing_rows_for_job(job.id, job.notification_count)
+    })
 
-    current_app.logger.info("Resuming job {} from row {}".format(job_id, resume_from_row))
+    current_app.logger.info("Resuming job {} with missing rows in {} shard(s)".format(job_id, len(shards)))
 
-    recipient_csv, template, sender_id = get_recipient_csv_and_template_and_sender_id(job)
+    if not shards:
+        job_complete(job, resumed=True)
+        return
 
-    for row in recipient_csv.get_rows():
-        if row.index > resume_from_row:
-            process_row(row, template, job, job.service, sender_id=sender_id)
+    # the file is only downloaded and read here. Each shard downloads just its own rows
+    contents, meta_data = s3.get_job_and_metadata_from_s3(service_id=str(job.service_id), job_id=str(job.id))
+    sender_id = meta_data.get("sender_id")
+
+    if len(shards) > 1:
+        csv_header, byte_ranges = get_job_shard_byte_ranges(contents, shards)
+        resume_id = dao_start_job_resume(job.id, len(shards))
+        if resume_id:
+            for first_row in shards:
+                resume_job_shard.apply_async(
+                    [
+                        str(job.id),
+                        resume_id,
+                        first_row,
+                        min(first_row + shard_size, job.notification_count) - 1,
+                        csv_header,
+                        *byte_ranges[first_row],
+                        sender_id,
+                    ],
+                    queue=QueueNames.JOBS
+                )
+            return
+
+    template = get_job_template(job)
+    resume_job_rows(
+        job,
+        shards[0],
+        min(shards[-1] + shard_size, job.notification_count) - 1,
+        RecipientCSV(contents, template=template),
+        template,
+        sender_id,
+    )
 
     job_complete(job, resumed=True)
 
 
+@notify_celery.task(name='resume-job-shard')
+def resume_job_shard(job_id, resume_id, first_row, last_row, csv_header, first_byte, last_byte, sender_id):
+    """
+    Sends the rows of one shard of a resumed job. The shard's rows are downloaded on their own, with the file's header
+    in front of them, so their row numbers start from first_row rather than 0.
+    """
+    job = dao_get_job_by_id(job_id)
+    template = get_job_template(job)
+
+    contents = csv_header + s3.get_job_byte_range_from_s3(str(job.service_id), str(job.id), first_byte, last_byte)
+    resume_job_rows(
+        job, first_row, last_row, RecipientCSV(contents, template=template), template, sender_id, row_offset=first_row
+    )
+
+    if dao_finish_job_resume_shard(job.id, resume_id) == 0:
+        job_complete(job, resumed=True)
+
+
+def resume_job_rows(job, first_row, last_row, recipient_csv, template, sender_id, row_offset=0):
+    """
+    Sends the rows from first_row to last_row that haven't been saved, apart from those that were sent before the job
+    stopped and may still be waiting to be saved. row_offset is added to the row numbers in recipient_csv, for when it
+    only has some of the job's rows.
+    """
+    start = datetime.utcnow()
+
+    shard_first_rows = list(range(
+        get_job_shard_first_row(first_row), last_row + 1, current_app.config['JOB_RESUME_SHARD_SIZE']
+    ))
+    last_rows_sent = dao_get_job_shard_progress(job.id, shard_first_rows)
+    saved_rows = dao_get_saved_job_row_numbers(job.id, first_row, last_row)
+
+    rows_sent = 0
+    for row in recipient_csv.get_rows():
+        row.index += row_offset
+        if row.index > last_row:
+            break
+
+        shard_first_row = get_job_shard_first_row(row.index)
+        if (
+            row.index < first_row or
+            row.index in saved_rows or
+            row.index <= last_rows_sent.get(shard_first_row, -1)
+        ):
+            continue
+
+        process_row(row, template, job, job.service, sender_id=sender_id)
+        rows_sent += 1
+        last_row_sent = row.index
+        if rows_sent % JOB_SHARD_PROGRESS_INTERVAL == 0:
+            dao_record_job_shard_progress(job.id, shard_first_row, last_row_sent)
+
+    if rows_sent:
+        dao_record_job_shard_progress(job.id, get_job_shard_first_row(last_row_sent), last_row_sent)
+
+    duration = (datetime.utcnow() - start).total_seconds()
+    statsd_client.timing('jobs.resume.total-time', duration)
+    statsd_client.incr('jobs.resume.rows-sent', rows_sent)
+    current_app.logger.info(
+        "Resumed rows {} to {} of job {}, sent {} rows in {:.1f} seconds ({:.0f} rows per second)".format(
+            first_row, last_row, job.id, rows_sent, duration, rows_sent / duration if duration else 0
+        )
+    )
+
+
 @notify_celery.task(name='process-returned-letters-list')
 def process_returned_letters_list(notification_references):
     updated, updated_history = dao_update_notifications_by_reference(
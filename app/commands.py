@@ -38,6 +38,11 @@ from app.dao.fact_billing_dao import (
     get_service_ids_that_need_billing_populated,
     update_fact_billing,
 )
+from app.dao.fact_monthly_snapshot_dao import (
+    fetch_snapshot_months,
+    next_month,
+    update_monthly_snapshot,
+)
 from app.dao.jobs_dao import dao_get_job_by_id
 from app.dao.organisation_dao import (
     dao_add_service_to_organisation,
@@ -429,6 +434,28 @@ def rebuild_ft_billing_for_day(service_id, day):
         for row in services:
             rebuild_ft_data(day, row.service_id)
 
+    # the platform wide reports read whole months from the monthly snapshot, so that needs rebuilding too
+    if fetch_snapshot_months(day.replace(day=1), next_month(day) - timedelta(days=1)):
+        update_monthly_snapshot(day)
+        current_app.logger.info('updated monthly snapshot for {:%Y-%m}'.format(day))
+
+
+@notify_command(name='rebuild-monthly-fact-snapshots')
+@click.option('-s', '--start_month', required=True, help="first month to build, as YYYY-MM",
+              type=click_dt(format='%Y-%m'))
+@click.option('-e', '--end_month', required=True, help="last month to build, as YYYY-MM",
+              type=click_dt(format='%Y-%m'))
+def rebuild_monthly_fact_snapshots(start_month, end_month):
+    """
+    Build the monthly snapshots of ft_billing and ft_notification_status for each month from start_month to
+    end_month. Only build months that have finished and been processed by the nightly tasks.
+    """
+    month = start_month.date()
+    while month <= end_month.date():
+        update_monthly_snapshot(month)
+        current_app.logger.info('updated monthly snapshot for {:%Y-%m}'.format(month))
+        month = next_month(month)
+
 
 @notify_command(name='migrate-data-to-ft-notification-status')
 @click.option('-s', '--start_date', required=True, help="start date inclusive", type=click_dt(format='%Y-%m-%d'))
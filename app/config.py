@@ -106,6 +106,10 @@ class Config(object):
     # URL of redis instance
     REDIS_URL = os.getenv('REDIS_URL')
     REDIS_ENABLED = os.getenv('REDIS_ENABLED') == '1'
+
+    # validate the POST notification bodies with validators built at startup rather than jsonschema on each request
+    COMPILED_SCHEMA_VALIDATION = os.getenv('COMPILED_SCHEMA_VALIDATION', '1') == '1'
+
     EXPIRE_CACHE_TEN_MINUTES = 600
     EXPIRE_CACHE_EIGHT_DAYS = 8 * 24 * 60 * 60
 
@@ -138,6 +142,15 @@ class Config(object):
     SQLALCHEMY_POOL_TIMEOUT = 30
     SQLALCHEMY_POOL_RECYCLE = 300
     SQLALCHEMY_STATEMENT_TIMEOUT = 1200
+
+    # a read only replica that reporting queries marked with `replica_safe` are sent to, see `db.reading_from_replica`
+    SQLALCHEMY_BINDS = {
+        'replica': os.getenv('SQLALCHEMY_DATABASE_REPLICA_URI')
+    } if os.getenv('SQLALCHEMY_DATABASE_REPLICA_URI') else {}
+    # how many seconds the replica can fall behind the primary before we stop reading from it
+    SQLALCHEMY_REPLICA_MAX_LAG = int(os.getenv('SQLALCHEMY_REPLICA_MAX_LAG', 30))
+    SQLALCHEMY_REPLICA_LAG_CHECK_INTERVAL = 5
+
     PAGE_SIZE = 50
     API_PAGE_SIZE = 250
     TEST_MESSAGE_FILENAME = 'Test message'
@@ -148,6 +161,9 @@ class Config(object):
     MAX_LETTER_PDF_ZIP_FILESIZE = 40 * 1024 * 1024  # 40mb
     MAX_LETTER_PDF_COUNT_PER_ZIP = 500
 
+    # incomplete jobs are resumed in shards of this many rows, which are sent by separate tasks in parallel
+    JOB_RESUME_SHARD_SIZE = 10000
+
     CHECK_PROXY_HEADER = False
 
     # these should always add up to 100%
@@ -238,11 +254,27 @@ class Config(object):
             'schedule': crontab(minute='*/10'),
             'options': {'queue': QueueNames.PERIODIC}
         },
+        'reconcile-job-statistics': {
+            'task': 'reconcile-job-statistics',
+            'schedule': crontab(minute='*/10'),
+            'options': {'queue': QueueNames.PERIODIC}
+        },
         'replay-created-notifications': {
             'task': 'replay-created-notifications',
             'schedule': crontab(minute='0, 15, 30, 45'),
             'options': {'queue': QueueNames.PERIODIC}
         },
+        # app/celery/reporting_tasks.py
+        'create-intraday-billing': {
+            'task': 'create-intraday-billing',
+            'schedule': crontab(minute='*/10'),
+            'options': {'queue': QueueNames.REPORTING}
+        },
+        'update-intraday-template-usage': {
+            'task': 'update-intraday-template-usage',
+            'schedule': crontab(),
+            'options': {'queue': QueueNames.REPORTING}
+        },
         # app/celery/nightly_tasks.py
         'timeout-sending-notifications': {
             'task': 'timeout-sending-notifications',
@@ -259,6 +291,11 @@ class Config(object):
             'schedule': crontab(hour=0, minute=30),  # after 'timeout-sending-notifications'
             'options': {'queue': QueueNames.REPORTING}
         },
+        'create-monthly-fact-snapshots': {
+            'task': 'create-monthly-fact-snapshots',
+            'schedule': crontab(hour=2, minute=30),  # after the nightly billing and notification status tasks
+            'options': {'queue': QueueNames.REPORTING}
+        },
         'delete-notifications-older-than-retention': {
             'task': 'delete-notifications-older-than-retention',
             'schedule': crontab(hour=3, minute=0),  # after 'create-nightly-notification-status'
@@ -35,6 +35,23 @@ def get_model_api_keys(service_id, id=None):
     ).all()
 
 
+def get_api_keys_for_authentication(service_id):
+    """
+    The same keys as `get_model_api_keys`, but only the columns needed to authenticate a request and with the secret
+    still encrypted, so no ApiKey objects are built.
+    """
+    seven_days_ago = datetime.utcnow() - timedelta(days=7)
+    return db.session.query(
+        ApiKey.id,
+        ApiKey._secret.label('secret'),
+        ApiKey.expiry_date,
+        ApiKey.key_type,
+    ).filter(
+        or_(ApiKey.expiry_date == None, func.date(ApiKey.expiry_date) > seven_days_ago),  # noqa
+        ApiKey.service_id == service_id
+    ).all()
+
+
 def get_unsigned_secrets(service_id):
     """
     This method can only be exposed to the Authentication of the api calls.
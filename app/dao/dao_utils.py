@@ -22,6 +22,19 @@ def autocommit(func):
     return commit_or_rollback
 
 
+def replica_safe(func):
+    """
+    Sends the queries the wrapped function makes to the read replica, if there is one. Only use this for reporting
+    queries that can be a few seconds out of date. Anything returned lazily, like a query that hasn't been run yet,
+    is read from the primary.
+    """
+    @wraps(func)
+    def read_from_replica(*args, **kwargs):
+        with db.reading_from_replica():
+            return func(*args, **kwargs)
+    return read_from_replica
+
+
 @contextmanager
 def transaction():
     try:
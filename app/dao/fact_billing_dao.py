@@ -1,16 +1,20 @@
+from collections import defaultdict
 from datetime import date, datetime, time, timedelta
 
 from flask import current_app
 from notifications_utils.timezones import convert_bst_to_utc, convert_utc_to_bst
-from sqlalchemy import Date, Integer, and_, desc, func
+from sqlalchemy import Date, Integer, desc, func
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import joinedload
 from sqlalchemy.sql.expression import case, literal
 
 from app import db
+from app.dao.dao_utils import replica_safe
 from app.dao.date_util import (
     get_financial_year,
     get_financial_year_for_datetime,
 )
+from app.dao.fact_monthly_snapshot_dao import get_billing_source
 from app.dao.organisation_dao import dao_get_organisation_live_services
 from app.models import (
     EMAIL_TYPE,
@@ -37,7 +41,8 @@ def fetch_sms_free_allowance_remainder(start_date):
     billing_year = get_financial_year_for_datetime(start_date)
     start_of_year = date(billing_year, 4, 1)
 
-    billable_units = func.coalesce(func.sum(FactBilling.billable_units * FactBilling.rate_multiplier), 0)
+    sms_billing = get_billing_source(start_of_year, start_date - timedelta(days=1), SMS_TYPE)
+    billable_units = func.coalesce(func.sum(sms_billing.c.billable_units), 0)
 
     query = db.session.query(
         AnnualBilling.service_id.label("service_id"),
@@ -47,12 +52,7 @@ def fetch_sms_free_allowance_remainder(start_date):
     ).outerjoin(
         # if there are no ft_billing rows for a service we still want to return the annual billing so we can use the
         # free_sms_fragment_limit)
-        FactBilling, and_(
-            AnnualBilling.service_id == FactBilling.service_id,
-            FactBilling.bst_date >= start_of_year,
-            FactBilling.bst_date < start_date,
-            FactBilling.notification_type == SMS_TYPE,
-        )
+        sms_billing, AnnualBilling.service_id == sms_billing.c.service_id,
     ).filter(
         AnnualBilling.financial_year_start == billing_year,
     ).group_by(
@@ -62,18 +62,20 @@ def fetch_sms_free_allowance_remainder(start_date):
     return query
 
 
+@replica_safe
 def fetch_sms_billing_for_all_services(start_date, end_date):
 
     # ASSUMPTION: AnnualBilling has been populated for year.
     free_allowance_remainder = fetch_sms_free_allowance_remainder(start_date).subquery()
+    sms_billing = get_billing_source(start_date, end_date, SMS_TYPE)
 
-    sms_billable_units = func.sum(FactBilling.billable_units * FactBilling.rate_multiplier)
+    sms_billable_units = func.sum(sms_billing.c.billable_units)
     sms_remainder = func.coalesce(
         free_allowance_remainder.c.sms_remainder,
         free_allowance_remainder.c.free_sms_fragment_limit
     )
     chargeable_sms = func.greatest(sms_billable_units - sms_remainder, 0)
-    sms_cost = chargeable_sms * FactBilling.rate
+    sms_cost = chargeable_sms * sms_billing.c.rate
 
     query = db.session.query(
         Organisation.name.label('organisation_name'),
@@ -81,7 +83,7 @@ def fetch_sms_billing_for_all_services(start_date, end_date):
         Service.name.label("service_name"),
         Service.id.label("service_id"),
         free_allowance_remainder.c.free_sms_fragment_limit,
-        FactBilling.rate.label('sms_rate'),
+        sms_billing.c.rate.label('sms_rate'),
         sms_remainder.label("sms_remainder"),
         sms_billable_units.label('sms_billable_units'),
         chargeable_sms.label("chargeable_billable_sms"),
@@ -93,11 +95,7 @@ def fetch_sms_billing_for_all_services(start_date, end_date):
     ).outerjoin(
         Service.organisation
     ).join(
-        FactBilling, FactBilling.service_id == Service.id,
-    ).filter(
-        FactBilling.bst_date >= start_date,
-        FactBilling.bst_date <= end_date,
-        FactBilling.notification_type == SMS_TYPE,
+        sms_billing, sms_billing.c.service_id == Service.id,
     ).group_by(
         Organisation.name,
         Organisation.id,
@@ -105,7 +103,7 @@ def fetch_sms_billing_for_all_services(start_date, end_date):
         Service.name,
         free_allowance_remainder.c.free_sms_fragment_limit,
         free_allowance_remainder.c.sms_remainder,
-        FactBilling.rate,
+        sms_billing.c.rate,
     ).order_by(
         Organisation.name,
         Service.name
@@ -114,24 +112,22 @@ def fetch_sms_billing_for_all_services(start_date, end_date):
     return query.all()
 
 
+@replica_safe
 def fetch_letter_costs_for_all_services(start_date, end_date):
+    letter_billing = get_billing_source(start_date, end_date, LETTER_TYPE)
+
     query = db.session.query(
         Organisation.name.label("organisation_name"),
         Organisation.id.label("organisation_id"),
         Service.name.label("service_name"),
         Service.id.label("service_id"),
-        func.sum(FactBilling.notifications_sent * FactBilling.rate).label("letter_cost")
+        func.sum(letter_billing.c.notifications_sent * letter_billing.c.rate).label("letter_cost")
     ).select_from(
         Service
     ).outerjoin(
         Service.organisation
     ).join(
-        FactBilling, FactBilling.service_id == Service.id,
-    ).filter(
-        FactBilling.service_id == Service.id,
-        FactBilling.bst_date >= start_date,
-        FactBilling.bst_date <= end_date,
-        FactBilling.notification_type == LETTER_TYPE,
+        letter_billing, letter_billing.c.service_id == Service.id,
     ).group_by(
         Organisation.name,
         Organisation.id,
@@ -145,9 +141,12 @@ def fetch_letter_costs_for_all_services(start_date, end_date):
     return query.all()
 
 
+@replica_safe
 def fetch_letter_line_items_for_all_services(start_date, end_date):
+    letter_billing = get_billing_source(start_date, end_date, LETTER_TYPE)
+
     formatted_postage = case(
-        [(FactBilling.postage.in_(INTERNATIONAL_POSTAGE_TYPES), "international")], else_=FactBilling.postage
+        [(letter_billing.c.postage.in_(INTERNATIONAL_POSTAGE_TYPES), "international")], else_=letter_billing.c.postage
     ).label("postage")
 
     postage_order = case(((formatted_postage == "second", 1),
@@ -159,31 +158,27 @@ def fetch_letter_line_items_for_all_services(start_date, end_date):
         Organisation.id.label("organisation_id"),
         Service.name.label("service_name"),
         Service.id.label("service_id"),
-        FactBilling.rate.label("letter_rate"),
+        letter_billing.c.rate.label("letter_rate"),
         formatted_postage,
-        func.sum(FactBilling.notifications_sent).label("letters_sent"),
+        func.sum(letter_billing.c.notifications_sent).label("letters_sent"),
     ).select_from(
         Service
     ).outerjoin(
         Service.organisation
     ).join(
-        FactBilling, FactBilling.service_id == Service.id,
-    ).filter(
-        FactBilling.bst_date >= start_date,
-        FactBilling.bst_date <= end_date,
-        FactBilling.notification_type == LETTER_TYPE,
+        letter_billing, letter_billing.c.service_id == Service.id,
     ).group_by(
         Organisation.name,
         Organisation.id,
         Service.id,
         Service.name,
-        FactBilling.rate,
+        letter_billing.c.rate,
         formatted_postage
     ).order_by(
         Organisation.name,
         Service.name,
         postage_order,
-        FactBilling.rate,
+        letter_billing.c.rate,
     )
     return query.all()
 
@@ -242,13 +237,7 @@ def fetch_monthly_billing_for_year(service_id, year):
     year_start_date = convert_utc_to_bst(year_start_datetime).date()
     year_end_date = convert_utc_to_bst(year_end_datetime).date()
 
-    today = convert_utc_to_bst(datetime.utcnow()).date()
-    # if year end date is less than today, we are calculating for data in the past and have no need for deltas.
-    if year_end_date >= today:
-        data = fetch_billing_data_for_day(process_day=today, service_id=service_id, check_permissions=True)
-        for d in data:
-            update_fact_billing(data=d, process_day=today)
-
+    # today's usage is kept up to date in ft_billing by the create-intraday-billing task
     email_and_letters = db.session.query(
         func.date_trunc('month', FactBilling.bst_date).cast(Date).label("month"),
         func.sum(FactBilling.notifications_sent).label("notifications_sent"),
@@ -312,12 +301,21 @@ def fetch_billing_data_for_day(process_day, service_id=None, check_permissions=F
     start_date = convert_bst_to_utc(datetime.combine(process_day, time.min))
     end_date = convert_bst_to_utc(datetime.combine(process_day + timedelta(days=1), time.min))
     current_app.logger.info("Populate ft_billing for {} to {}".format(start_date, end_date))
-    transit_data = []
-    if not service_id:
-        services = Service.query.all()
-    else:
-        services = [Service.query.get(service_id)]
 
+    if service_id:
+        return _fetch_billing_data_for_services(
+            [Service.query.get(service_id)], process_day, start_date, end_date, check_permissions
+        )
+
+    services = Service.query.options(joinedload('data_retention'))
+    if check_permissions:
+        services = services.options(joinedload('permissions'))
+
+    return _fetch_billing_data_for_all_services(services.all(), process_day, start_date, end_date, check_permissions)
+
+
+def _fetch_billing_data_for_services(services, process_day, start_date, end_date, check_permissions):
+    transit_data = []
     for service in services:
         for notification_type in (SMS_TYPE, EMAIL_TYPE, LETTER_TYPE):
             if (not check_permissions) or service.has_permission(notification_type):
@@ -328,19 +326,67 @@ def fetch_billing_data_for_day(process_day, service_id=None, check_permissions=F
                     notification_type=notification_type,
                     start_date=start_date,
                     end_date=end_date,
-                    service=service
+                    service_ids=[service.id]
                 )
                 transit_data += results
 
     return transit_data
 
 
-def _query_for_billing_data(table, notification_type, start_date, end_date, service):
+def _fetch_billing_data_for_all_services(services, process_day, start_date, end_date, check_permissions):
+    """
+    Returns the same rows as _fetch_billing_data_for_services, but with one query for each table and notification
+    type rather than three for every service. Services are split by which table their data retention means holds the
+    day's notifications.
+    """
+    transit_data = []
+    for notification_type in (SMS_TYPE, EMAIL_TYPE, LETTER_TYPE):
+        service_ids_by_table = defaultdict(list)
+        for service in services:
+            if (not check_permissions) or service.has_permission(notification_type):
+                table = get_notification_table_to_use(service, notification_type, process_day,
+                                                      has_delete_task_run=False)
+                service_ids_by_table[table].append(service.id)
+
+        for table, service_ids in service_ids_by_table.items():
+            transit_data += _query_for_billing_data(
+                table=table,
+                notification_type=notification_type,
+                start_date=start_date,
+                end_date=end_date,
+                # no need to filter by service if every service's notifications are in this table
+                service_ids=None if len(service_ids) == len(services) else service_ids
+            )
+
+    return transit_data
+
+
+def _query_for_billing_data(table, notification_type, start_date, end_date, service_ids=None):
+    """
+    Pass service_ids to only return rows for those services, otherwise every service is returned
+    """
+    def _filters(statuses):
+        filters = [
+            table.status.in_(statuses),
+            table.key_type != KEY_TYPE_TEST,
+            table.created_at >= start_date,
+            table.created_at < end_date,
+            table.notification_type == notification_type,
+        ]
+        if service_ids is not None:
+            filters.append(
+                table.service_id == service_ids[0] if len(service_ids) == 1 else table.service_id.in_(service_ids)
+            )
+        return filters
+
+    def _query(*columns):
+        return db.session.query(*columns).select_from(table).join(Service, Service.id == table.service_id)
+
     def _email_query():
-        return db.session.query(
+        return _query(
             table.template_id,
-            literal(service.crown).label('crown'),
-            literal(service.id).label('service_id'),
+            Service.crown.label('crown'),
+            table.service_id.label('service_id'),
             literal(notification_type).label('notification_type'),
             literal('ses').label('sent_by'),
             literal(0).label('rate_multiplier'),
@@ -350,13 +396,10 @@ def _query_for_billing_data(table, notification_type, start_date, end_date, serv
             literal(0).label('billable_units'),
             func.count().label('notifications_sent'),
         ).filter(
-            table.status.in_(NOTIFICATION_STATUS_TYPES_SENT_EMAILS),
-            table.key_type != KEY_TYPE_TEST,
-            table.created_at >= start_date,
-            table.created_at < end_date,
-            table.notification_type == notification_type,
-            table.service_id == service.id
+            *_filters(NOTIFICATION_STATUS_TYPES_SENT_EMAILS)
         ).group_by(
+            table.service_id,
+            Service.crown,
             table.template_id,
         )
 
@@ -364,10 +407,10 @@ def _query_for_billing_data(table, notification_type, start_date, end_date, serv
         sent_by = func.coalesce(table.sent_by, 'unknown')
         rate_multiplier = func.coalesce(table.rate_multiplier, 1).cast(Integer)
         international = func.coalesce(table.international, False)
-        return db.session.query(
+        return _query(
             table.template_id,
-            literal(service.crown).label('crown'),
-            literal(service.id).label('service_id'),
+            Service.crown.label('crown'),
+            table.service_id.label('service_id'),
             literal(notification_type).label('notification_type'),
             sent_by.label('sent_by'),
             rate_multiplier.label('rate_multiplier'),
@@ -377,13 +420,10 @@ def _query_for_billing_data(table, notification_type, start_date, end_date, serv
             func.sum(table.billable_units).label('billable_units'),
             func.count().label('notifications_sent'),
         ).filter(
-            table.status.in_(NOTIFICATION_STATUS_TYPES_BILLABLE_SMS),
-            table.key_type != KEY_TYPE_TEST,
-            table.created_at >= start_date,
-            table.created_at < end_date,
-            table.notification_type == notification_type,
-            table.service_id == service.id
+            *_filters(NOTIFICATION_STATUS_TYPES_BILLABLE_SMS)
         ).group_by(
+            table.service_id,
+            Service.crown,
             table.template_id,
             sent_by,
             rate_multiplier,
@@ -393,10 +433,10 @@ def _query_for_billing_data(table, notification_type, start_date, end_date, serv
     def _letter_query():
         rate_multiplier = func.coalesce(table.rate_multiplier, 1).cast(Integer)
         postage = func.coalesce(table.postage, 'none')
-        return db.session.query(
+        return _query(
             table.template_id,
-            literal(service.crown).label('crown'),
-            literal(service.id).label('service_id'),
+            Service.crown.label('crown'),
+            table.service_id.label('service_id'),
             literal(notification_type).label('notification_type'),
             literal('dvla').label('sent_by'),
             rate_multiplier.label('rate_multiplier'),
@@ -406,13 +446,10 @@ def _query_for_billing_data(table, notification_type, start_date, end_date, serv
             func.sum(table.billable_units).label('billable_units'),
             func.count().label('notifications_sent'),
         ).filter(
-            table.status.in_(NOTIFICATION_STATUS_TYPES_BILLABLE_FOR_LETTERS),
-            table.key_type != KEY_TYPE_TEST,
-            table.created_at >= start_date,
-            table.created_at < end_date,
-            table.notification_type == notification_type,
-            table.service_id == service.id
+            *_filters(NOTIFICATION_STATUS_TYPES_BILLABLE_FOR_LETTERS)
         ).group_by(
+            table.service_id,
+            Service.crown,
             table.template_id,
             rate_multiplier,
             table.billable_units,
@@ -478,8 +515,11 @@ def get_rate(
         return 0
 
 
-def update_fact_billing(data, process_day):
-    non_letter_rates, letter_rates = get_rates_for_billing()
+def update_fact_billing(data, process_day, rates=None):
+    """
+    Pass the result of get_rates_for_billing as rates when updating many rows, so they're only fetched once
+    """
+    non_letter_rates, letter_rates = rates or get_rates_for_billing()
     rate = get_rate(non_letter_rates,
                     letter_rates,
                     data.notification_type,
@@ -640,14 +680,8 @@ def fetch_usage_year_for_organisation(organisation_id, year):
     year_start_date = convert_utc_to_bst(year_start_datetime).date()
     year_end_date = convert_utc_to_bst(year_end_datetime).date()
 
-    today = convert_utc_to_bst(datetime.utcnow()).date()
+    # today's usage is kept up to date in ft_billing by the create-intraday-billing task
     services = dao_get_organisation_live_services(organisation_id)
-    # if year end date is less than today, we are calculating for data in the past and have no need for deltas.
-    if year_end_date >= today:
-        for service in services:
-            data = fetch_billing_data_for_day(process_day=today, service_id=service.id)
-            for d in data:
-                update_fact_billing(data=d, process_day=today)
     service_with_usage = {}
     # initialise results
     for service in services:
@@ -687,6 +721,7 @@ def fetch_usage_year_for_organisation(organisation_id, year):
     return service_with_usage
 
 
+@replica_safe
 def fetch_billing_details_for_all_services():
     billing_details = db.session.query(
         Service.id.label('service_id'),
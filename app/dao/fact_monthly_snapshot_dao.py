@@ -0,0 +1,222 @@
+"""
+Monthly snapshots of ft_billing and ft_notification_status for the platform wide reports.
+
+Platform admin reports cover up to a financial year, which is every day, template and provider for every service.
+A snapshot adds each month up once, after the nightly tasks have built its last day. A report then reads whole
+snapshotted months from the monthly tables and only the days either side of them from the daily tables.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import Date, DateTime, false, func, literal, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.dao.dao_utils import autocommit
+from app.models import (
+    FactBilling,
+    FactBillingMonthly,
+    FactMonthlySnapshot,
+    FactNotificationStatus,
+    FactNotificationStatusMonthly,
+)
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def get_whole_months_in_range(start_date, end_date):
+    """
+    Returns the first day of each month that falls entirely between start_date and end_date, inclusive.
+    """
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    month = start_date if start_date.day == 1 else next_month(start_date)
+
+    months = []
+    while next_month(month) - timedelta(days=1) <= end_date:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def fetch_snapshot_months(start_date, end_date):
+    months = get_whole_months_in_range(start_date, end_date)
+    if not months:
+        return []
+    return [
+        snapshot.month for snapshot in FactMonthlySnapshot.query.filter(
+            FactMonthlySnapshot.month.in_(months)
+        ).order_by(
+            FactMonthlySnapshot.month
+        ).all()
+    ]
+
+
+def split_date_range(start_date, end_date):
+    """
+    Returns the snapshotted months that fall entirely between start_date and end_date, and a list of
+    (first_day, last_day) tuples for the days that have to be read from the daily fact tables instead.
+    """
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    months = fetch_snapshot_months(start_date, end_date)
+
+    day_ranges = []
+    first_day = start_date
+    for month in months:
+        if first_day < month:
+            day_ranges.append((first_day, month - timedelta(days=1)))
+        first_day = next_month(month)
+    if first_day <= end_date:
+        day_ranges.append((first_day, end_date))
+
+    return months, day_ranges
+
+
+def _in_day_ranges(column, day_ranges):
+    if not day_ranges:
+        return false()
+    return or_(*[column.between(first_day, last_day) for first_day, last_day in day_ranges])
+
+
+def get_billing_source(start_date, end_date, notification_type):
+    """
+    Returns a subquery of ft_billing rows between start_date and end_date for notification_type, with the rate
+    multiplier already applied to billable_units. Whole months are read from the snapshot where there is one.
+
+    Rows aren't added up across days or months, so group by the columns the report needs.
+    """
+    months, day_ranges = split_date_range(start_date, end_date)
+
+    query = db.session.query(
+        FactBilling.service_id.label('service_id'),
+        FactBilling.rate.label('rate'),
+        FactBilling.postage.label('postage'),
+        (FactBilling.billable_units * FactBilling.rate_multiplier).label('billable_units'),
+        FactBilling.notifications_sent.label('notifications_sent'),
+    ).filter(
+        FactBilling.notification_type == notification_type,
+        _in_day_ranges(FactBilling.bst_date, day_ranges),
+    )
+
+    if months:
+        query = query.union_all(
+            db.session.query(
+                FactBillingMonthly.service_id.label('service_id'),
+                FactBillingMonthly.rate.label('rate'),
+                FactBillingMonthly.postage.label('postage'),
+                FactBillingMonthly.billable_units.label('billable_units'),
+                FactBillingMonthly.notifications_sent.label('notifications_sent'),
+            ).filter(
+                FactBillingMonthly.notification_type == notification_type,
+                FactBillingMonthly.month.in_(months),
+            )
+        )
+
+    return query.subquery()
+
+
+def get_notification_status_source(start_date, end_date):
+    """
+    Returns a subquery of ft_notification_status counts between start_date and end_date, reading whole months from
+    the snapshot where there is one.
+
+    Rows aren't added up across days or months, so group by the columns the report needs.
+    """
+    months, day_ranges = split_date_range(start_date, end_date)
+
+    query = db.session.query(
+        FactNotificationStatus.notification_type.label('notification_type'),
+        FactNotificationStatus.notification_status.label('notification_status'),
+        FactNotificationStatus.key_type.label('key_type'),
+        FactNotificationStatus.notification_count.label('notification_count'),
+    ).filter(
+        _in_day_ranges(FactNotificationStatus.bst_date, day_ranges),
+    )
+
+    if months:
+        query = query.union_all(
+            db.session.query(
+                FactNotificationStatusMonthly.notification_type.label('notification_type'),
+                FactNotificationStatusMonthly.notification_status.label('notification_status'),
+                FactNotificationStatusMonthly.key_type.label('key_type'),
+                FactNotificationStatusMonthly.notification_count.label('notification_count'),
+            ).filter(
+                FactNotificationStatusMonthly.month.in_(months),
+            )
+        )
+
+    return query.subquery()
+
+
+@autocommit
+def update_monthly_snapshot(month):
+    """
+    (Re)builds the snapshot for the month `month` falls in from the daily fact tables. Only call this once every day
+    in the month has been built by the nightly tasks.
+    """
+    month = _as_date(month).replace(day=1)
+    last_day = next_month(month) - timedelta(days=1)
+    now = datetime.utcnow()
+
+    FactBillingMonthly.query.filter(FactBillingMonthly.month == month).delete()
+    FactNotificationStatusMonthly.query.filter(FactNotificationStatusMonthly.month == month).delete()
+
+    billing = db.session.query(
+        literal(month, type_=Date),
+        FactBilling.service_id,
+        FactBilling.notification_type,
+        FactBilling.rate,
+        FactBilling.postage,
+        func.sum(FactBilling.billable_units * FactBilling.rate_multiplier),
+        func.sum(FactBilling.notifications_sent),
+        literal(now, type_=DateTime),
+    ).filter(
+        FactBilling.bst_date >= month,
+        FactBilling.bst_date <= last_day,
+    ).group_by(
+        FactBilling.service_id,
+        FactBilling.notification_type,
+        FactBilling.rate,
+        FactBilling.postage,
+    )
+    db.session.connection().execute(
+        insert(FactBillingMonthly.__table__).from_select(
+            ['month', 'service_id', 'notification_type', 'rate', 'postage', 'billable_units', 'notifications_sent',
+             'created_at'],
+            billing
+        )
+    )
+
+    notification_status = db.session.query(
+        literal(month, type_=Date),
+        FactNotificationStatus.notification_type,
+        FactNotificationStatus.key_type,
+        FactNotificationStatus.notification_status,
+        func.sum(FactNotificationStatus.notification_count),
+        literal(now, type_=DateTime),
+    ).filter(
+        FactNotificationStatus.bst_date >= month,
+        FactNotificationStatus.bst_date <= last_day,
+    ).group_by(
+        FactNotificationStatus.notification_type,
+        FactNotificationStatus.key_type,
+        FactNotificationStatus.notification_status,
+    )
+    db.session.connection().execute(
+        insert(FactNotificationStatusMonthly.__table__).from_select(
+            ['month', 'notification_type', 'key_type', 'notification_status', 'notification_count', 'created_at'],
+            notification_status
+        )
+    )
+
+    table = FactMonthlySnapshot.__table__
+    stmt = insert(table).values(month=month, created_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.month],
+        set_={'updated_at': now}
+    )
+    db.session.connection().execute(stmt)
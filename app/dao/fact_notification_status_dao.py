@@ -1,14 +1,16 @@
+from collections import namedtuple
 from datetime import datetime, time, timedelta
 
 from flask import current_app
-from notifications_utils.timezones import convert_bst_to_utc
-from sqlalchemy import Date, case, func
+from notifications_utils.timezones import convert_bst_to_utc, convert_utc_to_bst
+from sqlalchemy import Date, case, func, tuple_
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql.expression import extract, literal
 from sqlalchemy.types import DateTime, Integer
 
 from app import db
-from app.dao.dao_utils import autocommit
+from app.dao.dao_utils import autocommit, replica_safe
+from app.dao.fact_monthly_snapshot_dao import get_notification_status_source
 from app.models import (
     KEY_TYPE_TEST,
     NOTIFICATION_CANCELLED,
@@ -22,17 +24,26 @@ from app.models import (
     NOTIFICATION_TECHNICAL_FAILURE,
     NOTIFICATION_TEMPORARY_FAILURE,
     FactNotificationStatus,
+    FactTemplateUsageIntraday,
     Notification,
     Service,
-    Template,
 )
+from app.serialised_models import SerialisedTemplateNameCollection
 from app.utils import (
     get_london_midnight_in_utc,
-    get_london_month_from_utc_column,
     get_notification_table_to_use,
     midnight_n_days_ago,
 )
 
+TemplateStatusCount = namedtuple(
+    'TemplateStatusCount',
+    ['template_name', 'is_precompiled_letter', 'template_id', 'notification_type', 'status', 'count']
+)
+MonthlyTemplateUsage = namedtuple(
+    'MonthlyTemplateUsage',
+    ['template_id', 'name', 'template_type', 'is_precompiled_letter', 'month', 'year', 'count']
+)
+
 
 def fetch_notification_status_for_day(process_day, notification_type):
     start_date = convert_bst_to_utc(datetime.combine(process_day, time.min))
@@ -105,6 +116,95 @@ def update_fact_notification_status(data, process_day, notification_type):
         db.session.connection().execute(stmt)
 
 
+@autocommit
+def update_fact_template_usage_intraday(since=None):
+    """
+    Today's counts are kept for each hour that the notifications were created in. Only the hours that have had a
+    notification created or updated since `since` are counted again, or every hour if `since` is None. Status
+    updates mostly come in within minutes of sending, so this is usually the last hour or two of each template that
+    is being used rather than the whole day. Test key notifications aren't counted.
+    """
+    now = datetime.utcnow()
+    today = convert_utc_to_bst(now).date()
+    created_hour = func.date_trunc('hour', Notification.created_at)
+    filters = [
+        Notification.created_at >= get_london_midnight_in_utc(now),
+        Notification.key_type != KEY_TYPE_TEST,
+    ]
+    stale_rows = FactTemplateUsageIntraday.query.filter(FactTemplateUsageIntraday.bst_date == today)
+
+    if since is not None:
+        # uses ix_notifications_last_changed, so only the rows changed since `since` are read
+        changed_hours = db.session.query(
+            Notification.service_id,
+            Notification.template_id,
+            created_hour,
+        ).filter(
+            *filters,
+            func.coalesce(Notification.updated_at, Notification.created_at) >= since,
+        ).distinct().all()
+
+        if not changed_hours:
+            return
+        filters.extend([
+            Notification.created_at >= min(hour for _, _, hour in changed_hours),
+            tuple_(Notification.service_id, Notification.template_id, created_hour).in_(changed_hours),
+        ])
+        stale_rows = stale_rows.filter(
+            tuple_(
+                FactTemplateUsageIntraday.service_id,
+                FactTemplateUsageIntraday.template_id,
+                FactTemplateUsageIntraday.created_hour,
+            ).in_(changed_hours)
+        )
+
+    # an hour's notifications can all move on to a new status, so clear out its old counts before adding new ones
+    stale_rows.delete(synchronize_session=False)
+
+    counts = db.session.query(
+        literal(today, type_=Date),
+        Notification.service_id,
+        Notification.template_id,
+        created_hour,
+        Notification.status,
+        Notification.notification_type.cast(db.Text),
+        func.count(),
+        literal(now, type_=DateTime),
+    ).filter(
+        *filters
+    ).group_by(
+        Notification.service_id,
+        Notification.template_id,
+        created_hour,
+        Notification.status,
+        Notification.notification_type,
+    )
+
+    table = FactTemplateUsageIntraday.__table__
+    stmt = insert(table).from_select(
+        ['bst_date', 'service_id', 'template_id', 'created_hour', 'notification_status', 'notification_type',
+         'notification_count', 'updated_at'],
+        counts
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            table.c.bst_date, table.c.service_id, table.c.template_id, table.c.created_hour, table.c.notification_status
+        ],
+        set_={
+            'notification_count': stmt.excluded.notification_count,
+            'updated_at': stmt.excluded.updated_at,
+        }
+    )
+    db.session.connection().execute(stmt)
+
+
+@autocommit
+def delete_fact_template_usage_intraday_older_than(bst_date):
+    FactTemplateUsageIntraday.query.filter(
+        FactTemplateUsageIntraday.bst_date < bst_date
+    ).delete(synchronize_session=False)
+
+
 def fetch_notification_status_for_service_by_month(start_date, end_date, service_id):
     return db.session.query(
         func.date_trunc('month', FactNotificationStatus.bst_date).label('month'),
@@ -141,13 +241,16 @@ def fetch_notification_status_for_service_for_day(bst_day, service_id):
     ).all()
 
 
+@replica_safe
 def fetch_notification_status_for_service_for_today_and_7_previous_days(service_id, by_template=False, limit_days=7):
+    if by_template:
+        return _fetch_template_usage_for_service_for_today_and_previous_days(service_id, limit_days)
+
     start_date = midnight_n_days_ago(limit_days)
     now = datetime.utcnow()
     stats_for_7_days = db.session.query(
         FactNotificationStatus.notification_type.label('notification_type'),
         FactNotificationStatus.notification_status.label('status'),
-        *([FactNotificationStatus.template_id.label('template_id')] if by_template else []),
         FactNotificationStatus.notification_count.label('count')
     ).filter(
         FactNotificationStatus.service_id == service_id,
@@ -158,7 +261,6 @@ def fetch_notification_status_for_service_for_today_and_7_previous_days(service_
     stats_for_today = db.session.query(
         Notification.notification_type.cast(db.Text),
         Notification.status,
-        *([Notification.template_id] if by_template else []),
         func.count().label('count')
     ).filter(
         Notification.created_at >= get_london_midnight_in_utc(now),
@@ -166,46 +268,87 @@ def fetch_notification_status_for_service_for_today_and_7_previous_days(service_
         Notification.key_type != KEY_TYPE_TEST
     ).group_by(
         Notification.notification_type,
-        *([Notification.template_id] if by_template else []),
         Notification.status
     )
 
     all_stats_table = stats_for_7_days.union_all(stats_for_today).subquery()
 
-    query = db.session.query(
-        *([
-            Template.name.label("template_name"),
-            Template.is_precompiled_letter,
-            all_stats_table.c.template_id
-        ] if by_template else []),
+    return db.session.query(
         all_stats_table.c.notification_type,
         all_stats_table.c.status,
         func.cast(func.sum(all_stats_table.c.count), Integer).label('count'),
+    ).group_by(
+        all_stats_table.c.notification_type,
+        all_stats_table.c.status,
+    ).all()
+
+
+def _fetch_template_usage_for_service_for_today_and_previous_days(service_id, limit_days):
+    stats_for_previous_days = db.session.query(
+        FactNotificationStatus.template_id.label('template_id'),
+        FactNotificationStatus.notification_type.label('notification_type'),
+        FactNotificationStatus.notification_status.label('status'),
+        FactNotificationStatus.notification_count.label('count')
+    ).filter(
+        FactNotificationStatus.service_id == service_id,
+        FactNotificationStatus.bst_date >= midnight_n_days_ago(limit_days),
+        FactNotificationStatus.key_type != KEY_TYPE_TEST
     )
 
-    if by_template:
-        query = query.filter(all_stats_table.c.template_id == Template.id)
+    stats_for_today = db.session.query(
+        FactTemplateUsageIntraday.template_id,
+        FactTemplateUsageIntraday.notification_type,
+        FactTemplateUsageIntraday.notification_status,
+        FactTemplateUsageIntraday.notification_count,
+    ).filter(
+        FactTemplateUsageIntraday.service_id == service_id,
+        FactTemplateUsageIntraday.bst_date == convert_utc_to_bst(datetime.utcnow()).date(),
+    )
+
+    all_stats_table = stats_for_previous_days.union_all(stats_for_today).subquery()
 
-    return query.group_by(
-        *([Template.name, Template.is_precompiled_letter, all_stats_table.c.template_id] if by_template else []),
+    rows = db.session.query(
+        all_stats_table.c.template_id,
+        all_stats_table.c.notification_type,
+        all_stats_table.c.status,
+        func.cast(func.sum(all_stats_table.c.count), Integer).label('count'),
+    ).group_by(
+        all_stats_table.c.template_id,
         all_stats_table.c.notification_type,
         all_stats_table.c.status,
     ).all()
 
+    templates = SerialisedTemplateNameCollection.from_service_id(
+        service_id, {row.template_id for row in rows}
+    ).by_id
 
+    return [
+        TemplateStatusCount(
+            template_name=templates[row.template_id].name,
+            is_precompiled_letter=templates[row.template_id].is_precompiled_letter,
+            template_id=row.template_id,
+            notification_type=row.notification_type,
+            status=row.status,
+            count=row.count,
+        )
+        for row in rows
+        if row.template_id in templates
+    ]
+
+
+@replica_safe
 def fetch_notification_status_totals_for_all_services(start_date, end_date):
+    notification_status = get_notification_status_source(start_date, end_date)
+
     stats = db.session.query(
-        FactNotificationStatus.notification_type.label('notification_type'),
-        FactNotificationStatus.notification_status.label('status'),
-        FactNotificationStatus.key_type.label('key_type'),
-        func.sum(FactNotificationStatus.notification_count).label('count')
-    ).filter(
-        FactNotificationStatus.bst_date >= start_date,
-        FactNotificationStatus.bst_date <= end_date
+        notification_status.c.notification_type.label('notification_type'),
+        notification_status.c.notification_status.label('status'),
+        notification_status.c.key_type.label('key_type'),
+        func.sum(notification_status.c.notification_count).label('count')
     ).group_by(
-        FactNotificationStatus.notification_type,
-        FactNotificationStatus.notification_status,
-        FactNotificationStatus.key_type,
+        notification_status.c.notification_type,
+        notification_status.c.notification_status,
+        notification_status.c.key_type,
     )
     today = get_london_midnight_in_utc(datetime.utcnow())
     if start_date <= datetime.utcnow().date() <= end_date:
@@ -236,7 +379,7 @@ def fetch_notification_status_totals_for_all_services(start_date, end_date):
         )
     else:
         query = stats.order_by(
-            FactNotificationStatus.notification_type
+            notification_status.c.notification_type
         )
     return query.all()
 
@@ -350,86 +493,66 @@ def fetch_monthly_template_usage_for_service(start_date, end_date, service_id):
     # services_dao.replaces dao_fetch_monthly_historical_usage_by_template_for_service
     stats = db.session.query(
         FactNotificationStatus.template_id.label('template_id'),
-        Template.name.label('name'),
-        Template.template_type.label('template_type'),
-        Template.is_precompiled_letter.label('is_precompiled_letter'),
         extract('month', FactNotificationStatus.bst_date).label('month'),
         extract('year', FactNotificationStatus.bst_date).label('year'),
-        func.sum(FactNotificationStatus.notification_count).label('count')
-    ).join(
-        Template, FactNotificationStatus.template_id == Template.id
+        FactNotificationStatus.notification_count.label('count')
     ).filter(
         FactNotificationStatus.service_id == service_id,
         FactNotificationStatus.bst_date >= start_date,
         FactNotificationStatus.bst_date <= end_date,
         FactNotificationStatus.key_type != KEY_TYPE_TEST,
         FactNotificationStatus.notification_status != NOTIFICATION_CANCELLED,
-    ).group_by(
-        FactNotificationStatus.template_id,
-        Template.name,
-        Template.template_type,
-        Template.is_precompiled_letter,
-        extract('month', FactNotificationStatus.bst_date).label('month'),
-        extract('year', FactNotificationStatus.bst_date).label('year'),
-    ).order_by(
-        extract('year', FactNotificationStatus.bst_date),
-        extract('month', FactNotificationStatus.bst_date),
-        Template.name
     )
 
     if start_date <= datetime.utcnow() <= end_date:
-        today = get_london_midnight_in_utc(datetime.utcnow())
-        month = get_london_month_from_utc_column(Notification.created_at)
-
-        stats_for_today = db.session.query(
-            Notification.template_id.label('template_id'),
-            Template.name.label('name'),
-            Template.template_type.label('template_type'),
-            Template.is_precompiled_letter.label('is_precompiled_letter'),
-            extract('month', month).label('month'),
-            extract('year', month).label('year'),
-            func.count().label('count')
-        ).join(
-            Template, Notification.template_id == Template.id,
-        ).filter(
-            Notification.created_at >= today,
-            Notification.service_id == service_id,
-            Notification.key_type != KEY_TYPE_TEST,
-            Notification.status != NOTIFICATION_CANCELLED
-        ).group_by(
-            Notification.template_id,
-            Template.hidden,
-            Template.name,
-            Template.template_type,
-            month
+        stats = stats.union_all(
+            db.session.query(
+                FactTemplateUsageIntraday.template_id,
+                extract('month', FactTemplateUsageIntraday.bst_date),
+                extract('year', FactTemplateUsageIntraday.bst_date),
+                FactTemplateUsageIntraday.notification_count,
+            ).filter(
+                FactTemplateUsageIntraday.service_id == service_id,
+                FactTemplateUsageIntraday.bst_date == convert_utc_to_bst(datetime.utcnow()).date(),
+                FactTemplateUsageIntraday.notification_status != NOTIFICATION_CANCELLED,
+            )
         )
 
-        all_stats_table = stats.union_all(stats_for_today).subquery()
-        query = db.session.query(
-            all_stats_table.c.template_id,
-            all_stats_table.c.name,
-            all_stats_table.c.is_precompiled_letter,
-            all_stats_table.c.template_type,
-            func.cast(all_stats_table.c.month, Integer).label('month'),
-            func.cast(all_stats_table.c.year, Integer).label('year'),
-            func.cast(func.sum(all_stats_table.c.count), Integer).label('count'),
-        ).group_by(
-            all_stats_table.c.template_id,
-            all_stats_table.c.name,
-            all_stats_table.c.is_precompiled_letter,
-            all_stats_table.c.template_type,
-            all_stats_table.c.month,
-            all_stats_table.c.year,
-        ).order_by(
-            all_stats_table.c.year,
-            all_stats_table.c.month,
-            all_stats_table.c.name
-        )
-    else:
-        query = stats
-    return query.all()
+    all_stats_table = stats.subquery()
+    rows = db.session.query(
+        all_stats_table.c.template_id,
+        func.cast(all_stats_table.c.month, Integer).label('month'),
+        func.cast(all_stats_table.c.year, Integer).label('year'),
+        func.cast(func.sum(all_stats_table.c.count), Integer).label('count'),
+    ).group_by(
+        all_stats_table.c.template_id,
+        all_stats_table.c.month,
+        all_stats_table.c.year,
+    ).all()
+
+    templates = SerialisedTemplateNameCollection.from_service_id(
+        service_id, {row.template_id for row in rows}
+    ).by_id
+
+    return sorted(
+        (
+            MonthlyTemplateUsage(
+                template_id=row.template_id,
+                name=templates[row.template_id].name,
+                template_type=templates[row.template_id].template_type,
+                is_precompiled_letter=templates[row.template_id].is_precompiled_letter,
+                month=row.month,
+                year=row.year,
+                count=row.count,
+            )
+            for row in rows
+            if row.template_id in templates
+        ),
+        key=lambda row: (row.year, row.month, row.name)
+    )
 
 
+@replica_safe
 def get_total_notifications_for_date_range(start_date, end_date):
     query = db.session.query(
         FactNotificationStatus.bst_date.cast(db.Text).label("bst_date"),
@@ -463,6 +586,37 @@ def get_total_notifications_for_date_range(start_date, end_date):
     return query.all()
 
 
+@replica_safe
+def get_total_notifications_for_all_time():
+    """
+    Returns the number of emails, text messages and letters ever sent, not counting test keys. Whole months are
+    read from the monthly snapshots, so this only adds up the days since the last snapshot.
+    """
+    first_day, last_day = db.session.query(
+        func.min(FactNotificationStatus.bst_date),
+        func.max(FactNotificationStatus.bst_date),
+    ).one()
+    if first_day is None:
+        return 0, 0, 0
+
+    notification_status = get_notification_status_source(first_day, last_day)
+
+    def total_for(notification_type):
+        return func.coalesce(func.sum(case(
+            [
+                (notification_status.c.notification_type == notification_type, notification_status.c.notification_count)
+            ],
+            else_=0)), 0)
+
+    return db.session.query(
+        total_for('email').label('emails'),
+        total_for('sms').label('sms'),
+        total_for('letter').label('letters'),
+    ).filter(
+        notification_status.c.key_type != KEY_TYPE_TEST,
+    ).one()
+
+
 def fetch_monthly_notification_statuses_per_service(start_date, end_date):
     return db.session.query(
         func.date_trunc('month', FactNotificationStatus.bst_date).cast(Date).label('date_created'),
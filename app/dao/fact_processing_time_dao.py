@@ -3,7 +3,7 @@ from datetime import datetime
 from sqlalchemy.dialects.postgresql import insert
 
 from app import db
-from app.dao.dao_utils import autocommit
+from app.dao.dao_utils import autocommit, replica_safe
 from app.models import FactProcessingTime
 
 
@@ -32,6 +32,7 @@ def insert_update_processing_time(processing_time):
     db.session.connection().execute(stmt)
 
 
+@replica_safe
 def get_processing_time_percentage_for_date_range(start_date, end_date):
     query = db.session.query(
         FactProcessingTime.bst_date.cast(db.Text).label("date"),
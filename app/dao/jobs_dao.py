@@ -1,4 +1,5 @@
 import uuid
+from collections import namedtuple
 from datetime import datetime, timedelta
 
 from flask import current_app
@@ -6,9 +7,9 @@ from notifications_utils.letter_timings import (
     CANCELLABLE_JOB_LETTER_STATUSES,
     letter_can_be_cancelled,
 )
-from sqlalchemy import and_, asc, desc, func
+from sqlalchemy import and_, asc, desc, func, or_
 
-from app import db
+from app import db, redis_store
 from app.dao.dao_utils import autocommit
 from app.dao.templates_dao import dao_get_template_by_id
 from app.models import (
@@ -27,6 +28,18 @@ from app.models import (
 )
 from app.utils import midnight_n_days_ago
 
+# jobs are only checked for missing rows for a day after they finish, so their progress isn't needed after that
+JOB_SAVED_ROWS_TTL = int(timedelta(days=2).total_seconds())
+# statistics for jobs started more than 3 days ago come from ft_notification_status
+JOB_STATISTICS_TTL = int(timedelta(days=4).total_seconds())
+# only set once a job's counts are known to be complete, so counts for a job that was already running when counting
+# started aren't used until they have been reconciled
+JOB_STATISTICS_COMPLETE_FIELD = '_complete'
+# ids of jobs whose notifications have changed status in bulk, so their statistics need reconciling
+JOB_STATISTICS_STALE_CACHE_KEY = 'job-statistics-stale'
+
+JobStatistic = namedtuple('JobStatistic', ['count', 'status'])
+
 
 def dao_get_notification_outcomes_for_job(service_id, job_id):
     notification_statuses = db.session.query(
@@ -183,8 +196,15 @@ def dao_get_jobs_older_than_data_retention(notification_types):
     return jobs
 
 
-@autocommit
 def dao_cancel_letter_job(job):
+    number_of_notifications_cancelled = _cancel_letter_job(job)
+    # the job has finished, so it won't be reconciled unless we do it now
+    dao_reconcile_job_statistics(job)
+    return number_of_notifications_cancelled
+
+
+@autocommit
+def _cancel_letter_job(job):
     number_of_notifications_cancelled = Notification.query.filter(
         Notification.job_id == job.id
     ).update({'status': NOTIFICATION_CANCELLED,
@@ -253,3 +273,305 @@ def find_missing_row_for_job(job_id, job_size):
         Notification.job_row_number == None  # noqa
     )
     return query.all()
+
+
+def _job_saved_rows_cache_key(job_id):
+    return 'job-{}-saved-rows'.format(job_id)
+
+
+def _job_statistics_cache_key(job_id):
+    return 'job-{}-statistics'.format(job_id)
+
+
+def dao_record_job_row_saved(job_id, row_number, status):
+    """
+    Sets the job's bit for row_number in a redis bitmap, so find_missing_rows_for_job doesn't have to go through the
+    job's notifications, and counts the new notification in the job's statistics.
+    """
+    if not redis_store.active:
+        return
+    saved_rows_key = _job_saved_rows_cache_key(job_id)
+    statistics_key = _job_statistics_cache_key(job_id)
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.setbit(saved_rows_key, row_number, 1)
+        pipe.expire(saved_rows_key, JOB_SAVED_ROWS_TTL)
+        pipe.hincrby(statistics_key, status, 1)
+        pipe.expire(statistics_key, JOB_STATISTICS_TTL)
+        pipe.execute()
+    except Exception:
+        current_app.logger.exception('Redis error recording row {} of job {} as saved'.format(row_number, job_id))
+
+
+def dao_start_job_statistics(job_id):
+    """
+    Call before the job's first row is saved. Nothing has been counted yet, so the job's counts are complete.
+    """
+    if not redis_store.active:
+        return
+    key = _job_statistics_cache_key(job_id)
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.hset(key, JOB_STATISTICS_COMPLETE_FIELD, 1)
+        pipe.expire(key, JOB_STATISTICS_TTL)
+        pipe.execute()
+    except Exception:
+        current_app.logger.exception('Redis error starting statistics for job {}'.format(job_id))
+
+
+def dao_record_job_notification_status_change(job_id, old_status, new_status):
+    if not redis_store.active or old_status == new_status:
+        return
+    key = _job_statistics_cache_key(job_id)
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.hincrby(key, old_status, -1)
+        pipe.hincrby(key, new_status, 1)
+        pipe.expire(key, JOB_STATISTICS_TTL)
+        pipe.execute()
+    except Exception:
+        current_app.logger.exception('Redis error recording a status change for job {}'.format(job_id))
+
+
+def dao_mark_job_statistics_stale(job_ids):
+    """
+    Call after changing the status of job notifications in bulk, so the jobs' statistics are reconciled.
+    """
+    job_ids = {str(job_id) for job_id in job_ids if job_id}
+    if not redis_store.active or not job_ids:
+        return
+    try:
+        redis_store.redis_store.sadd(JOB_STATISTICS_STALE_CACHE_KEY, *job_ids)
+    except Exception:
+        current_app.logger.exception('Redis error marking statistics for jobs {} as stale'.format(job_ids))
+
+
+def _pop_stale_job_ids():
+    if not redis_store.active:
+        return []
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.smembers(JOB_STATISTICS_STALE_CACHE_KEY)
+        pipe.delete(JOB_STATISTICS_STALE_CACHE_KEY)
+        job_ids, _ = pipe.execute()
+    except Exception:
+        current_app.logger.exception('Redis error getting jobs with stale statistics')
+        return []
+    return [job_id.decode('utf-8') for job_id in job_ids]
+
+
+def dao_get_jobs_to_reconcile(finished_since):
+    """
+    Returns the id and service id of jobs that finished processing since finished_since, and of jobs that have been
+    marked as stale since the last time this was called.
+    """
+    query_filter = [Job.processing_finished >= finished_since]
+    stale_job_ids = _pop_stale_job_ids()
+    if stale_job_ids:
+        query_filter.append(Job.id.in_(stale_job_ids))
+    return db.session.query(Job.id, Job.service_id).filter(or_(*query_filter)).all()
+
+
+def dao_reconcile_job_statistics(job):
+    """
+    Counts the job's notifications and replaces its statistics in redis. This catches the status changes that are
+    made in bulk, such as timeouts and letter updates, which aren't counted as they happen.
+
+    The counts are written to a temporary key and renamed over the job's statistics, so readers never see them half
+    written. Status changes counted while the job's notifications are being counted can be lost, so the statistics
+    can drift until the job is next reconciled.
+    """
+    if not redis_store.active:
+        return
+    key = _job_statistics_cache_key(job.id)
+    reconciling_key = '{}-reconciling'.format(key)
+    statistics = {statistic.status: statistic.count for statistic in dao_get_notification_outcomes_for_job(
+        job.service_id, job.id
+    )}
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.delete(reconciling_key)
+        pipe.hset(reconciling_key, mapping={**statistics, JOB_STATISTICS_COMPLETE_FIELD: 1})
+        pipe.expire(reconciling_key, JOB_STATISTICS_TTL)
+        pipe.rename(reconciling_key, key)
+        pipe.execute()
+    except Exception:
+        current_app.logger.exception('Redis error reconciling statistics for job {}'.format(job.id))
+
+
+def _get_cached_job_statistics(job_id):
+    if not redis_store.active:
+        return None
+    try:
+        statistics = redis_store.redis_store.hgetall(_job_statistics_cache_key(job_id))
+    except Exception:
+        current_app.logger.exception('Redis error getting statistics for job {}'.format(job_id))
+        return None
+
+    statistics = {status.decode('utf-8'): int(count) for status, count in statistics.items()}
+    if JOB_STATISTICS_COMPLETE_FIELD not in statistics:
+        return None
+    return sorted(
+        (
+            JobStatistic(count=count, status=status)
+            for status, count in statistics.items()
+            if status != JOB_STATISTICS_COMPLETE_FIELD and count > 0
+        ),
+        key=lambda statistic: statistic.status
+    )
+
+
+def dao_get_job_statistics(service_id, job_id):
+    """
+    Returns the number of the job's notifications in each status, from the counts kept in redis if there are any, or
+    by counting the job's notifications if not.
+    """
+    statistics = _get_cached_job_statistics(job_id)
+    if statistics is None:
+        statistics = dao_get_notification_outcomes_for_job(service_id, job_id)
+    return statistics
+
+
+def _get_job_saved_rows(job_id):
+    if not redis_store.active:
+        return None
+    try:
+        return redis_store.redis_store.get(_job_saved_rows_cache_key(job_id))
+    except Exception:
+        current_app.logger.exception('Redis error getting saved rows for job {}'.format(job_id))
+        return None
+
+
+def _unset_bits(bitmap, size):
+    # redis numbers the bits in each byte from the most significant, so row 0 is 0x80 of the first byte
+    for byte_index in range((size + 7) // 8):
+        byte = bitmap[byte_index] if byte_index < len(bitmap) else 0
+        if byte == 0xFF:
+            continue
+        for bit in range(min(8, size - byte_index * 8)):
+            if not byte & (0x80 >> bit):
+                yield byte_index * 8 + bit
+
+
+def find_missing_rows_for_job(job_id, job_size):
+    """
+    Returns the row numbers of the job that haven't been saved as notifications.
+
+    The rows missing from the job's bitmap are checked against notifications before they are returned, as a row
+    whose bit was lost would otherwise be sent twice. Jobs without a bitmap are checked against every row number.
+    """
+    saved_rows = _get_job_saved_rows(job_id)
+    if saved_rows is None:
+        return [row.missing_row for row in find_missing_row_for_job(job_id, job_size)]
+
+    missing_rows = list(_unset_bits(saved_rows, job_size))
+    if not missing_rows:
+        return []
+
+    found_rows = {
+        row.job_row_number for row in db.session.query(
+            Notification.job_row_number
+        ).filter(
+            Notification.job_id == job_id,
+            Notification.job_row_number.in_(missing_rows),
+        )
+    }
+    return [row for row in missing_rows if row not in found_rows]
+
+
+def dao_get_saved_job_row_numbers(job_id, first_row, last_row):
+    return {
+        row.job_row_number for row in db.session.query(
+            Notification.job_row_number
+        ).filter(
+            Notification.job_id == job_id,
+            Notification.job_row_number >= first_row,
+            Notification.job_row_number <= last_row,
+        )
+    }
+
+
+def _job_shard_progress_cache_key(job_id, first_row):
+    return 'job-{}-shard-{}-progress'.format(job_id, first_row)
+
+
+def _job_resume_cache_key(job_id):
+    return 'job-{}-resume'.format(job_id)
+
+
+def _job_resume_shards_cache_key(job_id, resume_id):
+    return 'job-{}-resume-{}-shards'.format(job_id, resume_id)
+
+
+def dao_record_job_shard_progress(job_id, first_row, last_row_sent):
+    """
+    Records the last row of the shard starting at first_row that has been sent to be saved, so resuming the job
+    doesn't send rows that are still waiting to be saved a second time.
+    """
+    if not redis_store.active:
+        return
+    try:
+        redis_store.redis_store.set(
+            _job_shard_progress_cache_key(job_id, first_row), last_row_sent, ex=JOB_SAVED_ROWS_TTL
+        )
+    except Exception:
+        current_app.logger.exception('Redis error recording progress of shard {} of job {}'.format(first_row, job_id))
+
+
+def dao_get_job_shard_progress(job_id, first_rows):
+    """
+    Returns a dict of the last row sent for each of the shards starting at first_rows that have recorded progress.
+    """
+    if not redis_store.active or not first_rows:
+        return {}
+    try:
+        last_rows_sent = redis_store.redis_store.mget(
+            [_job_shard_progress_cache_key(job_id, first_row) for first_row in first_rows]
+        )
+    except Exception:
+        current_app.logger.exception('Redis error getting progress of shards of job {}'.format(job_id))
+        return {}
+    return {
+        first_row: int(last_row_sent)
+        for first_row, last_row_sent in zip(first_rows, last_rows_sent)
+        if last_row_sent is not None
+    }
+
+
+def dao_start_job_resume(job_id, shard_count):
+    """
+    Records how many shards the job is being resumed in, so the last shard to finish can complete the job. Each resume
+    counts its own shards and becomes the job's latest resume, so shards still running from an earlier resume can't
+    complete the job. Returns the resume's id, or None if it couldn't be recorded, in which case the shards can't be
+    resumed separately.
+    """
+    if not redis_store.active:
+        return None
+    resume_id = str(uuid.uuid4())
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.set(_job_resume_shards_cache_key(job_id, resume_id), shard_count, ex=JOB_SAVED_ROWS_TTL)
+        pipe.set(_job_resume_cache_key(job_id), resume_id, ex=JOB_SAVED_ROWS_TTL)
+        pipe.execute()
+    except Exception:
+        current_app.logger.exception('Redis error starting resume of job {}'.format(job_id))
+        return None
+    return resume_id
+
+
+def dao_finish_job_resume_shard(job_id, resume_id):
+    """
+    Returns how many of the resume's shards are still running, or None if that isn't known or the job has been resumed
+    again since.
+    """
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.decr(_job_resume_shards_cache_key(job_id, resume_id))
+        pipe.get(_job_resume_cache_key(job_id))
+        shards_remaining, latest_resume_id = pipe.execute()
+    except Exception:
+        current_app.logger.exception('Redis error finishing a resumed shard of job {}'.format(job_id))
+        return None
+    if latest_resume_id is None or latest_resume_id.decode('utf-8') != resume_id:
+        return None
+    return shards_remaining
@@ -1,4 +1,5 @@
 import functools
+from collections import namedtuple
 from datetime import datetime, timedelta
 from itertools import groupby
 from operator import attrgetter
@@ -10,22 +11,38 @@ from notifications_utils.international_billing_rates import (
 )
 from notifications_utils.recipients import (
     InvalidEmailError,
+    InvalidPhoneError,
     try_validate_and_format_phone_number,
     validate_and_format_email_address,
+    validate_and_format_phone_number,
 )
 from notifications_utils.timezones import convert_bst_to_utc, convert_utc_to_bst
-from sqlalchemy import and_, asc, desc, func, or_
+from sqlalchemy import (
+    and_,
+    asc,
+    desc,
+    func,
+    inspect,
+    or_,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import functions
 from sqlalchemy.sql.expression import case
 from werkzeug.datastructures import MultiDict
 
-from app import create_uuid, db
+from app import create_uuid, db, redis_store
 from app.clients.sms.firetext import (
     get_message_status_and_reason_from_firetext_code,
 )
-from app.dao.dao_utils import autocommit
+from app.dao.dao_utils import autocommit, replica_safe
+from app.dao.jobs_dao import (
+    dao_mark_job_statistics_stale,
+    dao_record_job_notification_status_change,
+)
 from app.letters.utils import LetterPDFNotFound, find_letter_pdf_in_s3
 from app.models import (
     EMAIL_TYPE,
@@ -57,6 +74,7 @@ from app.utils import (
 )
 
 
+@replica_safe
 def dao_get_last_date_template_was_used(template_id, service_id):
     last_date_from_notifications = db.session.query(
         functions.max(Notification.created_at)
@@ -162,7 +180,10 @@ def update_notification_status_by_id(notification_id, status, sent_by=None, deta
 @autocommit
 def update_notification_status_by_reference(reference, status):
     # this is used to update letters and emails
-    notification = Notification.query.filter(Notification.reference == reference).first()
+    notification = (
+        _get_notification_by_cached_reference(reference, [Notification]) or
+        Notification.query.filter(Notification.reference == reference).first()
+    )
 
     if not notification:
         current_app.logger.error('notification not found for reference {} (update to {})'.format(reference, status))
@@ -181,8 +202,23 @@ def update_notification_status_by_reference(reference, status):
     )
 
 
-@autocommit
 def dao_update_notification(notification):
+    job_id = notification.job_id
+    status_history = inspect(notification).attrs.status.history
+
+    _update_notification(notification)
+
+    # only count the status change once it has been committed, so a rollback can't leave the job's counts wrong
+    if job_id and status_history.added:
+        if status_history.deleted:
+            dao_record_job_notification_status_change(job_id, status_history.deleted[0], status_history.added[0])
+        else:
+            # the old status wasn't loaded before it was changed, so the change can't be counted
+            dao_mark_job_statistics_stale([job_id])
+
+
+@autocommit
+def _update_notification(notification):
     notification.updated_at = datetime.utcnow()
     db.session.add(notification)
 
@@ -247,16 +283,126 @@ def get_notifications_for_service(
     if page_size is None:
         page_size = current_app.config['PAGE_SIZE']
 
-    filters = [Notification.service_id == service_id]
-
-    if limit_days is not None:
-        filters.append(Notification.created_at >= midnight_n_days_ago(limit_days))
+    filters = _get_notifications_for_service_filters(
+        service_id,
+        limit_days=limit_days,
+        key_type=key_type,
+        include_jobs=include_jobs,
+        include_from_test_key=include_from_test_key,
+        client_reference=client_reference,
+        include_one_off=include_one_off,
+    )
 
     if older_than is not None:
         older_than_created_at = db.session.query(
             Notification.created_at).filter(Notification.id == older_than).as_scalar()
         filters.append(Notification.created_at < older_than_created_at)
 
+    query = Notification.query.filter(*filters)
+    query = _filter_query(query, filter_dict)
+    if personalisation:
+        query = query.options(
+            joinedload('template')
+        )
+
+    return query.order_by(desc(Notification.created_at)).paginate(
+        page=page,
+        per_page=page_size,
+        count=count_pages
+    )
+
+
+def get_notifications_for_service_by_cursor(
+        service_id,
+        filter_dict=None,
+        cursor=None,
+        older_than=None,
+        page_size=None,
+        limit_days=None,
+        key_type=None,
+        personalisation=False,
+        include_jobs=False,
+        include_from_test_key=False,
+        client_reference=None,
+        include_one_off=True
+):
+    """
+    Keyset paginated version of get_notifications_for_service. Rather than using OFFSET and COUNT(*), this orders
+    by (created_at, id) and only fetches rows that sort after the cursor, so each page costs the same regardless of
+    how far back through a service's notifications we are.
+
+    `cursor` is a (created_at, id) tuple, as returned by `KeysetPage.next_cursor`. `older_than` is a notification id
+    and is resolved to a cursor with a primary key lookup. If that notification doesn't exist the page is empty.
+
+    Fetches one row more than `page_size` so we know whether there is a next page without counting.
+    """
+    if page_size is None:
+        page_size = current_app.config['PAGE_SIZE']
+
+    if older_than is not None:
+        cursor = db.session.query(
+            Notification.created_at, Notification.id
+        ).filter(
+            Notification.id == older_than
+        ).first()
+
+        if cursor is None:
+            return KeysetPage(items=[], has_next=False)
+
+    filters = _get_notifications_for_service_filters(
+        service_id,
+        limit_days=limit_days,
+        key_type=key_type,
+        include_jobs=include_jobs,
+        include_from_test_key=include_from_test_key,
+        client_reference=client_reference,
+        include_one_off=include_one_off,
+    )
+
+    if cursor is not None:
+        filters.append(tuple_(Notification.created_at, Notification.id) < tuple(cursor))
+
+    query = Notification.query.filter(*filters)
+    query = _filter_query(query, filter_dict)
+    if personalisation:
+        query = query.options(
+            joinedload('template')
+        )
+
+    notifications = query.order_by(
+        desc(Notification.created_at),
+        desc(Notification.id)
+    ).limit(
+        page_size + 1
+    ).all()
+
+    return KeysetPage(items=notifications[:page_size], has_next=len(notifications) > page_size)
+
+
+class KeysetPage(namedtuple('KeysetPage', ['items', 'has_next'])):
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        last = self.items[-1]
+        return last.created_at, last.id
+
+
+def _get_notifications_for_service_filters(
+        service_id,
+        limit_days=None,
+        key_type=None,
+        include_jobs=False,
+        include_from_test_key=False,
+        client_reference=None,
+        include_one_off=True
+):
+    filters = [Notification.service_id == service_id]
+
+    if limit_days is not None:
+        filters.append(Notification.created_at >= midnight_n_days_ago(limit_days))
+
     if not include_jobs:
         filters.append(Notification.job_id == None)  # noqa
 
@@ -271,18 +417,7 @@ def get_notifications_for_service(
     if client_reference is not None:
         filters.append(Notification.client_reference == client_reference)
 
-    query = Notification.query.filter(*filters)
-    query = _filter_query(query, filter_dict)
-    if personalisation:
-        query = query.options(
-            joinedload('template')
-        )
-
-    return query.order_by(desc(Notification.created_at)).paginate(
-        page=page,
-        per_page=page_size,
-        count=count_pages
-    )
+    return filters
 
 
 def _filter_query(query, filter_dict=None):
@@ -466,24 +601,57 @@ def dao_delete_notifications_by_id(notification_id):
     ).delete(synchronize_session='fetch')
 
 
-def _timeout_notifications(current_statuses, new_status, timeout_start, updated_at):
-    notifications = Notification.query.filter(
-        Notification.created_at < timeout_start,
-        Notification.status.in_(current_statuses),
-        Notification.notification_type != LETTER_TYPE
-    ).all()
-    Notification.query.filter(
-        Notification.created_at < timeout_start,
-        Notification.status.in_(current_statuses),
-        Notification.notification_type != LETTER_TYPE
-    ).update(
-        {'status': new_status, 'updated_at': updated_at},
-        synchronize_session=False
+def _timeout_notifications(current_statuses, new_status, timeout_start, updated_at, batch_size):
+    """
+    Updates matching notifications to the new status `batch_size` rows at a time, committing after each batch, and
+    yields a lightweight row (not an ORM object) for each notification that was updated. After an incident there can
+    be hundreds of thousands of these, so we never hold more than one batch in memory.
+
+    Notifications that have moved to the new status no longer match the filter, so each batch picks up where the last
+    one left off. Rows locked by another transaction (for example a delivery receipt) are skipped until the next run.
+    """
+    notifications_to_timeout = select([
+        Notification.id
+    ]).where(
+        and_(
+            Notification.created_at < timeout_start,
+            Notification.status.in_(current_statuses),
+            Notification.notification_type != LETTER_TYPE
+        )
+    ).limit(
+        batch_size
+    ).with_for_update(skip_locked=True)
+
+    timeout_batch = update(Notification.__table__).where(
+        Notification.id.in_(notifications_to_timeout)
+    ).values(
+        status=new_status,
+        updated_at=updated_at
+    ).returning(
+        Notification.id,
+        Notification.service_id,
+        Notification.client_reference,
+        Notification.to,
+        Notification.status.label('status'),
+        Notification.notification_type,
+        Notification.created_at,
+        Notification.updated_at,
+        Notification.sent_at,
+        Notification.template_id,
+        Notification.template_version,
     )
-    return notifications
 
+    while True:
+        timed_out = db.session.execute(timeout_batch).fetchall()
+        db.session.commit()
+
+        yield from timed_out
+
+        if len(timed_out) < batch_size:
+            return
 
-def dao_timeout_notifications(timeout_period_in_seconds):
+
+def dao_timeout_notifications(timeout_period_in_seconds, batch_size=10000):
     """
     Timeout SMS and email notifications by the following rules:
 
@@ -495,21 +663,21 @@ def dao_timeout_notifications(timeout_period_in_seconds):
         pending -> temporary-failure
 
     Letter notifications are not timed out
+
+    This is a generator - notifications are only updated as it is iterated over. Each row yielded has the
+    notification's new status.
     """
     timeout_start = datetime.utcnow() - timedelta(seconds=timeout_period_in_seconds)
     updated_at = datetime.utcnow()
-    timeout = functools.partial(_timeout_notifications, timeout_start=timeout_start, updated_at=updated_at)
+    timeout = functools.partial(
+        _timeout_notifications, timeout_start=timeout_start, updated_at=updated_at, batch_size=batch_size
+    )
 
     # Notifications still in created status are marked with a technical-failure:
-    technical_failure_notifications = timeout([NOTIFICATION_CREATED], NOTIFICATION_TECHNICAL_FAILURE)
+    yield from timeout([NOTIFICATION_CREATED], NOTIFICATION_TECHNICAL_FAILURE)
 
     # Notifications still in sending or pending status are marked with a temporary-failure:
-    temporary_failure_notifications = timeout([NOTIFICATION_SENDING, NOTIFICATION_PENDING],
-                                              NOTIFICATION_TEMPORARY_FAILURE)
-
-    db.session.commit()
-
-    return technical_failure_notifications, temporary_failure_notifications
+    yield from timeout([NOTIFICATION_SENDING, NOTIFICATION_PENDING], NOTIFICATION_TEMPORARY_FAILURE)
 
 
 def is_delivery_slow_for_providers(
@@ -571,12 +739,30 @@ def is_delivery_slow_for_providers(
 
 @autocommit
 def dao_update_notifications_by_reference(references, update_dict):
+    if len(references) == 1:
+        # Delivery receipts update one notification at a time. If we saw the reference when sending we can go
+        # straight to the row by its primary key
+        notification_id = _get_notification_id_by_cached_reference(references[0])
+        if notification_id:
+            updated_count, updated_history_count = _update_notification_or_history_by_id(
+                notification_id, references[0], update_dict
+            )
+            # if nothing matched the cached id is stale, so fall back to looking the reference up
+            if updated_count or updated_history_count:
+                return updated_count, updated_history_count
+
     updated_count = Notification.query.filter(
         Notification.reference.in_(references)
     ).update(
         update_dict,
         synchronize_session=False
     )
+    if updated_count and 'status' in update_dict:
+        # bulk status changes aren't counted as they happen, so have the jobs' statistics reconciled
+        dao_mark_job_statistics_stale(job_id for job_id, in db.session.query(Notification.job_id).filter(
+            Notification.reference.in_(references),
+            Notification.job_id.isnot(None),
+        ).distinct())
 
     updated_history_count = 0
     if updated_count != len(references):
@@ -590,6 +776,29 @@ def dao_update_notifications_by_reference(references, update_dict):
     return updated_count, updated_history_count
 
 
+def _update_notification_or_history_by_id(notification_id, reference, update_dict):
+    updated_count = Notification.query.filter(
+        Notification.id == notification_id,
+        Notification.reference == reference,
+    ).update(
+        update_dict,
+        synchronize_session=False
+    )
+
+    updated_history_count = 0
+    if not updated_count:
+        updated_history_count = NotificationHistory.query.filter(
+            NotificationHistory.id == notification_id,
+            NotificationHistory.reference == reference,
+        ).update(
+            update_dict,
+            synchronize_session=False
+        )
+
+    return updated_count, updated_history_count
+
+
+@replica_safe
 def dao_get_notifications_by_recipient_or_reference(
     service_id,
     search_term,
@@ -598,6 +807,12 @@ def dao_get_notifications_by_recipient_or_reference(
     page=1,
     page_size=None,
 ):
+    """
+    Partial matches on normalised_to and client_reference are served by the trigram GIN indexes created in migration
+    0351. If the search term is a complete UK phone number or email address we already know exactly what will be in
+    normalised_to, so we look for that value directly rather than doing a partial match.
+    """
+    exact_recipient = _get_exact_recipient_for_search_term(search_term, notification_type)
 
     if notification_type == SMS_TYPE:
         normalised = try_validate_and_format_phone_number(search_term)
@@ -630,10 +845,15 @@ def dao_get_notifications_by_recipient_or_reference(
     normalised = escape_special_characters(normalised)
     search_term = escape_special_characters(search_term)
 
+    if exact_recipient is not None:
+        recipient_filter = Notification.normalised_to == exact_recipient
+    else:
+        recipient_filter = Notification.normalised_to.like("%{}%".format(normalised))
+
     filters = [
         Notification.service_id == service_id,
         or_(
-            Notification.normalised_to.like("%{}%".format(normalised)),
+            recipient_filter,
             Notification.client_reference.ilike("%{}%".format(search_term)),
         ),
         Notification.key_type != KEY_TYPE_TEST,
@@ -651,6 +871,27 @@ def dao_get_notifications_by_recipient_or_reference(
     return results
 
 
+def _get_exact_recipient_for_search_term(search_term, notification_type):
+    """
+    Returns the value normalised_to would hold if the search term is a complete recipient, otherwise None.
+
+    Only UK numbers are treated as complete - a partial UK number can look like a valid international one.
+    """
+    if notification_type == SMS_TYPE:
+        try:
+            return validate_and_format_phone_number(search_term, international=False)
+        except InvalidPhoneError:
+            return None
+
+    if notification_type == EMAIL_TYPE:
+        try:
+            return validate_and_format_email_address(search_term)
+        except InvalidEmailError:
+            return None
+
+    return None
+
+
 def dao_get_notification_by_reference(reference):
     return Notification.query.filter(
         Notification.reference == reference
@@ -658,6 +899,10 @@ def dao_get_notification_by_reference(reference):
 
 
 def dao_get_notification_or_history_by_reference(reference):
+    notification = _get_notification_by_cached_reference(reference, [Notification, NotificationHistory])
+    if notification:
+        return notification
+
     try:
         # This try except is necessary because in test keys and research mode does not create notification history.
         # Otherwise we could just search for the NotificationHistory object
@@ -670,6 +915,46 @@ def dao_get_notification_or_history_by_reference(reference):
         ).one()
 
 
+def dao_cache_notification_reference(notification):
+    """
+    Remember which notification a provider reference belongs to. Delivery receipts only give us the reference, and
+    looking that up means searching the reference index on notifications and then notification_history. With this we
+    can fetch the notification by primary key instead.
+    """
+    if notification.reference:
+        redis_store.set(
+            _notification_reference_cache_key(notification.reference),
+            str(notification.id),
+            ex=current_app.config['EXPIRE_CACHE_EIGHT_DAYS']
+        )
+
+
+def _notification_reference_cache_key(reference):
+    return 'notification-reference-{}'.format(reference)
+
+
+def _get_notification_id_by_cached_reference(reference):
+    notification_id = redis_store.get(_notification_reference_cache_key(reference))
+    return notification_id.decode('utf-8') if notification_id else None
+
+
+def _get_notification_by_cached_reference(reference, models):
+    """
+    Looks for the cached notification in each of models in turn, so the cache is only read once.
+    """
+    notification_id = _get_notification_id_by_cached_reference(reference)
+    if not notification_id:
+        return None
+
+    for model in models:
+        notification = model.query.get(notification_id)
+        if notification:
+            # guard against a stale cache entry pointing at a notification that has since been given a different
+            # reference
+            return notification if notification.reference == reference else None
+    return None
+
+
 def dao_get_notifications_by_references(references):
     return Notification.query.filter(
         Notification.reference.in_(references)
@@ -724,14 +1009,25 @@ def dao_get_last_notification_added_for_job_id(job_id):
     return last_notification_added
 
 
-def notifications_not_yet_sent(should_be_sending_after_seconds, notification_type):
+def notifications_not_yet_sent(should_be_sending_after_seconds, notification_type, query_limit=10000):
+    """
+    Yields the id, key type, notification type and service research mode of each notification that should have been
+    sent by now, fetching `query_limit` rows at a time.
+    """
     older_than_date = datetime.utcnow() - timedelta(seconds=should_be_sending_after_seconds)
 
-    notifications = Notification.query.filter(
+    notifications = db.session.query(
+        Notification.id,
+        Notification.key_type,
+        Notification.notification_type,
+        Service.research_mode,
+    ).join(
+        Service, Notification.service_id == Service.id
+    ).filter(
         Notification.created_at <= older_than_date,
         Notification.notification_type == notification_type,
         Notification.status == NOTIFICATION_CREATED
-    ).all()
+    ).yield_per(query_limit)
     return notifications
 
 
@@ -739,19 +1035,20 @@ def dao_get_letters_to_be_printed(print_run_deadline, postage, query_limit=10000
     """
     Return all letters created before the print run deadline that have not yet been sent. This yields in batches of 10k
     to prevent the query taking too long and eating up too much memory. As each 10k batch is yielded, the
-    get_key_and_size_of_letters_to_be_sent_to_print function will go and fetch the s3 data, andhese  start sending off
+    get_key_and_size_of_letters_to_be_sent_to_print function will look up the s3 data, and these start sending off
     tasks to the notify-ftp app to send them.
 
-    CAUTION! Modify this query with caution. Modifying filters etc is fine, but if we join onto another table, then
-    there may be undefined behaviour. Essentially we need each ORM object returned for each row to be unique,
-    and we should avoid modifying state of returned objects.
+    Only the columns needed to find each letter's PDF are fetched, rather than full ORM objects, as there can be
+    hundreds of thousands of letters in a print run.
 
     For more reading:
     https://docs.sqlalchemy.org/en/13/orm/query.html?highlight=yield_per#sqlalchemy.orm.query.Query.yield_per
-    https://www.mail-archive.com/sqlalchemy@googlegroups.com/msg12443.html
     """
-    notifications = Notification.query.join(
-        Notification.service
+    notifications = db.session.query(
+        Notification.id,
+        Notification.reference,
+        Notification.created_at,
+        Notification.service_id,
     ).filter(
         Notification.created_at < convert_bst_to_utc(print_run_deadline),
         Notification.notification_type == LETTER_TYPE,
@@ -787,7 +1084,9 @@ def dao_old_letters_with_created_status():
     yesterday_bst = convert_utc_to_bst(datetime.utcnow()) - timedelta(days=1)
     last_processing_deadline = yesterday_bst.replace(hour=17, minute=30, second=0, microsecond=0)
 
-    notifications = Notification.query.filter(
+    notifications = db.session.query(
+        Notification.id,
+    ).filter(
         Notification.created_at < convert_bst_to_utc(last_processing_deadline),
         Notification.notification_type == LETTER_TYPE,
         Notification.status == NOTIFICATION_CREATED
@@ -800,7 +1099,9 @@ def dao_old_letters_with_created_status():
 def letters_missing_from_sending_bucket(seconds_to_subtract):
     older_than_date = datetime.utcnow() - timedelta(seconds=seconds_to_subtract)
     # We expect letters to have a `created` status, updated_at timestamp and billable units greater than zero.
-    notifications = Notification.query.filter(
+    notifications = db.session.query(
+        Notification.id,
+    ).filter(
         Notification.billable_units == 0,
         Notification.updated_at == None,  # noqa
         Notification.status == NOTIFICATION_CREATED,
@@ -817,7 +1118,10 @@ def letters_missing_from_sending_bucket(seconds_to_subtract):
 def dao_precompiled_letters_still_pending_virus_check():
     ninety_minutes_ago = datetime.utcnow() - timedelta(seconds=5400)
 
-    notifications = Notification.query.filter(
+    notifications = db.session.query(
+        Notification.id,
+        Notification.reference,
+    ).filter(
         Notification.created_at < ninety_minutes_ago,
         Notification.status == NOTIFICATION_PENDING_VIRUS_CHECK
     ).order_by(
@@ -1,10 +1,11 @@
 from datetime import datetime, timedelta
+from functools import wraps
 
 from flask import current_app
 from notifications_utils.timezones import convert_utc_to_bst
 from sqlalchemy import asc, desc, func
 
-from app import db
+from app import db, redis_store
 from app.dao.dao_utils import autocommit
 from app.models import (
     SMS_TYPE,
@@ -14,6 +15,26 @@ from app.models import (
     User,
 )
 
+PROVIDER_DETAILS_VERSION_CACHE_KEY = 'provider-details-version'
+
+
+def get_provider_details_version():
+    return redis_store.get(PROVIDER_DETAILS_VERSION_CACHE_KEY)
+
+
+def provider_details_changed(func):
+    """
+    Bumps the provider details version once the wrapped function has returned, so every process routing
+    notifications reloads its providers. Put this outside `autocommit` so the change is committed before anyone
+    can see the new version.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        redis_store.incr(PROVIDER_DETAILS_VERSION_CACHE_KEY)
+        return result
+    return wrapper
+
 
 def get_provider_details_by_id(provider_details_id):
     return ProviderDetails.query.get(provider_details_id)
@@ -75,6 +96,7 @@ def _get_sms_providers_for_update(time_threshold):
     return q
 
 
+@provider_details_changed
 @autocommit
 def dao_reduce_sms_provider_priority(identifier, *, time_threshold):
     """
@@ -101,6 +123,7 @@ def dao_reduce_sms_provider_priority(identifier, *, time_threshold):
     _adjust_provider_priority(increased_provider, increased_provider_priority)
 
 
+@provider_details_changed
 @autocommit
 def dao_adjust_provider_priority_back_to_resting_points():
     """
@@ -135,6 +158,7 @@ def get_provider_details_by_notification_type(notification_type, supports_intern
     return ProviderDetails.query.filter(*filters).order_by(asc(ProviderDetails.priority)).all()
 
 
+@provider_details_changed
 @autocommit
 def dao_update_provider_details(provider_details):
     _update_provider_details_without_commit(provider_details)
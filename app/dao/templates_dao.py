@@ -129,6 +129,20 @@ def dao_get_all_templates_for_service(service_id, template_type=None):
     ).all()
 
 
+def dao_get_template_names_for_service(service_id):
+    """
+    Returns the id, name, type and hidden flag of every template the service has, including archived and hidden ones.
+    """
+    return db.session.query(
+        Template.id,
+        Template.name,
+        Template.template_type,
+        Template.hidden,
+    ).filter(
+        Template.service_id == service_id
+    ).all()
+
+
 def dao_get_template_versions(service_id, template_id):
     return TemplateHistory.query.filter_by(
         service_id=service_id, id=template_id,
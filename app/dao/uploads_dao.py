@@ -4,6 +4,7 @@ from flask import current_app
 from sqlalchemy import String, and_, desc, func, literal, text
 
 from app import db
+from app.dao.dao_utils import replica_safe
 from app.models import (
     JOB_STATUS_CANCELLED,
     JOB_STATUS_SCHEDULED,
@@ -39,6 +40,7 @@ def _naive_gmt_to_utc(column):
     return func.timezone('UTC', func.timezone('Europe/London', column))
 
 
+@replica_safe
 def dao_get_uploads_by_service_id(service_id, limit_days=None, page=1, page_size=50):
     # Hardcoded filter to exclude cancelled or scheduled jobs
     # for the moment, but we may want to change this method take 'statuses' as a argument in the future
@@ -130,6 +132,7 @@ def dao_get_uploads_by_service_id(service_id, limit_days=None, page=1, page_size
     ).paginate(page=page, per_page=page_size)
 
 
+@replica_safe
 def dao_get_uploaded_letters_by_print_date(service_id, letter_print_date, page=1, page_size=50):
     return db.session.query(
         Notification,
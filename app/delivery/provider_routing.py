@@ -0,0 +1,71 @@
+import time
+from collections import namedtuple
+from threading import RLock
+
+from app.dao.provider_details_dao import (
+    get_provider_details_by_notification_type,
+    get_provider_details_version,
+)
+
+RoutedProvider = namedtuple('RoutedProvider', ['identifier', 'priority'])
+
+
+class ProviderRoutingTable:
+    """
+    The active providers and their priorities for each notification type, held in memory so that choosing a provider
+    doesn't need the database.
+
+    At most once every `version_check_interval` seconds the provider details version in redis is compared with the
+    one the table was loaded at, and the table is emptied if it has moved on. The priority adjustments bump that
+    version, so failover reaches every process within a second. If redis is unavailable the table is still reloaded
+    every `max_age` seconds.
+    """
+
+    def __init__(self, version_check_interval=1, max_age=60):
+        self.version_check_interval = version_check_interval
+        self.max_age = max_age
+        self.lock = RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.providers = {}
+            self.version = None
+            self.loaded_at = None
+            self.version_checked_at = None
+
+    def get_active_providers(self, notification_type, international=False):
+        self._refresh_if_stale()
+
+        key = (notification_type, international)
+        with self.lock:
+            if key not in self.providers:
+                self.providers[key] = [
+                    RoutedProvider(provider.identifier, provider.priority)
+                    for provider in get_provider_details_by_notification_type(notification_type, international)
+                    if provider.active
+                ]
+            return self.providers[key]
+
+    def _refresh_if_stale(self):
+        now = time.monotonic()
+
+        with self.lock:
+            if (
+                self.loaded_at is not None and
+                now - self.loaded_at < self.max_age and
+                now - self.version_checked_at < self.version_check_interval
+            ):
+                return
+
+        version = get_provider_details_version()
+
+        with self.lock:
+            self.version_checked_at = now
+            if self.loaded_at is None or now - self.loaded_at >= self.max_age or version != self.version:
+                self.providers = {}
+                self.version = version
+                self.loaded_at = now
+
+
+provider_routing_table = ProviderRoutingTable()
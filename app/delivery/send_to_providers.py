@@ -2,25 +2,21 @@ import random
 from datetime import datetime, timedelta
 from urllib import parse
 
-from cachetools import TTLCache, cached
 from flask import current_app
-from notifications_utils.template import (
-    HTMLEmailTemplate,
-    PlainTextEmailTemplate,
-    SMSMessageTemplate,
-)
 
 from app import create_uuid, notification_provider_clients, statsd_client
 from app.celery.research_mode_tasks import (
     send_email_response,
     send_sms_response,
 )
-from app.dao.email_branding_dao import dao_get_email_branding_by_id
-from app.dao.notifications_dao import dao_update_notification
-from app.dao.provider_details_dao import (
-    dao_reduce_sms_provider_priority,
-    get_provider_details_by_notification_type,
+from app.dao.notifications_dao import (
+    dao_cache_notification_reference,
+    dao_update_notification,
 )
+from app.dao.provider_details_dao import dao_reduce_sms_provider_priority
+from app.delivery.provider_routing import provider_routing_table
+from app.delivery.sms_delivery_latency import record_sms_sent
+from app.delivery.template_cache import render_email, render_sms
 from app.exceptions import NotificationTechnicalFailureException
 from app.models import (
     BRANDING_BOTH,
@@ -33,7 +29,11 @@ from app.models import (
     NOTIFICATION_TECHNICAL_FAILURE,
     SMS_TYPE,
 )
-from app.serialised_models import SerialisedService, SerialisedTemplate
+from app.serialised_models import (
+    SerialisedEmailBranding,
+    SerialisedService,
+    SerialisedTemplate,
+)
 
 
 def send_sms_to_provider(notification):
@@ -50,12 +50,6 @@ def send_sms_to_provider(notification):
             template_id=notification.template_id, service_id=service.id, version=notification.template_version
         )
 
-        template = SMSMessageTemplate(
-            template_model.__dict__,
-            values=notification.personalisation,
-            prefix=service.name,
-            show_prefix=service.prefix_sms,
-        )
         created_at = notification.created_at
         key_type = notification.key_type
         if service.research_mode or notification.key_type == KEY_TYPE_TEST:
@@ -63,21 +57,28 @@ def send_sms_to_provider(notification):
             send_sms_response(provider.get_name(), str(notification.id), notification.to)
 
         else:
+            content, fragment_count = render_sms(
+                template_model.__dict__,
+                notification.personalisation,
+                prefix=service.name,
+                show_prefix=service.prefix_sms,
+            )
             try:
                 provider.send_sms(
                     to=notification.normalised_to,
-                    content=str(template),
+                    content=content,
                     reference=str(notification.id),
                     sender=notification.reply_to_text
                 )
             except Exception as e:
-                notification.billable_units = template.fragment_count
+                notification.billable_units = fragment_count
                 dao_update_notification(notification)
                 dao_reduce_sms_provider_priority(provider.get_name(), time_threshold=timedelta(minutes=1))
                 raise e
             else:
-                notification.billable_units = template.fragment_count
+                notification.billable_units = fragment_count
                 update_notification_to_sending(notification, provider)
+                record_sms_sent(provider.get_name(), notification.sent_at)
 
         delta_seconds = (datetime.utcnow() - created_at).total_seconds()
         statsd_client.timing("sms.total-time", delta_seconds)
@@ -105,15 +106,10 @@ def send_email_to_provider(notification):
             template_id=notification.template_id, service_id=service.id, version=notification.template_version
         ).__dict__
 
-        html_email = HTMLEmailTemplate(
+        subject, plain_text_body, html_body = render_email(
             template_dict,
-            values=notification.personalisation,
-            **get_html_email_options(service)
-        )
-
-        plain_text_email = PlainTextEmailTemplate(
-            template_dict,
-            values=notification.personalisation
+            notification.personalisation,
+            get_html_email_options(service),
         )
         created_at = notification.created_at
         key_type = notification.key_type
@@ -128,9 +124,9 @@ def send_email_to_provider(notification):
             reference = provider.send_email(
                 from_address,
                 notification.normalised_to,
-                plain_text_email.subject,
-                body=str(plain_text_email),
-                html_body=str(html_email),
+                subject,
+                body=plain_text_body,
+                html_body=html_body,
                 reply_to_address=notification.reply_to_text
             )
             notification.reference = reference
@@ -153,16 +149,11 @@ def update_notification_to_sending(notification, provider):
     if notification.status not in NOTIFICATION_STATUS_TYPES_COMPLETED:
         notification.status = NOTIFICATION_SENT if notification.international else NOTIFICATION_SENDING
     dao_update_notification(notification)
+    dao_cache_notification_reference(notification)
 
 
-provider_cache = TTLCache(maxsize=8, ttl=10)
-
-
-@cached(cache=provider_cache)
 def provider_to_use(notification_type, international=False):
-    active_providers = [
-        p for p in get_provider_details_by_notification_type(notification_type, international) if p.active
-    ]
+    active_providers = provider_routing_table.get_active_providers(notification_type, international)
 
     if not active_providers:
         current_app.logger.error(
@@ -203,7 +194,7 @@ def get_html_email_options(service):
             'brand_banner': False,
         }
     if isinstance(service, SerialisedService):
-        branding = dao_get_email_branding_by_id(service.email_branding)
+        branding = SerialisedEmailBranding.from_id(service.email_branding)
     else:
         branding = service.email_branding
 
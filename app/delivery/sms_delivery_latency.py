@@ -0,0 +1,185 @@
+"""
+Per provider text message delivery times, kept in redis as a histogram for each minute notifications were sent in.
+
+Each minute has a hash holding how many notifications went to the provider, how many failed and how many were
+delivered in each latency bucket. Reading the last few minutes gives a sliding window without touching the
+notifications table.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import redis_store, statsd_client
+
+# upper bounds, in seconds, of the latency buckets. Anything slower lands in the last, unbounded, bucket.
+LATENCY_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 300, 420, 600, 900, 1800, 3600)
+
+SENT_FIELD = 'sent'
+FAILED_FIELD = 'failed'
+
+# long enough for the slowest receipts to still find the minute they were sent in
+EXPIRE_AFTER = int(timedelta(hours=2).total_seconds())
+
+DeliveryCounts = namedtuple('DeliveryCounts', ['sent', 'failed', 'latency_counts'])
+DeliverySummary = namedtuple('DeliverySummary', ['total', 'slow', 'latency_counts'])
+
+
+def _cache_key(provider, minute):
+    return 'sms-delivery-latency-{}-{}'.format(provider, minute.strftime('%Y-%m-%dT%H:%M'))
+
+
+def _latency_field(bucket):
+    return 'latency-{}'.format(bucket)
+
+
+def _bucket_lower_bound(bucket):
+    return LATENCY_BUCKETS[bucket - 1] if bucket else 0
+
+
+def _minutes_between(start, end):
+    minute = start.replace(second=0, microsecond=0)
+    while minute <= end:
+        yield minute
+        minute += timedelta(minutes=1)
+
+
+def _increment(provider, sent_at, field):
+    if not redis_store.active:
+        return
+    key = _cache_key(provider, sent_at)
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.hincrby(key, field, 1)
+        pipe.expire(key, EXPIRE_AFTER)
+        pipe.execute()
+    except Exception:
+        current_app.logger.exception('Failed to record sms delivery for {}'.format(key))
+
+
+def record_sms_sent(provider, sent_at):
+    _increment(provider, sent_at, SENT_FIELD)
+
+
+def record_sms_delivered(provider, sent_at, delivered_at):
+    latency = (delivered_at - sent_at).total_seconds()
+    _increment(provider, sent_at, _latency_field(bisect_right(LATENCY_BUCKETS, latency)))
+
+
+def record_sms_failed(provider, sent_at):
+    _increment(provider, sent_at, FAILED_FIELD)
+
+
+def get_delivery_counts(provider, minutes):
+    """
+    Returns a DeliveryCounts for each of the given minutes, in the same order, or None if they can't be read.
+    """
+    if not redis_store.active:
+        return None
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        for minute in minutes:
+            pipe.hgetall(_cache_key(provider, minute))
+        results = pipe.execute()
+    except Exception:
+        current_app.logger.exception('Failed to get sms delivery counts for {}'.format(provider))
+        return None
+
+    delivery_counts = []
+    for counts in results:
+        counts = {
+            (key.decode('utf-8') if isinstance(key, bytes) else key): int(value)
+            for key, value in counts.items()
+        }
+        delivery_counts.append(DeliveryCounts(
+            sent=counts.get(SENT_FIELD, 0),
+            failed=counts.get(FAILED_FIELD, 0),
+            latency_counts=[counts.get(_latency_field(bucket), 0) for bucket in range(len(LATENCY_BUCKETS) + 1)],
+        ))
+    return delivery_counts
+
+
+def get_delivery_summary(provider, window, delivery_time):
+    """
+    Adds up the notifications sent to a provider in the last `window`. A notification is slow if it was delivered
+    after `delivery_time`, or has had no receipt for longer than that. Failed notifications aren't counted.
+
+    `delivery_time` should be one of the bucket bounds - a bucket straddling it isn't counted as slow.
+
+    Returns None if the counts can't be read from redis.
+    """
+    now = datetime.utcnow()
+    minutes = list(_minutes_between(now - window, now))
+    delivery_counts = get_delivery_counts(provider, minutes)
+    if delivery_counts is None:
+        return None
+
+    total = 0
+    slow = 0
+    latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    for minute, counts in zip(minutes, delivery_counts):
+        delivered = sum(counts.latency_counts)
+        total += max(counts.sent - counts.failed, delivered)
+        slow += sum(
+            count for bucket, count in enumerate(counts.latency_counts)
+            if _bucket_lower_bound(bucket) >= delivery_time.total_seconds()
+        )
+        # only notifications sent more than `delivery_time` ago can be overdue
+        if minute + timedelta(minutes=1) <= now - delivery_time:
+            slow += max(0, counts.sent - counts.failed - delivered)
+        latency_counts = [a + b for a, b in zip(latency_counts, counts.latency_counts)]
+
+    return DeliverySummary(total=total, slow=slow, latency_counts=latency_counts)
+
+
+def get_latency_percentile(latency_counts, percentile):
+    """
+    Returns the upper bound, in seconds, of the bucket the given percentile (0 to 100) of deliveries fall in, or
+    None if nothing was delivered. Deliveries slower than the last bound are reported as the last bound.
+    """
+    total = sum(latency_counts)
+    if not total:
+        return None
+
+    running_total = 0
+    for bucket, count in enumerate(latency_counts):
+        running_total += count
+        if running_total * 100 >= total * percentile:
+            return LATENCY_BUCKETS[min(bucket, len(LATENCY_BUCKETS) - 1)]
+
+
+def is_delivery_slow_for_providers(providers, threshold, window, delivery_time):
+    """
+    Returns a dict of providers and whether they are currently slow or not. eg:
+    {
+        'mmg': True,
+        'firetext': False
+    }
+
+    Also sends the 50th, 95th and 99th percentile delivery times for each provider to statsd. Returns None if the
+    delivery times can't be read from redis.
+    """
+    slow_providers = {}
+    for provider in providers:
+        summary = get_delivery_summary(provider, window, delivery_time)
+        if summary is None:
+            return None
+        slow_providers[provider] = bool(summary.total) and summary.slow / summary.total >= threshold
+
+        percentiles = {
+            percentile: get_latency_percentile(summary.latency_counts, percentile)
+            for percentile in (50, 95, 99)
+        }
+        for percentile, seconds in percentiles.items():
+            if seconds is not None:
+                statsd_client.gauge('sms-delivery-latency.{}.p{}'.format(provider, percentile), seconds)
+
+        current_app.logger.info(
+            "Slow delivery notifications count for provider {}: {} out of {}. p50 {}s p95 {}s p99 {}s".format(
+                provider, summary.slow, summary.total, percentiles[50], percentiles[95], percentiles[99]
+            )
+        )
+
+    return slow_providers
@@ -0,0 +1,134 @@
+from threading import RLock
+
+from cachetools import LRUCache
+from notifications_utils.template import (
+    HTMLEmailTemplate,
+    PlainTextEmailTemplate,
+    SMSMessageTemplate,
+)
+
+from app import statsd_client
+
+
+class TemplateRenderCache:
+    """
+    A bounded, thread safe cache of rendered template output which counts its hits and misses.
+
+    Template versions never change once saved, so anything rendered from a template version alone (plus the service
+    and branding options that go into the key) can be kept until it is evicted.
+    """
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.cache = LRUCache(maxsize=maxsize)
+        self.lock = RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        with self.lock:
+            rendered = self.cache.get(key)
+            if rendered is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if rendered is not None:
+            statsd_client.incr('template-render-cache.{}.hit'.format(self.name))
+            return rendered
+
+        statsd_client.incr('template-render-cache.{}.miss'.format(self.name))
+        rendered = render()
+        with self.lock:
+            self.cache[key] = rendered
+        return rendered
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.cache)
+
+
+placeholders_cache = TemplateRenderCache('placeholders', maxsize=4096)
+sms_render_cache = TemplateRenderCache('sms', maxsize=1024)
+email_render_cache = TemplateRenderCache('email', maxsize=1024)
+
+
+def _template_version_key(template_dict):
+    return str(template_dict['id']), template_dict['version']
+
+
+def has_placeholders(template_object, template_dict):
+    return placeholders_cache.get_or_render(
+        _template_version_key(template_dict),
+        lambda: bool(template_object.placeholders),
+    )
+
+
+def _sms_template(template_dict, personalisation, prefix, show_prefix):
+    return SMSMessageTemplate(
+        template_dict,
+        values=personalisation,
+        prefix=prefix,
+        show_prefix=show_prefix,
+    )
+
+
+def _render_static_sms(template, template_dict, prefix, show_prefix):
+    return sms_render_cache.get_or_render(
+        _template_version_key(template_dict) + (prefix, show_prefix),
+        lambda: (str(template), template.fragment_count),
+    )
+
+
+def render_sms(template_dict, personalisation, prefix, show_prefix):
+    """
+    Returns the content and the fragment count for a text message.
+    """
+    template = _sms_template(template_dict, personalisation, prefix, show_prefix)
+
+    if has_placeholders(template, template_dict):
+        return str(template), template.fragment_count
+
+    return _render_static_sms(template, template_dict, prefix, show_prefix)
+
+
+def sms_fragment_count(template_dict, personalisation, prefix, show_prefix):
+    """
+    Returns the fragment count for a text message, without rendering its content if it has to be worked out afresh.
+    """
+    template = _sms_template(template_dict, personalisation, prefix, show_prefix)
+
+    if has_placeholders(template, template_dict):
+        return template.fragment_count
+
+    return _render_static_sms(template, template_dict, prefix, show_prefix)[1]
+
+
+def render_email(template_dict, personalisation, html_email_options):
+    """
+    Returns the subject, plain text body and HTML body for an email.
+
+    The branding options are part of the key, so a change to the branding renders afresh.
+    """
+    plain_text_email = PlainTextEmailTemplate(template_dict, values=personalisation)
+
+    def render():
+        html_email = HTMLEmailTemplate(
+            template_dict,
+            values=personalisation,
+            **html_email_options
+        )
+        return plain_text_email.subject, str(plain_text_email), str(html_email)
+
+    if has_placeholders(plain_text_email, template_dict):
+        return render()
+
+    return email_render_cache.get_or_render(
+        _template_version_key(template_dict) + tuple(sorted(html_email_options.items())),
+        render,
+    )
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
 
+from app import redis_store
 from app.dao.email_branding_dao import (
     dao_create_email_branding,
     dao_get_email_branding_by_id,
@@ -54,5 +55,6 @@ def update_email_branding(email_branding_id):
     if 'text' not in data.keys() and 'name' in data.keys():
         data['text'] = data['name']
     dao_update_email_branding(fetched_email_branding, **data)
+    redis_store.delete('email_branding-{}'.format(email_branding_id))
 
     return jsonify(data=fetched_email_branding.serialize()), 200
@@ -14,8 +14,8 @@ from app.dao.jobs_dao import (
     dao_create_job,
     dao_get_future_scheduled_job_by_id_and_service_id,
     dao_get_job_by_service_id_and_job_id,
+    dao_get_job_statistics,
     dao_get_jobs_by_service_id,
-    dao_get_notification_outcomes_for_job,
     dao_get_scheduled_job_stats,
     dao_update_job,
 )
@@ -49,7 +49,7 @@ register_errors(job_blueprint)
 @job_blueprint.route('/<job_id>', methods=['GET'])
 def get_job_by_service_and_job_id(service_id, job_id):
     job = dao_get_job_by_service_id_and_job_id(service_id, job_id)
-    statistics = dao_get_notification_outcomes_for_job(service_id, job_id)
+    statistics = dao_get_job_statistics(service_id, job_id)
     data = job_schema.dump(job).data
 
     data['statistics'] = [{'status': statistic[1], 'count': statistic[0]} for statistic in statistics]
@@ -230,8 +230,8 @@ def get_paginated_jobs(
             # ft_notification_status table
             statistics = fetch_notification_statuses_for_job(job_data['id'])
         else:
-            # notifications table
-            statistics = dao_get_notification_outcomes_for_job(service_id, job_data['id'])
+            # counted as the job's notifications are saved and sent
+            statistics = dao_get_job_statistics(service_id, job_data['id'])
         job_data['statistics'] = [{'status': statistic.status, 'count': statistic.count} for statistic in statistics]
 
     return {
@@ -53,6 +53,46 @@ def find_letter_pdf_in_s3(notification):
     return item
 
 
+class LetterPDFIndex:
+    """
+    Finds the PDFs for many letters in a bucket without making an S3 request per letter.
+
+    The first time a letter from a given day is looked up, that day's whole folder is listed (a handful of paginated
+    LIST requests, rather than one per letter) and the key and size of each PDF in it are remembered by reference.
+    """
+
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+        self._folders = {}
+
+    def find(self, reference, created_at):
+        folder = get_folder_name(created_at)
+        if folder not in self._folders:
+            self._folders[folder] = self._list_folder(folder)
+
+        try:
+            return self._folders[folder][reference.upper()]
+        except KeyError:
+            raise LetterPDFNotFound(f'File not found in bucket {self.bucket_name} for reference {reference}')
+
+    def _list_folder(self, folder):
+        s3_client = boto3.client('s3', current_app.config['AWS_REGION'])
+        paginator = s3_client.get_paginator('list_objects_v2')
+
+        pdfs = {}
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=folder):
+            for obj in page.get('Contents', []):
+                try:
+                    reference = get_reference_from_filename(obj['Key'])
+                except IndexError:
+                    continue
+                # S3 lists keys in order, so like find_letter_pdf_in_s3 we keep the first match
+                pdfs.setdefault(reference, (obj['Key'], obj['Size']))
+
+        current_app.logger.info(f'Listed {len(pdfs)} letter PDFs in {self.bucket_name}/{folder}')
+        return pdfs
+
+
 def generate_letter_pdf_filename(reference, created_at, ignore_folder=False, postage=SECOND_CLASS):
     upload_file_name = LETTERS_PDF_FILE_LOCATION_STRUCTURE.format(
         folder='' if ignore_folder else get_folder_name(created_at),
@@ -1476,13 +1476,21 @@ class Notification(db.Model):
 
     @property
     def personalisation(self):
-        if self._personalisation:
-            return encryption.decrypt(self._personalisation)
-        return {}
+        if not self._personalisation:
+            return {}
+        # decrypting is expensive and serialising a notification reads the personalisation several times, so keep
+        # the decrypted value alongside the ciphertext it came from. Comparing against the ciphertext means writes
+        # that go straight to the column (or a refresh from the database) are never served a stale value.
+        cached = getattr(self, '_decrypted_personalisation', None)
+        if cached is None or cached[0] != self._personalisation:
+            cached = (self._personalisation, encryption.decrypt(self._personalisation))
+            self._decrypted_personalisation = cached
+        return dict(cached[1])
 
     @personalisation.setter
     def personalisation(self, personalisation):
         self._personalisation = encryption.encrypt(personalisation or {})
+        self._decrypted_personalisation = None
 
     def completed_at(self):
         if self.status in NOTIFICATION_STATUS_TYPES_COMPLETED:
@@ -1638,6 +1646,10 @@ class Notification(db.Model):
             'uri': self.template.get_link()
         }
 
+        personalisation = self.personalisation
+        # render the template once and read both the body and the subject from it
+        template_object = self.template._as_utils_template_with_personalisation(personalisation)
+
         serialized = {
             "id": self.id,
             "reference": self.client_reference,
@@ -1653,8 +1665,8 @@ class Notification(db.Model):
             "type": self.notification_type,
             "status": self.get_letter_status() if self.notification_type == LETTER_TYPE else self.status,
             "template": template_dict,
-            "body": self.content,
-            "subject": self.subject,
+            "body": template_object.content_with_placeholders_filled_in,
+            "subject": getattr(template_object, 'subject', None),
             "created_at": self.created_at.strftime(DATETIME_FORMAT),
             "created_by_name": self.get_created_by_name(),
             "sent_at": get_dt_string_or_none(self.sent_at),
@@ -1664,7 +1676,7 @@ class Notification(db.Model):
         }
 
         if self.notification_type == LETTER_TYPE:
-            col = Columns(self.personalisation)
+            col = Columns(personalisation)
             serialized['line_1'] = col.get('address_line_1')
             serialized['line_2'] = col.get('address_line_2')
             serialized['line_3'] = col.get('address_line_3')
@@ -2077,6 +2089,50 @@ class FactProcessingTime(db.Model):
     updated_at = db.Column(db.DateTime, nullable=True, onupdate=datetime.datetime.utcnow)
 
 
+class FactBillingMonthly(db.Model):
+    """
+    ft_billing added up for each service over a whole month, with the rate multiplier already applied to
+    billable_units. Only holds the months listed in ft_monthly_snapshots.
+    """
+    __tablename__ = "ft_billing_monthly"
+
+    month = db.Column(db.Date, nullable=False, primary_key=True, index=True)
+    service_id = db.Column(UUID(as_uuid=True), nullable=False, primary_key=True, index=True)
+    notification_type = db.Column(db.Text, nullable=False, primary_key=True)
+    rate = db.Column(db.Numeric(), nullable=False, primary_key=True)
+    postage = db.Column(db.String, nullable=False, primary_key=True)
+    billable_units = db.Column(db.Integer(), nullable=True)
+    notifications_sent = db.Column(db.Integer(), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+
+class FactNotificationStatusMonthly(db.Model):
+    """
+    ft_notification_status added up across every service for a whole month. Only holds the months listed in
+    ft_monthly_snapshots.
+    """
+    __tablename__ = "ft_notification_status_monthly"
+
+    month = db.Column(db.Date, index=True, primary_key=True, nullable=False)
+    notification_type = db.Column(db.Text, primary_key=True, nullable=False)
+    key_type = db.Column(db.Text, primary_key=True, nullable=False)
+    notification_status = db.Column(db.Text, primary_key=True, nullable=False)
+    notification_count = db.Column(db.Integer(), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+
+class FactMonthlySnapshot(db.Model):
+    """
+    The months that ft_billing_monthly and ft_notification_status_monthly have been built for. Months without a
+    snapshot are read from the daily fact tables instead.
+    """
+    __tablename__ = "ft_monthly_snapshots"
+
+    month = db.Column(db.Date, primary_key=True, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True, onupdate=datetime.datetime.utcnow)
+
+
 class Complaint(db.Model):
     __tablename__ = 'complaints'
 
@@ -2583,3 +2639,22 @@ class ServiceBroadcastProviderRestriction(db.Model):
     provider = db.Column(db.String, nullable=False)
 
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+
+class FactTemplateUsageIntraday(db.Model):
+    """
+    Non-test notifications sent so far today for each template and hour they were created in, kept up to date every
+    minute by the update-intraday-template-usage task. Only holds today and yesterday - ft_notification_status takes
+    over once the nightly tasks have built a day.
+    """
+    __tablename__ = "ft_template_usage_intraday"
+
+    bst_date = db.Column(db.Date, primary_key=True, nullable=False)
+    service_id = db.Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    template_id = db.Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    # the UTC hour, so only the hours with notifications that have changed need counting again
+    created_hour = db.Column(db.DateTime, primary_key=True, nullable=False)
+    notification_status = db.Column(db.Text, primary_key=True, nullable=False)
+    notification_type = db.Column(db.Text, nullable=False)
+    notification_count = db.Column(db.Integer(), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
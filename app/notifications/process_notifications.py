@@ -1,5 +1,6 @@
 import uuid
 from datetime import datetime
+from functools import lru_cache
 
 from flask import current_app
 from gds_metrics import Histogram
@@ -196,11 +197,24 @@ def send_notification_to_queue(notification, research_mode, queue=None):
     )
 
 
-def simulated_recipient(to_address, notification_type):
+@lru_cache(maxsize=8)
+def _normalise_simulated_recipients(notification_type, recipients):
+    if notification_type == SMS_TYPE:
+        return frozenset(validate_and_format_phone_number(number) for number in recipients)
+    return frozenset(recipients)
+
+
+def simulated_recipients(notification_type):
+    """
+    The normalised recipients that are simulated for a notification type. They're cached against the config values,
+    so the phone numbers are only formatted once however many notifications are sent.
+    """
     if notification_type == SMS_TYPE:
-        formatted_simulated_numbers = [
-            validate_and_format_phone_number(number) for number in current_app.config['SIMULATED_SMS_NUMBERS']
-        ]
-        return to_address in formatted_simulated_numbers
+        recipients = current_app.config['SIMULATED_SMS_NUMBERS']
     else:
-        return to_address in current_app.config['SIMULATED_EMAIL_ADDRESSES']
+        recipients = current_app.config['SIMULATED_EMAIL_ADDRESSES']
+    return _normalise_simulated_recipients(notification_type, tuple(recipients))
+
+
+def simulated_recipient(to_address, notification_type):
+    return to_address in simulated_recipients(notification_type)
@@ -15,9 +15,6 @@ from sqlalchemy.orm.exc import NoResultFound
 
 from app import redis_store
 from app.dao import services_dao
-from app.dao.service_email_reply_to_dao import dao_get_reply_to_by_id
-from app.dao.service_letter_contact_dao import dao_get_letter_contact_by_id
-from app.dao.service_sms_sender_dao import dao_get_service_sms_senders_by_id
 from app.models import (
     EMAIL_TYPE,
     INTERNATIONAL_LETTERS,
@@ -31,7 +28,12 @@ from app.models import (
 from app.notifications.process_notifications import (
     create_content_for_notification,
 )
-from app.serialised_models import SerialisedTemplate
+from app.serialised_models import (
+    SerialisedServiceEmailReplyTo,
+    SerialisedServiceLetterContact,
+    SerialisedServiceSmsSender,
+    SerialisedTemplate,
+)
 from app.service.utils import service_allowed_to_send_to
 from app.utils import get_public_notify_type_text
 from app.v2.errors import (
@@ -215,7 +217,7 @@ def check_reply_to(service_id, reply_to_id, type_):
 def check_service_email_reply_to_id(service_id, reply_to_id, notification_type):
     if reply_to_id:
         try:
-            return dao_get_reply_to_by_id(service_id, reply_to_id).email_address
+            return SerialisedServiceEmailReplyTo.from_id(service_id, reply_to_id).email_address
         except NoResultFound:
             message = 'email_reply_to_id {} does not exist in database for service id {}' \
                 .format(reply_to_id, service_id)
@@ -225,7 +227,7 @@ def check_service_email_reply_to_id(service_id, reply_to_id, notification_type):
 def check_service_sms_sender_id(service_id, sms_sender_id, notification_type):
     if sms_sender_id:
         try:
-            return dao_get_service_sms_senders_by_id(service_id, sms_sender_id).sms_sender
+            return SerialisedServiceSmsSender.from_id(service_id, sms_sender_id).sms_sender
         except NoResultFound:
             message = 'sms_sender_id {} does not exist in database for service id {}' \
                 .format(sms_sender_id, service_id)
@@ -235,7 +237,7 @@ def check_service_sms_sender_id(service_id, sms_sender_id, notification_type):
 def check_service_letter_contact_id(service_id, letter_contact_id, notification_type):
     if letter_contact_id:
         try:
-            return dao_get_letter_contact_by_id(service_id, letter_contact_id).contact_block
+            return SerialisedServiceLetterContact.from_id(service_id, letter_contact_id).contact_block
         except NoResultFound:
             message = 'letter_contact_id {} does not exist in database for service id {}' \
                 .format(letter_contact_id, service_id)
@@ -0,0 +1,22 @@
+"""
+The performance dashboard is built from the fact tables, which only change when the nightly tasks rebuild them.
+Responses are cached in redis under a version number that those tasks bump once they have finished, so a new
+version is worked out the first time the dashboard is asked for after each change.
+"""
+from app import redis_store
+
+PERFORMANCE_DASHBOARD_VERSION_CACHE_KEY = 'performance-dashboard-version'
+
+# live services can change at any time, so don't keep a response for longer than this
+PERFORMANCE_DASHBOARD_CACHE_TTL = 60 * 60
+
+
+def get_performance_dashboard_cache_key(start_date, end_date):
+    version = redis_store.get(PERFORMANCE_DASHBOARD_VERSION_CACHE_KEY)
+    if isinstance(version, bytes):
+        version = version.decode('utf-8')
+    return 'performance-dashboard-{}-{}-{}'.format(version or 0, start_date, end_date)
+
+
+def performance_dashboard_changed():
+    redis_store.incr(PERFORMANCE_DASHBOARD_VERSION_CACHE_KEY)
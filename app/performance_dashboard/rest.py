@@ -1,8 +1,10 @@
 from datetime import datetime
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, json, request
 
+from app import redis_store
 from app.dao.fact_notification_status_dao import (
+    get_total_notifications_for_all_time,
     get_total_notifications_for_date_range,
 )
 from app.dao.fact_processing_time_dao import (
@@ -10,6 +12,10 @@ from app.dao.fact_processing_time_dao import (
 )
 from app.dao.services_dao import get_live_services_with_organisation
 from app.errors import register_errors
+from app.performance_dashboard.cache import (
+    PERFORMANCE_DASHBOARD_CACHE_TTL,
+    get_performance_dashboard_cache_key,
+)
 from app.performance_dashboard.performance_dashboard_schema import (
     performance_dashboard_request,
 )
@@ -33,13 +39,26 @@ def get_performance_dashboard():
 
     start_date = datetime.strptime(request.args.get('start_date', today), '%Y-%m-%d').date()
     end_date = datetime.strptime(request.args.get('end_date', today), '%Y-%m-%d').date()
-    total_for_all_time = get_total_notifications_for_date_range(start_date=None, end_date=None)
-    total_notifications, emails, sms, letters = transform_results_into_totals(total_for_all_time)
+
+    cache_key = get_performance_dashboard_cache_key(start_date, end_date)
+    payload = redis_store.get(cache_key)
+    if payload is None:
+        payload = json.dumps(get_performance_dashboard_stats(start_date, end_date))
+        redis_store.set(cache_key, payload, ex=PERFORMANCE_DASHBOARD_CACHE_TTL)
+
+    response = current_app.response_class(payload, mimetype='application/json')
+    # the admin app can send the etag back in If-None-Match and get an empty 304 if nothing has changed
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def get_performance_dashboard_stats(start_date, end_date):
+    emails, sms, letters = get_total_notifications_for_all_time()
     totals_for_date_range = get_total_notifications_for_date_range(start_date=start_date, end_date=end_date)
     processing_time_results = get_processing_time_percentage_for_date_range(start_date=start_date, end_date=end_date)
     services = get_live_services_with_organisation()
-    stats = {
-        "total_notifications": total_notifications,
+    return {
+        "total_notifications": emails + sms + letters,
         "email_notifications": emails,
         "sms_notifications": sms,
         "letter_notifications": letters,
@@ -47,26 +66,8 @@ def get_performance_dashboard():
         "processing_time": transform_processing_time_results_to_json(processing_time_results),
         "live_service_count": len(services),
         "services_using_notify": transform_services_to_json(services)
-
     }
 
-    return jsonify(stats)
-
-
-def transform_results_into_totals(total_notifications_results):
-    total_notifications = 0
-    emails = 0
-    sms = 0
-    letters = 0
-    for x in total_notifications_results:
-        total_notifications += x.emails
-        total_notifications += x.sms
-        total_notifications += x.letters
-        emails += x.emails
-        sms += x.sms
-        letters += x.letters
-    return total_notifications, emails, sms, letters
-
 
 def transform_into_notification_by_type_json(total_notifications):
     j = []
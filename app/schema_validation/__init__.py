@@ -11,6 +11,8 @@ from notifications_utils.recipients import (
     validate_phone_number,
 )
 
+from app.schema_validation.compiler import compile_schema
+
 format_checker = FormatChecker()
 
 
@@ -69,9 +71,26 @@ def validate_schema_datetime(instance):
     return True
 
 
+# id of schema -> (schema, function returning its errors), for schemas compiled when the app started
+compiled_validators = {}
+
+
+def init_app(app, schemas):
+    compiled_validators.clear()
+    if app.config['COMPILED_SCHEMA_VALIDATION']:
+        for schema in schemas:
+            compiled_validators[id(schema)] = (schema, compile_schema(schema, format_checker))
+
+
+def get_validator(schema):
+    compiled_schema, iter_errors = compiled_validators.get(id(schema), (None, None))
+    if compiled_schema is schema:
+        return iter_errors
+    return Draft7Validator(schema, format_checker=format_checker).iter_errors
+
+
 def validate(json_to_validate, schema):
-    validator = Draft7Validator(schema, format_checker=format_checker)
-    errors = list(validator.iter_errors(json_to_validate))
+    errors = list(get_validator(schema)(json_to_validate))
     if errors.__len__() > 0:
         raise ValidationError(build_error_message(errors))
     return json_to_validate
@@ -0,0 +1,204 @@
+"""
+Turns a JSON schema into a plain function that returns the same errors as `Draft7Validator(schema).iter_errors`.
+
+`validate` builds a new Draft7Validator, and with it a new ref resolver, every time it is called, then dispatches each
+keyword through a generator. For the schemas on the busiest endpoints that work is done once here instead, when the
+app starts.
+
+Only the keywords those schemas use are supported. Anything else raises UnsupportedSchemaError when the schema is
+compiled, rather than being silently skipped, so a schema that outgrows the compiler has to fall back to jsonschema.
+"""
+import numbers
+
+from jsonschema import ValidationError
+
+# keywords that describe a schema but never produce an error
+ANNOTATIONS = {'$schema', 'description', 'title', 'validationMessage', 'code', 'link'}
+
+
+def _is_integer(instance):
+    if isinstance(instance, bool):
+        return False
+    return isinstance(instance, int) or isinstance(instance, float) and instance.is_integer()
+
+
+def _is_number(instance):
+    if isinstance(instance, bool):
+        return False
+    return isinstance(instance, numbers.Number)
+
+
+TYPE_CHECKS = {
+    'array': lambda instance: isinstance(instance, list),
+    'boolean': lambda instance: isinstance(instance, bool),
+    'integer': _is_integer,
+    'null': lambda instance: instance is None,
+    'number': _is_number,
+    'object': lambda instance: isinstance(instance, dict),
+    'string': lambda instance: isinstance(instance, str),
+}
+
+
+class UnsupportedSchemaError(Exception):
+    pass
+
+
+def compile_schema(schema, format_checker):
+    """
+    Returns a function which takes an instance and returns a list of jsonschema ValidationErrors, in the same order
+    and with the same messages, paths and causes that Draft7Validator would give.
+    """
+    check = _compile(schema, format_checker, schema_path=())
+
+    def iter_errors(instance):
+        return check(instance, ())
+
+    return iter_errors
+
+
+def _no_errors(instance, path):
+    return []
+
+
+def _error(message, keyword, value, instance, schema, path, schema_path, cause=None):
+    return ValidationError(
+        message,
+        validator=keyword,
+        validator_value=value,
+        instance=instance,
+        schema=schema,
+        path=path,
+        schema_path=schema_path,
+        cause=cause,
+    )
+
+
+def _compile(schema, format_checker, schema_path):
+    if not isinstance(schema, dict):
+        raise UnsupportedSchemaError('Schema {} is not an object'.format(schema))
+
+    checks = []
+    for keyword, value in schema.items():
+        if keyword in ANNOTATIONS:
+            continue
+        if keyword not in KEYWORDS:
+            raise UnsupportedSchemaError('Keyword {} is not supported'.format(keyword))
+        checks.append(KEYWORDS[keyword](value, schema, format_checker, schema_path + (keyword,)))
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check(instance, path):
+        errors = []
+        for keyword_check in checks:
+            errors.extend(keyword_check(instance, path))
+        return errors
+
+    return check
+
+
+def _compile_type(types, schema, format_checker, schema_path):
+    types_list = [types] if isinstance(types, str) else types
+    for type_ in types_list:
+        if type_ not in TYPE_CHECKS:
+            raise UnsupportedSchemaError('Type {} is not supported'.format(type_))
+
+    type_checks = [TYPE_CHECKS[type_] for type_ in types_list]
+    type_reprs = ', '.join(repr(type_) for type_ in types_list)
+
+    def check(instance, path):
+        for type_check in type_checks:
+            if type_check(instance):
+                return []
+        return [_error(
+            '%r is not of type %s' % (instance, type_reprs), 'type', types, instance, schema, path, schema_path
+        )]
+
+    return check
+
+
+def _compile_format(format_, schema, format_checker, schema_path):
+    if format_ not in format_checker.checkers:
+        return _no_errors
+
+    func, raises = format_checker.checkers[format_]
+
+    def check(instance, path):
+        result, cause = None, None
+        try:
+            result = func(instance)
+        except raises as e:
+            cause = e
+        if result:
+            return []
+        return [_error(
+            '%r is not a %r' % (instance, format_), 'format', format_, instance, schema, path, schema_path, cause
+        )]
+
+    return check
+
+
+def _compile_properties(properties, schema, format_checker, schema_path):
+    property_checks = [
+        (name, _compile(subschema, format_checker, schema_path + (name,)))
+        for name, subschema in properties.items()
+    ]
+
+    def check(instance, path):
+        if not isinstance(instance, dict):
+            return []
+        errors = []
+        for name, property_check in property_checks:
+            if name in instance:
+                errors.extend(property_check(instance[name], path + (name,)))
+        return errors
+
+    return check
+
+
+def _compile_required(required, schema, format_checker, schema_path):
+    def check(instance, path):
+        if not isinstance(instance, dict):
+            return []
+        return [
+            _error('%r is a required property' % name, 'required', required, instance, schema, path, schema_path)
+            for name in required
+            if name not in instance
+        ]
+
+    return check
+
+
+def _compile_additional_properties(additional_properties, schema, format_checker, schema_path):
+    if not isinstance(additional_properties, bool):
+        raise UnsupportedSchemaError('Only true or false are supported for additionalProperties')
+    if additional_properties:
+        return _no_errors
+
+    properties = schema.get('properties', {})
+
+    def check(instance, path):
+        if not isinstance(instance, dict):
+            return []
+        # jsonschema reports extras from a set, so list them in the same order it would
+        extras = set(name for name in instance if name not in properties)
+        if not extras:
+            return []
+        return [_error(
+            'Additional properties are not allowed (%s %s unexpected)' % (
+                ', '.join(repr(extra) for extra in extras),
+                'was' if len(extras) == 1 else 'were',
+            ),
+            'additionalProperties', additional_properties, instance, schema, path, schema_path,
+        )]
+
+    return check
+
+
+KEYWORDS = {
+    'additionalProperties': _compile_additional_properties,
+    'format': _compile_format,
+    'properties': _compile_properties,
+    'required': _compile_required,
+    'type': _compile_type,
+}
@@ -10,24 +10,43 @@ from notifications_utils.serialised_model import (
 )
 from werkzeug.utils import cached_property
 
-from app import db, redis_store
-from app.dao.api_key_dao import get_model_api_keys
+from app import db, encryption, redis_store
+from app.dao.api_key_dao import get_api_keys_for_authentication
 from app.dao.services_dao import dao_fetch_service_by_id
+from app.models import LETTER_TYPE, PRECOMPILED_TEMPLATE_NAME
 
 caches = defaultdict(partial(cachetools.TTLCache, maxsize=1024, ttl=2))
 locks = defaultdict(RLock)
 redis_cache = RequestCache(redis_store)
 
+# a template version's content never changes, so it can be kept in memory for longer than things which can
+TEMPLATE_VERSION_CACHE_TTL = 60
+# template names can be changed, so don't show an old one on the usage pages for longer than this
+TEMPLATE_NAME_CACHE_TTL = 60
+
+
+def memory_cache(func=None, *, ttl=None):
+    if func is None:
+        return partial(memory_cache, ttl=ttl)
+
+    if ttl is not None:
+        caches[func.__qualname__] = cachetools.TTLCache(maxsize=1024, ttl=ttl)
+    cache = caches[func.__qualname__]
+    lock = locks[func.__qualname__]
 
-def memory_cache(func):
     @cachetools.cached(
-        cache=caches[func.__qualname__],
-        lock=locks[func.__qualname__],
+        cache=cache,
+        lock=lock,
         key=ignore_first_argument_cache_key,
     )
     def wrapper(*args, **kwargs):
         return func(*args, **kwargs)
 
+    def prime(args, value):
+        with lock:
+            cache[cachetools.keys.hashkey(*args)] = value
+
+    wrapper.prime = prime
     return wrapper
 
 
@@ -49,8 +68,19 @@ class SerialisedTemplate(SerialisedModel):
     }
 
     @classmethod
-    @memory_cache
     def from_id_and_service_id(cls, template_id, service_id, version=None):
+        if version is None:
+            return cls._from_latest_version(str(template_id), str(service_id))
+        return cls._from_version(str(template_id), str(service_id), int(version))
+
+    @classmethod
+    @memory_cache
+    def _from_latest_version(cls, template_id, service_id):
+        return cls(cls.get_dict(template_id, service_id, None)['data'])
+
+    @classmethod
+    @memory_cache(ttl=TEMPLATE_VERSION_CACHE_TTL)
+    def _from_version(cls, template_id, service_id, version):
         return cls(cls.get_dict(template_id, service_id, version)['data'])
 
     @staticmethod
@@ -71,6 +101,58 @@ class SerialisedTemplate(SerialisedModel):
         return {'data': template_dict}
 
 
+class SerialisedTemplateName(SerialisedModel):
+    ALLOWED_PROPERTIES = {
+        'id',
+        'name',
+        'template_type',
+        'hidden',
+    }
+
+    @property
+    def is_precompiled_letter(self):
+        return self.hidden and self.name == PRECOMPILED_TEMPLATE_NAME and self.template_type == LETTER_TYPE
+
+
+class SerialisedTemplateNameCollection(SerialisedModelCollection):
+    model = SerialisedTemplateName
+
+    @classmethod
+    def from_service_id(cls, service_id, template_ids=()):
+        """
+        Returns every template the service has, including archived ones. Fetches them again if any of template_ids
+        have been created since they were cached.
+        """
+        templates = cls._from_service_id(str(service_id))
+        if not set(template_ids) <= set(templates.by_id):
+            templates = cls._get_templates(service_id)
+            cls._from_service_id.prime((str(service_id),), templates)
+        return templates
+
+    @classmethod
+    @memory_cache(ttl=TEMPLATE_NAME_CACHE_TTL)
+    def _from_service_id(cls, service_id):
+        return cls._get_templates(service_id)
+
+    @classmethod
+    def _get_templates(cls, service_id):
+        from app.dao import templates_dao
+
+        return cls([
+            {
+                'id': template.id,
+                'name': template.name,
+                'template_type': template.template_type,
+                'hidden': template.hidden,
+            }
+            for template in templates_dao.dao_get_template_names_for_service(service_id)
+        ])
+
+    @cached_property
+    def by_id(self):
+        return {template.id: template for template in self}
+
+
 class SerialisedService(SerialisedModel):
     ALLOWED_PROPERTIES = {
         'id',
@@ -88,8 +170,12 @@ class SerialisedService(SerialisedModel):
     }
 
     @classmethod
-    @memory_cache
     def from_id(cls, service_id):
+        return cls._from_id(str(service_id))
+
+    @classmethod
+    @memory_cache
+    def _from_id(cls, service_id):
         return cls(cls.get_dict(service_id)['data'])
 
     @staticmethod
@@ -107,6 +193,121 @@ class SerialisedService(SerialisedModel):
         return SerialisedAPIKeyCollection.from_service_id(self.id)
 
 
+class SerialisedEmailBranding(SerialisedModel):
+    ALLOWED_PROPERTIES = {
+        'id',
+        'brand_type',
+        'colour',
+        'logo',
+        'name',
+        'text',
+    }
+
+    @classmethod
+    @memory_cache
+    def from_id(cls, email_branding_id):
+        return cls(cls.get_dict(email_branding_id)['data'])
+
+    @staticmethod
+    @redis_cache.set('email_branding-{email_branding_id}')
+    def get_dict(email_branding_id):
+        from app.dao.email_branding_dao import dao_get_email_branding_by_id
+
+        email_branding_dict = dao_get_email_branding_by_id(email_branding_id).serialize()
+        db.session.commit()
+
+        return {'data': email_branding_dict}
+
+
+class SerialisedServiceSmsSender(SerialisedModel):
+    ALLOWED_PROPERTIES = {
+        'id',
+        'service_id',
+        'sms_sender',
+        'is_default',
+        'inbound_number_id',
+    }
+
+    @classmethod
+    def from_id(cls, service_id, sms_sender_id):
+        return cls._from_id(str(service_id), str(sms_sender_id))
+
+    @classmethod
+    @memory_cache
+    def _from_id(cls, service_id, sms_sender_id):
+        return cls(cls.get_dict(service_id, sms_sender_id)['data'])
+
+    @staticmethod
+    @redis_cache.set('service-{service_id}-sms-sender-{sms_sender_id}')
+    def get_dict(service_id, sms_sender_id):
+        from app.dao.service_sms_sender_dao import (
+            dao_get_service_sms_senders_by_id,
+        )
+
+        sms_sender_dict = dao_get_service_sms_senders_by_id(service_id, sms_sender_id).serialize()
+        db.session.commit()
+
+        return {'data': sms_sender_dict}
+
+
+class SerialisedServiceEmailReplyTo(SerialisedModel):
+    ALLOWED_PROPERTIES = {
+        'id',
+        'service_id',
+        'email_address',
+        'is_default',
+    }
+
+    @classmethod
+    def from_id(cls, service_id, reply_to_id):
+        return cls._from_id(str(service_id), str(reply_to_id))
+
+    @classmethod
+    @memory_cache
+    def _from_id(cls, service_id, reply_to_id):
+        return cls(cls.get_dict(service_id, reply_to_id)['data'])
+
+    @staticmethod
+    @redis_cache.set('service-{service_id}-email-reply-to-{reply_to_id}')
+    def get_dict(service_id, reply_to_id):
+        from app.dao.service_email_reply_to_dao import dao_get_reply_to_by_id
+
+        reply_to_dict = dao_get_reply_to_by_id(service_id, reply_to_id).serialize()
+        db.session.commit()
+
+        return {'data': reply_to_dict}
+
+
+class SerialisedServiceLetterContact(SerialisedModel):
+    ALLOWED_PROPERTIES = {
+        'id',
+        'service_id',
+        'contact_block',
+        'is_default',
+    }
+
+    @classmethod
+    def from_id(cls, service_id, letter_contact_id):
+        return cls._from_id(str(service_id), str(letter_contact_id))
+
+    @classmethod
+    @memory_cache
+    def _from_id(cls, service_id, letter_contact_id):
+        return cls(cls.get_dict(service_id, letter_contact_id)['data'])
+
+    @staticmethod
+    @redis_cache.set('service-{service_id}-letter-contact-{letter_contact_id}')
+    def get_dict(service_id, letter_contact_id):
+        from app.dao.service_letter_contact_dao import (
+            dao_get_letter_contact_by_id,
+        )
+
+        letter_contact_dict = dao_get_letter_contact_by_id(service_id, letter_contact_id).serialize()
+        db.session.commit()
+
+        return {'data': letter_contact_dict}
+
+
 class SerialisedAPIKey(SerialisedModel):
     ALLOWED_PROPERTIES = {
         'id',
@@ -123,8 +324,13 @@ class SerialisedAPIKeyCollection(SerialisedModelCollection):
     @memory_cache
     def from_service_id(cls, service_id):
         keys = [
-            {k: getattr(key, k) for k in SerialisedAPIKey.ALLOWED_PROPERTIES}
-            for key in get_model_api_keys(service_id)
+            {
+                'id': key.id,
+                'secret': encryption.decrypt(key.secret),
+                'expiry_date': key.expiry_date,
+                'key_type': key.key_type,
+            }
+            for key in get_api_keys_for_authentication(service_id)
         ]
         db.session.commit()
         return cls(keys)
@@ -7,6 +7,7 @@ from notifications_utils.timezones import convert_utc_to_bst
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
+from app import db, redis_store
 from app.aws import s3
 from app.config import QueueNames
 from app.dao import fact_notification_status_dao, notifications_dao
@@ -145,6 +146,8 @@ from app.user.users_schema import post_set_permissions_schema
 from app.utils import (
     DATE_FORMAT,
     DATETIME_FORMAT_NO_TIMEZONE,
+    cursor_pagination_links,
+    decode_cursor,
     midnight_n_days_ago,
     pagination_links,
 )
@@ -419,21 +422,36 @@ def get_all_notifications_for_service(service_id):
 
     count_pages = data.get('count_pages', True)
 
-    pagination = notifications_dao.get_notifications_for_service(
-        service_id,
-        filter_dict=data,
-        page=page,
-        page_size=page_size,
-        count_pages=count_pages,
-        limit_days=limit_days,
-        include_jobs=include_jobs,
-        include_from_test_key=include_from_test_key,
-        include_one_off=include_one_off
-    )
-
     kwargs = request.args.to_dict()
     kwargs['service_id'] = service_id
 
+    if 'cursor' in data:
+        return _get_notifications_for_service_by_cursor(
+            service_id,
+            data,
+            page_size=page_size,
+            limit_days=limit_days,
+            include_jobs=include_jobs,
+            include_from_test_key=include_from_test_key,
+            include_one_off=include_one_off,
+            link_args=kwargs,
+        )
+
+    # the same dao is used by the public api, where a notification should be readable as soon as it's created, so
+    # only the admin listing reads from the replica
+    with db.reading_from_replica():
+        pagination = notifications_dao.get_notifications_for_service(
+            service_id,
+            filter_dict=data,
+            page=page,
+            page_size=page_size,
+            count_pages=count_pages,
+            limit_days=limit_days,
+            include_jobs=include_jobs,
+            include_from_test_key=include_from_test_key,
+            include_one_off=include_one_off
+        )
+
     if data.get('format_for_csv'):
         notifications = [notification.serialize_for_csv() for notification in pagination.items]
     else:
@@ -450,6 +468,51 @@ def get_all_notifications_for_service(service_id):
     ), 200
 
 
+def _get_notifications_for_service_by_cursor(
+    service_id,
+    data,
+    page_size,
+    limit_days,
+    include_jobs,
+    include_from_test_key,
+    include_one_off,
+    link_args,
+):
+    # an empty cursor asks for the first page
+    try:
+        cursor = decode_cursor(data['cursor']) if data['cursor'] else None
+    except ValueError:
+        raise InvalidRequest({'cursor': ['Invalid cursor']}, status_code=400)
+
+    with db.reading_from_replica():
+        page = notifications_dao.get_notifications_for_service_by_cursor(
+            service_id,
+            filter_dict=data,
+            cursor=cursor,
+            page_size=page_size,
+            limit_days=limit_days,
+            include_jobs=include_jobs,
+            include_from_test_key=include_from_test_key,
+            include_one_off=include_one_off
+        )
+
+    if data.get('format_for_csv'):
+        notifications = [notification.serialize_for_csv() for notification in page.items]
+    else:
+        notifications = notification_with_template_schema.dump(page.items, many=True).data
+    return jsonify(
+        notifications=notifications,
+        page_size=page_size,
+        # counting every notification is what makes deep pages slow, so it is never done when paging by cursor
+        total=None,
+        links=cursor_pagination_links(
+            page,
+            '.get_all_notifications_for_service',
+            **link_args
+        )
+    ), 200
+
+
 @service_blueprint.route('/<uuid:service_id>/notifications/<uuid:notification_id>', methods=['GET'])
 def get_notification_for_service(service_id, notification_id):
 
@@ -755,12 +818,14 @@ def update_service_reply_to_email_address(service_id, reply_to_email_id):
                                                  reply_to_id=reply_to_email_id,
                                                  email_address=form['email_address'],
                                                  is_default=form.get('is_default', True))
+    _delete_email_reply_to_from_cache(service_id, reply_to_email_id)
     return jsonify(data=new_reply_to.serialize()), 200
 
 
 @service_blueprint.route('/<uuid:service_id>/email-reply-to/<uuid:reply_to_email_id>/archive', methods=['POST'])
 def delete_service_reply_to_email_address(service_id, reply_to_email_id):
     archived_reply_to = archive_reply_to_email_address(service_id, reply_to_email_id)
+    _delete_email_reply_to_from_cache(service_id, reply_to_email_id)
 
     return jsonify(data=archived_reply_to.serialize()), 200
 
@@ -797,12 +862,14 @@ def update_service_letter_contact(service_id, letter_contact_id):
                                          letter_contact_id=letter_contact_id,
                                          contact_block=form['contact_block'],
                                          is_default=form.get('is_default', True))
+    _delete_letter_contact_from_cache(service_id, letter_contact_id)
     return jsonify(data=new_reply_to.serialize()), 200
 
 
 @service_blueprint.route('/<uuid:service_id>/letter-contact/<uuid:letter_contact_id>/archive', methods=['POST'])
 def delete_service_letter_contact(service_id, letter_contact_id):
     archived_letter_contact = archive_letter_contact(service_id, letter_contact_id)
+    _delete_letter_contact_from_cache(service_id, letter_contact_id)
 
     return jsonify(data=archived_letter_contact.serialize()), 200
 
@@ -826,6 +893,7 @@ def add_service_sms_sender(service_id):
                 service_sms_sender=update_existing_sms_sender,
                 sms_sender=sms_sender,
                 inbound_number_id=inbound_number_id)
+            _delete_sms_sender_from_cache(service_id, new_sms_sender.id)
 
             return jsonify(new_sms_sender.serialize()), 201
 
@@ -852,12 +920,14 @@ def update_service_sms_sender(service_id, sms_sender_id):
                                                    is_default=form['is_default'],
                                                    sms_sender=form['sms_sender']
                                                    )
+    _delete_sms_sender_from_cache(service_id, sms_sender_id)
     return jsonify(new_sms_sender.serialize()), 200
 
 
 @service_blueprint.route('/<uuid:service_id>/sms-sender/<uuid:sms_sender_id>/archive', methods=['POST'])
 def delete_service_sms_sender(service_id, sms_sender_id):
     sms_sender = archive_sms_sender(service_id, sms_sender_id)
+    _delete_sms_sender_from_cache(service_id, sms_sender_id)
 
     return jsonify(data=sms_sender.serialize()), 200
 
@@ -875,6 +945,18 @@ def get_service_sms_senders_for_service(service_id):
     return jsonify([sms_sender.serialize() for sms_sender in sms_senders]), 200
 
 
+def _delete_sms_sender_from_cache(service_id, sms_sender_id):
+    redis_store.delete('service-{}-sms-sender-{}'.format(service_id, sms_sender_id))
+
+
+def _delete_email_reply_to_from_cache(service_id, reply_to_id):
+    redis_store.delete('service-{}-email-reply-to-{}'.format(service_id, reply_to_id))
+
+
+def _delete_letter_contact_from_cache(service_id, letter_contact_id):
+    redis_store.delete('service-{}-letter-contact-{}'.format(service_id, letter_contact_id))
+
+
 @service_blueprint.route('/<uuid:service_id>/organisation', methods=['GET'])
 def get_organisation_for_service(service_id):
     organisation = dao_get_organisation_by_service_id(service_id=service_id)
@@ -5,7 +5,7 @@ from flask import Blueprint, abort, current_app, jsonify, request
 from app.dao.fact_notification_status_dao import (
     fetch_notification_statuses_for_job,
 )
-from app.dao.jobs_dao import dao_get_notification_outcomes_for_job
+from app.dao.jobs_dao import dao_get_job_statistics
 from app.dao.uploads_dao import (
     dao_get_uploaded_letters_by_print_date,
     dao_get_uploads_by_service_id,
@@ -55,8 +55,8 @@ def get_paginated_uploads(service_id, limit_days, page):
                 # ft_notification_status table
                 statistics = fetch_notification_statuses_for_job(upload.id)
             else:
-                # notifications table
-                statistics = dao_get_notification_outcomes_for_job(service_id, upload.id)
+                # counted as the job's notifications are saved and sent
+                statistics = dao_get_job_statistics(service_id, upload.id)
             upload_dict['statistics'] = [{'status': statistic.status, 'count': statistic.count} for statistic in
                                          statistics]
         else:
@@ -1,3 +1,5 @@
+import base64
+import uuid
 from datetime import datetime, timedelta
 
 import pytz
@@ -29,6 +31,34 @@ def pagination_links(pagination, endpoint, **kwargs):
     return links
 
 
+def cursor_pagination_links(page, endpoint, **kwargs):
+    kwargs.pop('cursor', None)
+    links = {}
+    if page.has_next:
+        links['next'] = url_for(endpoint, cursor=encode_cursor(page.next_cursor), **kwargs)
+    return links
+
+
+def encode_cursor(cursor):
+    """
+    Turns a (created_at, id) keyset cursor into an opaque, url safe string
+    """
+    created_at, id_ = cursor
+    value = '{}|{}'.format(created_at.strftime(DATETIME_FORMAT_NO_TIMEZONE), id_)
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(cursor):
+    """
+    Reverses encode_cursor. Raises ValueError if the cursor has been tampered with.
+    """
+    try:
+        created_at, id_ = base64.urlsafe_b64decode(cursor.encode('utf-8')).decode('utf-8').split('|')
+        return datetime.strptime(created_at, DATETIME_FORMAT_NO_TIMEZONE), uuid.UUID(id_)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor {}'.format(cursor))
+
+
 def url_with_token(data, url, config, base_url=None):
     from notifications_utils.url_safe_token import generate_token
     token = generate_token(data, config['SECRET_KEY'], config['DANGEROUS_SALT'])
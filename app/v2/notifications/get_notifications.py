@@ -75,7 +75,7 @@ def get_notifications():
 
     data = validate(_data, get_notifications_request)
 
-    paginated_notifications = notifications_dao.get_notifications_for_service(
+    paginated_notifications = notifications_dao.get_notifications_for_service_by_cursor(
         str(authenticated_service.id),
         filter_dict=data,
         key_type=api_user.key_type,
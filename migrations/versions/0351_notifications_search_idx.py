@@ -0,0 +1,47 @@
+"""
+
+Revision ID: 0351_notifications_search_idx
+Revises: 0350_update_rates
+Create Date: 2021-04-12 10:21:43.104572
+
+"""
+import os
+
+from alembic import op
+
+revision = '0351_notifications_search_idx'
+down_revision = '0350_update_rates'
+environment = os.environ['NOTIFY_ENVIRONMENT']
+
+
+def upgrade():
+    # pg_trgm is shipped with postgres on PaaS, it just needs enabling for the database
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # We like to run this operation on live via the command prompt, to watch the progress and stop if necessary
+    if environment not in ["live", "production"]:
+        # PLEASE NOTE: that if you create index on production you need to add concurrently to the create statement,
+        # however we are unable to do that inside a transaction like this upgrade method
+
+        # Trigram indexes let postgres answer `LIKE '%term%'` and `ILIKE '%term%'` without scanning every
+        # notification for the service
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS ix_notifications_normalised_to_trgm
+            ON notifications USING gin (normalised_to gin_trgm_ops)
+        """)
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS ix_notifications_client_reference_trgm
+            ON notifications USING gin (client_reference gin_trgm_ops)
+        """)
+
+        # Searches for a complete phone number or email address look for normalised_to exactly
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS ix_notifications_service_id_normalised_to
+            ON notifications (service_id, normalised_to)
+        """)
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_notifications_service_id_normalised_to')
+    op.execute('DROP INDEX IF EXISTS ix_notifications_client_reference_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_notifications_normalised_to_trgm')
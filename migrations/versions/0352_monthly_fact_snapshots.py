@@ -0,0 +1,58 @@
+"""
+
+Revision ID: 0352_monthly_fact_snapshots
+Revises: 0351_notifications_search_idx
+Create Date: 2021-04-20 11:02:37.418293
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0352_monthly_fact_snapshots'
+down_revision = '0351_notifications_search_idx'
+
+
+def upgrade():
+    op.create_table('ft_billing_monthly',
+                    sa.Column('month', sa.Date(), nullable=False),
+                    sa.Column('service_id', postgresql.UUID(as_uuid=True), nullable=False),
+                    sa.Column('notification_type', sa.Text(), nullable=False),
+                    sa.Column('rate', sa.Numeric(), nullable=False),
+                    sa.Column('postage', sa.String(), nullable=False),
+                    sa.Column('billable_units', sa.Integer(), nullable=True),
+                    sa.Column('notifications_sent', sa.Integer(), nullable=True),
+                    sa.Column('created_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('month', 'service_id', 'notification_type', 'rate', 'postage')
+                    )
+    op.create_index(op.f('ix_ft_billing_monthly_month'), 'ft_billing_monthly', ['month'], unique=False)
+    op.create_index(op.f('ix_ft_billing_monthly_service_id'), 'ft_billing_monthly', ['service_id'], unique=False)
+
+    op.create_table('ft_notification_status_monthly',
+                    sa.Column('month', sa.Date(), nullable=False),
+                    sa.Column('notification_type', sa.Text(), nullable=False),
+                    sa.Column('key_type', sa.Text(), nullable=False),
+                    sa.Column('notification_status', sa.Text(), nullable=False),
+                    sa.Column('notification_count', sa.Integer(), nullable=False),
+                    sa.Column('created_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('month', 'notification_type', 'key_type', 'notification_status')
+                    )
+    op.create_index(
+        op.f('ix_ft_notification_status_monthly_month'), 'ft_notification_status_monthly', ['month'], unique=False
+    )
+
+    op.create_table('ft_monthly_snapshots',
+                    sa.Column('month', sa.Date(), nullable=False),
+                    sa.Column('created_at', sa.DateTime(), nullable=False),
+                    sa.Column('updated_at', sa.DateTime(), nullable=True),
+                    sa.PrimaryKeyConstraint('month')
+                    )
+
+
+def downgrade():
+    op.drop_table('ft_monthly_snapshots')
+    op.drop_index(op.f('ix_ft_notification_status_monthly_month'), table_name='ft_notification_status_monthly')
+    op.drop_table('ft_notification_status_monthly')
+    op.drop_index(op.f('ix_ft_billing_monthly_service_id'), table_name='ft_billing_monthly')
+    op.drop_index(op.f('ix_ft_billing_monthly_month'), table_name='ft_billing_monthly')
+    op.drop_table('ft_billing_monthly')
@@ -0,0 +1,33 @@
+"""
+
+Revision ID: 0353_template_usage_intraday
+Revises: 0352_monthly_fact_snapshots
+Create Date: 2021-04-27 15:48:12.105529
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0353_template_usage_intraday'
+down_revision = '0352_monthly_fact_snapshots'
+
+
+def upgrade():
+    op.create_table('ft_template_usage_intraday',
+                    sa.Column('bst_date', sa.Date(), nullable=False),
+                    sa.Column('service_id', postgresql.UUID(as_uuid=True), nullable=False),
+                    sa.Column('template_id', postgresql.UUID(as_uuid=True), nullable=False),
+                    sa.Column('created_hour', sa.DateTime(), nullable=False),
+                    sa.Column('notification_status', sa.Text(), nullable=False),
+                    sa.Column('notification_type', sa.Text(), nullable=False),
+                    sa.Column('notification_count', sa.Integer(), nullable=False),
+                    sa.Column('updated_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint(
+                        'bst_date', 'service_id', 'template_id', 'created_hour', 'notification_status'
+                    )
+                    )
+
+
+def downgrade():
+    op.drop_table('ft_template_usage_intraday')
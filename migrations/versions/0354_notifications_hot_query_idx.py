@@ -0,0 +1,52 @@
+"""
+
+Revision ID: 0354_notifications_hot_query_idx
+Revises: 0353_template_usage_intraday
+Create Date: 2021-05-04 09:37:21.640218
+
+"""
+import os
+
+from alembic import op
+
+revision = '0354_notifications_hot_query_idx'
+down_revision = '0353_template_usage_intraday'
+environment = os.environ['NOTIFY_ENVIRONMENT']
+
+
+def upgrade():
+    # We like to run this operation on live via the command prompt, to watch the progress and stop if necessary
+    if environment not in ["live", "production"]:
+        # PLEASE NOTE: that if you create index on production you need to add concurrently to the create statement,
+        # however we are unable to do that inside a transaction like this upgrade method
+
+        # The timeout, replay, letters to print and virus check tasks only look for notifications that haven't got
+        # to a final status yet, which is a tiny fraction of the table
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS ix_notifications_in_flight
+            ON notifications (notification_status, notification_type, created_at)
+            WHERE notification_status IN ('created', 'sending', 'pending', 'pending-virus-check')
+        """)
+
+        # Listing a service's notifications leaves out jobs by default, newest first with id to break ties for the
+        # keyset pagination
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS ix_notifications_service_id_created_at_not_in_job
+            ON notifications (service_id, created_at DESC, id DESC)
+            WHERE job_id IS NULL
+        """)
+
+        # Checking a job for missing rows and listing its notifications look rows up by number. This also does
+        # everything ix_notifications_job_id did
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS ix_notifications_job_id_job_row_number
+            ON notifications (job_id, job_row_number)
+        """)
+        op.execute('DROP INDEX IF EXISTS ix_notifications_job_id')
+
+
+def downgrade():
+    op.execute('CREATE INDEX IF NOT EXISTS ix_notifications_job_id ON notifications (job_id)')
+    op.execute('DROP INDEX IF EXISTS ix_notifications_job_id_job_row_number')
+    op.execute('DROP INDEX IF EXISTS ix_notifications_service_id_created_at_not_in_job')
+    op.execute('DROP INDEX IF EXISTS ix_notifications_in_flight')
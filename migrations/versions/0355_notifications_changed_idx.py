@@ -0,0 +1,32 @@
+"""
+
+Revision ID: 0355_notifications_changed_idx
+Revises: 0354_notifications_hot_query_idx
+Create Date: 2021-05-06 10:12:44.318207
+
+"""
+import os
+
+from alembic import op
+
+revision = '0355_notifications_changed_idx'
+down_revision = '0354_notifications_hot_query_idx'
+environment = os.environ['NOTIFY_ENVIRONMENT']
+
+
+def upgrade():
+    # We like to run this operation on live via the command prompt, to watch the progress and stop if necessary
+    if environment not in ["live", "production"]:
+        # PLEASE NOTE: that if you create index on production you need to add concurrently to the create statement,
+        # however we are unable to do that inside a transaction like this upgrade method
+
+        # The update-intraday-template-usage task looks for notifications created or updated in the last couple of
+        # minutes, every minute
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS ix_notifications_last_changed
+            ON notifications (COALESCE(updated_at, created_at))
+        """)
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_notifications_last_changed')
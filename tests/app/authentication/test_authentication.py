@@ -18,7 +18,7 @@ from app.authentication.auth import (
 )
 from app.dao.api_key_dao import (
     expire_api_key,
-    get_model_api_keys,
+    get_api_keys_for_authentication,
     get_unsigned_secret,
     get_unsigned_secrets,
     save_model_api_key,
@@ -473,8 +473,8 @@ def test_proxy_key_on_admin_auth_endpoint(notify_api, check_proxy_header, header
 def test_should_cache_service_and_api_key_lookups(mocker, client, sample_api_key):
 
     mock_get_api_keys = mocker.patch(
-        'app.serialised_models.get_model_api_keys',
-        wraps=get_model_api_keys,
+        'app.serialised_models.get_api_keys_for_authentication',
+        wraps=get_api_keys_for_authentication,
     )
     mock_get_service = mocker.patch(
         'app.serialised_models.dao_fetch_service_by_id',
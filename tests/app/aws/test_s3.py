@@ -1,10 +1,15 @@
 from datetime import datetime, timedelta
+from unittest.mock import Mock
 
 import pytest
 import pytz
 from freezegun import freeze_time
 
-from app.aws.s3 import get_list_of_files_by_suffix, get_s3_file
+from app.aws.s3 import (
+    get_job_byte_range_from_s3,
+    get_list_of_files_by_suffix,
+    get_s3_file,
+)
 from tests.app.conftest import datetime_in_past
 
 
@@ -26,6 +31,15 @@ def test_get_s3_file_makes_correct_call(notify_api, mocker):
     )
 
 
+def test_get_job_byte_range_from_s3_only_downloads_the_range(notify_api, mocker):
+    get_s3_mock = mocker.patch('app.aws.s3.get_s3_object')
+    get_s3_mock.return_value.get.return_value = {'Body': Mock(read=Mock(return_value=b'a,b'))}
+
+    assert get_job_byte_range_from_s3('service-id', 'job-id', 10, 19) == 'a,b'
+
+    get_s3_mock.return_value.get.assert_called_once_with(Range='bytes=10-19')
+
+
 @freeze_time("2018-01-11 00:00:00")
 @pytest.mark.parametrize('suffix_str, days_before, returned_no', [
     ('.ACK.txt', None, 1),
@@ -226,6 +226,41 @@ def test_timeout_notifications_sends_status_update_to_service(client, sample_tem
     mocked.assert_called_once_with([str(notification.id), encrypted_data], queue=QueueNames.CALLBACKS)
 
 
+def test_timeout_notifications_only_looks_up_callback_api_once_per_service(client, sample_template, mocker):
+    create_service_callback_api(service=sample_template.service)
+    mocked = mocker.patch('app.celery.service_callback_tasks.send_delivery_status_to_service.apply_async')
+    mock_get_callback_api = mocker.patch(
+        'app.celery.nightly_tasks.get_service_delivery_status_callback_api_for_service',
+        wraps=nightly_tasks.get_service_delivery_status_callback_api_for_service,
+    )
+    for _ in range(3):
+        create_notification(
+            template=sample_template,
+            status='sending',
+            created_at=datetime.utcnow() - timedelta(
+                seconds=current_app.config.get('SENDING_NOTIFICATIONS_TIMEOUT_PERIOD') + 10))
+
+    timeout_notifications()
+
+    mock_get_callback_api.assert_called_once_with(service_id=sample_template.service_id)
+    assert mocked.call_count == 3
+
+
+def test_timeout_notifications_marks_the_jobs_statistics_as_stale(client, sample_job, sample_template, mocker):
+    mock_mark_stale = mocker.patch('app.celery.nightly_tasks.dao_mark_job_statistics_stale')
+    for job in [sample_job, sample_job, None]:
+        create_notification(
+            template=sample_template,
+            job=job,
+            status='sending',
+            created_at=datetime.utcnow() - timedelta(
+                seconds=current_app.config.get('SENDING_NOTIFICATIONS_TIMEOUT_PERIOD') + 10))
+
+    timeout_notifications()
+
+    mock_mark_stale.assert_called_once_with({sample_job.id})
+
+
 def test_should_call_delete_inbound_sms(notify_api, mocker):
     mocker.patch('app.celery.nightly_tasks.delete_inbound_sms_older_than_retention')
     delete_inbound_sms()
@@ -94,6 +94,15 @@ def test_ses_callback_should_update_notification_status(
         send_mock.assert_called_once_with([str(notification.id), encrypted_data], queue="service-callbacks")
 
 
+def test_ses_callback_should_count_the_status_change_in_the_job_statistics(sample_job, sample_email_template, mocker):
+    mock_record = mocker.patch('app.celery.process_ses_receipts_tasks.dao_record_job_notification_status_change')
+    create_notification(template=sample_email_template, job=sample_job, status='sending', reference='ref')
+
+    assert process_ses_results(ses_notification_callback(reference='ref'))
+
+    mock_record.assert_called_once_with(sample_job.id, 'sending', 'delivered')
+
+
 def test_ses_callback_should_not_update_notification_status_if_already_delivered(sample_email_template, mocker):
     mock_dup = mocker.patch('app.celery.process_ses_receipts_tasks.notifications_dao._duplicate_update_warning')
     mock_upd = mocker.patch(
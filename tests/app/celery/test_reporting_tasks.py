@@ -6,10 +6,13 @@ import pytest
 from freezegun import freeze_time
 
 from app.celery.reporting_tasks import (
+    create_intraday_billing,
+    create_monthly_fact_snapshots,
     create_nightly_billing,
     create_nightly_billing_for_day,
     create_nightly_notification_status,
     create_nightly_notification_status_for_day,
+    update_intraday_template_usage,
 )
 from app.config import QueueNames
 from app.dao.fact_billing_dao import get_rate
@@ -496,6 +499,32 @@ def test_create_nightly_billing_for_day_update_when_record_exists(
 
 
 @freeze_time('2019-01-05')
+@freeze_time('2019-08-01 13:30')
+def test_create_intraday_billing_updates_todays_billing(sample_template, mocker):
+    mocker.patch('app.dao.fact_billing_dao.get_rate', side_effect=mocker_get_rate)
+    mock_get_rates = mocker.patch(
+        'app.celery.reporting_tasks.get_rates_for_billing', return_value=([], [])
+    )
+    create_notification(template=sample_template, status='delivered', billable_units=1)
+    create_notification(template=sample_template, status='delivered', billable_units=1)
+    create_notification(template=sample_template, status='delivered', created_at=datetime(2019, 7, 31, 12))
+
+    create_intraday_billing()
+
+    records = FactBilling.query.all()
+    assert len(records) == 1
+    assert records[0].bst_date == date(2019, 8, 1)
+    assert records[0].notifications_sent == 2
+    mock_get_rates.assert_called_once_with()
+
+    create_notification(template=sample_template, status='delivered', billable_units=1)
+    create_intraday_billing()
+
+    records = FactBilling.query.all()
+    assert len(records) == 1
+    assert records[0].notifications_sent == 3
+
+
 def test_create_nightly_notification_status_for_day(notify_db_session):
     first_service = create_service(service_name='First Service')
     first_template = create_template(service=first_service)
@@ -552,3 +581,50 @@ def test_create_nightly_notification_status_for_day_respects_bst(sample_template
 
     assert noti_status[0].bst_date == date(2019, 4, 1)
     assert noti_status[0].notification_status == 'created'
+
+
+@freeze_time('2018-03-30 14:00')
+@pytest.mark.parametrize('watermark, expected_since', [
+    (None, None),
+    (b'2018-03-30T13:59:00.000000Z', datetime(2018, 3, 30, 13, 58)),
+])
+def test_update_intraday_template_usage_counts_templates_changed_since_the_last_run(
+    notify_api, mocker, watermark, expected_since
+):
+    mocker.patch('app.celery.reporting_tasks.redis_store.get', return_value=watermark)
+    mock_set = mocker.patch('app.celery.reporting_tasks.redis_store.set')
+    mock_update = mocker.patch('app.celery.reporting_tasks.update_fact_template_usage_intraday')
+    mock_delete = mocker.patch('app.celery.reporting_tasks.delete_fact_template_usage_intraday_older_than')
+
+    update_intraday_template_usage()
+
+    mock_update.assert_called_once_with(expected_since)
+    mock_delete.assert_called_once_with(date(2018, 3, 29))
+    mock_set.assert_called_once_with('intraday-template-usage-watermark', '2018-03-30T14:00:00.000000Z', ex=86400)
+
+
+def test_create_nightly_notification_status_for_day_bumps_performance_dashboard_version(notify_db_session, mocker):
+    mock_incr = mocker.patch('app.performance_dashboard.cache.redis_store.incr')
+
+    create_nightly_notification_status_for_day('2019-01-01', 'sms')
+
+    mock_incr.assert_called_once_with('performance-dashboard-version')
+
+
+@pytest.mark.parametrize('now, expected_months', [
+    (datetime(2019, 8, 1, 10), [date(2019, 7, 1)]),
+    (datetime(2019, 8, 10, 10), [date(2019, 7, 1)]),
+    (datetime(2019, 8, 11, 10), []),
+    (datetime(2019, 7, 31, 10), []),
+    # BST - it is the 1st of August in London
+    (datetime(2019, 7, 31, 23, 30), [date(2019, 7, 1)]),
+])
+def test_create_monthly_fact_snapshots_updates_months_reprocessed_by_the_nightly_tasks(
+    notify_db_session, mocker, now, expected_months
+):
+    mock_update = mocker.patch('app.celery.reporting_tasks.update_monthly_snapshot')
+
+    with freeze_time(now):
+        create_monthly_fact_snapshots()
+
+    assert [call[0][0] for call in mock_update.call_args_list] == expected_months
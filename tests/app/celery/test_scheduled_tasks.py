@@ -15,6 +15,7 @@ from app.celery.scheduled_tasks import (
     check_job_status,
     delete_invitations,
     delete_verify_codes,
+    reconcile_job_statistics,
     replay_created_notifications,
     run_scheduled_jobs,
     switch_current_sms_provider_on_slow_delivery,
@@ -23,6 +24,7 @@ from app.celery.scheduled_tasks import (
 from app.config import Config, QueueNames
 from app.dao.jobs_dao import dao_get_job_by_id
 from app.dao.provider_details_dao import get_provider_details_by_identifier
+from app.delivery.provider_routing import provider_routing_table
 from app.models import (
     JOB_STATUS_ERROR,
     JOB_STATUS_FINISHED,
@@ -119,6 +121,54 @@ def test_switch_current_sms_provider_on_slow_delivery_switches_when_one_provider
     mock_reduce.assert_called_once_with('firetext', time_threshold=timedelta(minutes=10))
 
 
+@freeze_time('2017-05-01 14:00:00')
+def test_switch_current_sms_provider_on_slow_delivery_uses_delivery_latency_from_redis(
+    mocker,
+    restore_provider_details,
+):
+    mock_is_slow_from_db = mocker.patch('app.celery.scheduled_tasks.is_delivery_slow_for_providers')
+    mock_is_slow = mocker.patch(
+        'app.celery.scheduled_tasks.sms_delivery_latency.is_delivery_slow_for_providers',
+        return_value={'mmg': True, 'firetext': False},
+    )
+    mock_reduce = mocker.patch('app.celery.scheduled_tasks.dao_reduce_sms_provider_priority')
+    provider_routing_table.clear()
+
+    switch_current_sms_provider_on_slow_delivery()
+
+    assert mock_is_slow_from_db.called is False
+    mock_is_slow.assert_called_once_with(
+        providers=mock.ANY,
+        threshold=0.3,
+        window=timedelta(minutes=10),
+        delivery_time=timedelta(minutes=4),
+    )
+    assert sorted(mock_is_slow.call_args[1]['providers']) == ['firetext', 'mmg']
+    mock_reduce.assert_called_once_with('mmg', time_threshold=timedelta(minutes=10))
+
+
+@freeze_time('2017-05-01 14:00:00')
+def test_switch_current_sms_provider_on_slow_delivery_counts_notifications_if_redis_is_unavailable(
+    mocker,
+    restore_provider_details,
+):
+    mocker.patch('app.celery.scheduled_tasks.sms_delivery_latency.is_delivery_slow_for_providers', return_value=None)
+    mock_is_slow_from_db = mocker.patch(
+        'app.celery.scheduled_tasks.is_delivery_slow_for_providers',
+        return_value={'mmg': True, 'firetext': False},
+    )
+    mock_reduce = mocker.patch('app.celery.scheduled_tasks.dao_reduce_sms_provider_priority')
+
+    switch_current_sms_provider_on_slow_delivery()
+
+    mock_is_slow_from_db.assert_called_once_with(
+        threshold=0.3,
+        created_at=datetime(2017, 5, 1, 13, 50),
+        delivery_time=timedelta(minutes=4)
+    )
+    mock_reduce.assert_called_once_with('mmg', time_threshold=timedelta(minutes=10))
+
+
 @freeze_time('2017-05-01 14:00:00')
 @pytest.mark.parametrize('is_slow_dict', [
     {'mmg': False, 'firetext': False},
@@ -537,6 +587,34 @@ def test_check_for_missing_rows_in_completed_jobs_uses_sender_id(mocker, sample_
     )
 
 
+@freeze_time('2021-04-29 12:00')
+def test_reconcile_job_statistics_reconciles_jobs_finished_in_the_last_twenty_minutes(mocker):
+    mock_get_jobs = mocker.patch('app.celery.scheduled_tasks.dao_get_jobs_to_reconcile', return_value=['job'])
+    mock_reconcile = mocker.patch('app.celery.scheduled_tasks.dao_reconcile_job_statistics')
+
+    reconcile_job_statistics()
+
+    mock_get_jobs.assert_called_once_with(datetime(2021, 4, 29, 11, 40))
+    mock_reconcile.assert_called_once_with('job')
+
+
+def test_reconcile_job_statistics_carries_on_if_a_job_fails(mocker, sample_template):
+    failing_job = create_job(sample_template)
+    other_job = create_job(sample_template)
+    mocker.patch('app.celery.scheduled_tasks.dao_get_jobs_to_reconcile', return_value=[failing_job, other_job])
+    mock_reconcile = mocker.patch(
+        'app.celery.scheduled_tasks.dao_reconcile_job_statistics', side_effect=[Exception, None]
+    )
+    mock_mark_stale = mocker.patch('app.celery.scheduled_tasks.dao_mark_job_statistics_stale')
+    mock_logger = mocker.patch('app.celery.scheduled_tasks.current_app.logger.exception')
+
+    reconcile_job_statistics()
+
+    assert mock_reconcile.call_args_list == [call(failing_job), call(other_job)]
+    mock_logger.assert_called_once_with('Failed to reconcile statistics for job {}'.format(failing_job.id))
+    mock_mark_stale.assert_called_once_with([failing_job.id])
+
+
 MockServicesSendingToTVNumbers = namedtuple(
     'ServicesSendingToTVNumbers',
     [
@@ -19,12 +19,14 @@ from sqlalchemy.exc import SQLAlchemyError
 from app import encryption
 from app.celery import provider_tasks, tasks
 from app.celery.tasks import (
+    get_job_shard_byte_ranges,
     get_recipient_csv_and_template_and_sender_id,
     process_incomplete_job,
     process_incomplete_jobs,
     process_job,
     process_returned_letters_list,
     process_row,
+    resume_job_shard,
     s3,
     save_api_email,
     save_api_sms,
@@ -66,7 +68,7 @@ from tests.app.db import (
     create_template,
     create_user,
 )
-from tests.conftest import set_config_values
+from tests.conftest import set_config, set_config_values
 
 
 class AnyStringWith(str):
@@ -661,6 +663,7 @@ def test_should_save_sms_template_to_and_persist_with_job_id(sample_job, mocker)
         job_id=sample_job.id,
         row_number=2)
     mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    mock_record_row_saved = mocker.patch('app.celery.tasks.dao_record_job_row_saved')
 
     notification_id = uuid.uuid4()
     now = datetime.utcnow()
@@ -686,6 +689,7 @@ def test_should_save_sms_template_to_and_persist_with_job_id(sample_job, mocker)
         [str(persisted_notification.id)],
         queue="send-sms-tasks"
     )
+    mock_record_row_saved.assert_called_once_with(sample_job.id, 2, 'created')
 
 
 def test_should_not_save_sms_if_team_key_and_recipient_not_in_team(notify_db_session, mocker):
@@ -1786,6 +1790,109 @@ def test_process_incomplete_jobs_sets_status_to_in_progress_and_resets_processin
     assert mock_process_incomplete_job.mock_calls == [call(str(job1.id)), call(str(job2.id))]
 
 
+def test_process_job_records_the_progress_of_each_shard(notify_api, mocker, sample_template):
+    mocker.patch('app.celery.tasks.s3.get_job_and_metadata_from_s3',
+                 return_value=(load_example_csv('multiple_sms'), {'sender_id': None}))
+    mocker.patch('app.celery.tasks.save_sms.apply_async')
+    mocker.patch('app.celery.tasks.JOB_SHARD_PROGRESS_INTERVAL', 5)
+    mock_record_progress = mocker.patch('app.celery.tasks.dao_record_job_shard_progress')
+    job = create_job(template=sample_template, notification_count=10)
+
+    with set_config(notify_api, 'JOB_RESUME_SHARD_SIZE', 4):
+        process_job(job.id)
+
+    assert mock_record_progress.call_args_list == [call(job.id, 4, 4), call(job.id, 8, 9)]
+
+
+def test_process_incomplete_job_resumes_each_shard_with_missing_rows_in_parallel(notify_api, mocker, sample_template):
+    mocker.patch('app.celery.tasks.s3.get_job_and_metadata_from_s3',
+                 return_value=(load_example_csv('multiple_sms'), {'sender_id': 'sender'}))
+    mock_start_resume = mocker.patch('app.celery.tasks.dao_start_job_resume', return_value='resume-id')
+    mock_resume_shard = mocker.patch('app.celery.tasks.resume_job_shard.apply_async')
+    mock_save_sms = mocker.patch('app.celery.tasks.save_sms.apply_async')
+    job = create_job(template=sample_template, notification_count=10, job_status=JOB_STATUS_ERROR)
+    for row_number in [0, 1, 2, 3, 5]:
+        create_notification(sample_template, job, row_number)
+
+    with set_config(notify_api, 'JOB_RESUME_SHARD_SIZE', 4):
+        process_incomplete_job(str(job.id))
+
+    mock_start_resume.assert_called_once_with(job.id, 2)
+    # the header is 17 bytes and each row is 20, apart from the last which has no line break
+    assert mock_resume_shard.call_args_list == [
+        call([str(job.id), 'resume-id', 4, 7, 'PhoneNumber,Name\n', 97, 176, 'sender'], queue=QueueNames.JOBS),
+        call([str(job.id), 'resume-id', 8, 9, 'PhoneNumber,Name\n', 177, 215, 'sender'], queue=QueueNames.JOBS),
+    ]
+    assert mock_save_sms.called is False
+    assert job.job_status == JOB_STATUS_ERROR
+
+
+def test_process_incomplete_job_resumes_all_shards_itself_if_they_cant_be_tracked(
+    notify_api, mocker, sample_template
+):
+    mocker.patch('app.celery.tasks.s3.get_job_and_metadata_from_s3',
+                 return_value=(load_example_csv('multiple_sms'), {'sender_id': None}))
+    mocker.patch('app.celery.tasks.dao_start_job_resume', return_value=None)
+    mock_save_sms = mocker.patch('app.celery.tasks.save_sms.apply_async')
+    mock_resume_shard = mocker.patch('app.celery.tasks.resume_job_shard.apply_async')
+    job = create_job(template=sample_template, notification_count=10, job_status=JOB_STATUS_ERROR)
+    create_notification(sample_template, job, 0)
+    create_notification(sample_template, job, 5)
+
+    with set_config(notify_api, 'JOB_RESUME_SHARD_SIZE', 4):
+        process_incomplete_job(str(job.id))
+
+    assert mock_resume_shard.called is False
+    assert mock_save_sms.call_count == 8
+    assert job.job_status == JOB_STATUS_FINISHED
+
+
+@pytest.mark.parametrize('shards_remaining, expected_job_status', [
+    (1, JOB_STATUS_ERROR),
+    (0, JOB_STATUS_FINISHED),
+])
+def test_resume_job_shard_sends_rows_that_werent_saved_or_sent_before(
+    notify_api, mocker, sample_template, shards_remaining, expected_job_status
+):
+    mock_get_file = mocker.patch('app.celery.tasks.s3.get_job_and_metadata_from_s3')
+    mock_get_byte_range = mocker.patch(
+        'app.celery.tasks.s3.get_job_byte_range_from_s3',
+        return_value=load_example_csv('multiple_sms').encode('utf-8')[97:177].decode('utf-8'),
+    )
+    mock_save_sms = mocker.patch('app.celery.tasks.save_sms.apply_async')
+    mock_get_progress = mocker.patch('app.celery.tasks.dao_get_job_shard_progress', return_value={4: 4})
+    mock_record_progress = mocker.patch('app.celery.tasks.dao_record_job_shard_progress')
+    mock_finish_shard = mocker.patch('app.celery.tasks.dao_finish_job_resume_shard', return_value=shards_remaining)
+    job = create_job(template=sample_template, notification_count=10, job_status=JOB_STATUS_ERROR)
+    create_notification(sample_template, job, 5)
+
+    with set_config(notify_api, 'JOB_RESUME_SHARD_SIZE', 4):
+        resume_job_shard(str(job.id), 'resume-id', 4, 7, 'PhoneNumber,Name\n', 97, 176, None)
+
+    assert mock_get_file.called is False
+    mock_get_byte_range.assert_called_once_with(str(job.service_id), str(job.id), 97, 176)
+    mock_finish_shard.assert_called_once_with(job.id, 'resume-id')
+    mock_get_progress.assert_called_once_with(job.id, [4])
+    assert [
+        encryption.decrypt(save_call[0][0][2])['row_number'] for save_call in mock_save_sms.call_args_list
+    ] == [6, 7]
+    mock_record_progress.assert_called_once_with(job.id, 4, 7)
+    assert job.job_status == expected_job_status
+
+
+def test_get_job_shard_byte_ranges_keeps_rows_that_span_lines_together(notify_api):
+    contents = '\n  name,address\n"a","1\n2"\nb,3\nc,4\n'
+
+    with set_config(notify_api, 'JOB_RESUME_SHARD_SIZE', 1):
+        csv_header, byte_ranges = get_job_shard_byte_ranges(contents, [0, 2])
+
+    assert csv_header == 'name,address\n'
+    assert {
+        first_row: contents.encode('utf-8')[first_byte:last_byte + 1]
+        for first_row, (first_byte, last_byte) in byte_ranges.items()
+    } == {0: b'"a","1\n2"\n', 2: b'c,4'}
+
+
 def test_process_returned_letters_list(sample_letter_template):
     create_notification(sample_letter_template, reference='ref1')
     create_notification(sample_letter_template, reference='ref2')
@@ -1975,7 +2082,7 @@ def test_save_tasks_use_cached_service_and_template(
     # We talk to the database once for the service and once for the
     # template; subsequent calls are caught by the in memory cache
     assert service_dict_mock.call_args_list == [
-        call(service.id),
+        call(str(service.id)),
     ]
     assert template_dict_mock.call_args_list == [
         call(str(template.id), str(service.id), 1),
@@ -7,7 +7,9 @@ from freezegun import freeze_time
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm.exc import NoResultFound
 
+from app import db
 from app.dao.notifications_dao import (
+    dao_cache_notification_reference,
     dao_create_notification,
     dao_delete_notifications_by_id,
     dao_get_last_notification_added_for_job_id,
@@ -26,6 +28,7 @@ from app.dao.notifications_dao import (
     get_notification_with_personalisation,
     get_notifications_for_job,
     get_notifications_for_service,
+    get_notifications_for_service_by_cursor,
     is_delivery_slow_for_providers,
     notifications_not_yet_sent,
     update_notification_status_by_id,
@@ -90,6 +93,54 @@ def test_should_by_able_to_update_status_by_id(sample_template, sample_job, mmg_
     assert notification.status == 'delivered'
 
 
+def test_updating_a_job_notifications_status_records_the_change_for_the_job(sample_job, mocker):
+    mock_record_change = mocker.patch('app.dao.notifications_dao.dao_record_job_notification_status_change')
+    notification = create_notification(template=sample_job.template, job=sample_job, status='sending')
+    assert notification.status == 'sending'
+
+    notification.status = 'delivered'
+    dao_update_notification(notification)
+
+    mock_record_change.assert_called_once_with(sample_job.id, 'sending', 'delivered')
+
+
+def test_updating_a_notification_without_changing_its_status_records_nothing_for_the_job(sample_job, mocker):
+    mock_record_change = mocker.patch('app.dao.notifications_dao.dao_record_job_notification_status_change')
+    notification = create_notification(template=sample_job.template, job=sample_job, status='sending')
+
+    notification.reference = 'ref'
+    dao_update_notification(notification)
+
+    mock_record_change.assert_not_called()
+
+
+def test_updating_a_job_notifications_status_records_nothing_if_the_commit_fails(sample_job, mocker):
+    mock_record_change = mocker.patch('app.dao.notifications_dao.dao_record_job_notification_status_change')
+    mocker.patch('app.dao.dao_utils.db.session.commit', side_effect=SQLAlchemyError)
+    notification = create_notification(template=sample_job.template, job=sample_job, status='sending')
+    assert notification.status == 'sending'
+
+    notification.status = 'delivered'
+    with pytest.raises(SQLAlchemyError):
+        dao_update_notification(notification)
+
+    mock_record_change.assert_not_called()
+
+
+def test_updating_a_job_notifications_unloaded_status_marks_the_jobs_statistics_as_stale(sample_job, mocker):
+    mock_record_change = mocker.patch('app.dao.notifications_dao.dao_record_job_notification_status_change')
+    mock_mark_stale = mocker.patch('app.dao.notifications_dao.dao_mark_job_statistics_stale')
+    notification = create_notification(template=sample_job.template, job=sample_job, status='sending')
+    # as if the notification had been expired by a commit before its status was changed
+    db.session.expire(notification, ['status'])
+
+    notification.status = 'delivered'
+    dao_update_notification(notification)
+
+    mock_record_change.assert_not_called()
+    mock_mark_stale.assert_called_once_with([sample_job.id])
+
+
 def test_should_not_update_status_by_id_if_not_sending_and_does_not_update_job(sample_job):
     notification = create_notification(template=sample_job.template, status='delivered', job=sample_job)
     assert Notification.query.get(notification.id).status == 'delivered'
@@ -675,12 +726,28 @@ def test_dao_timeout_notifications(sample_template):
     assert Notification.query.get(sending.id).status == 'sending'
     assert Notification.query.get(pending.id).status == 'pending'
     assert Notification.query.get(delivered.id).status == 'delivered'
-    technical_failure_notifications, temporary_failure_notifications = dao_timeout_notifications(1)
+    timed_out_notifications = list(dao_timeout_notifications(1))
     assert Notification.query.get(created.id).status == 'technical-failure'
     assert Notification.query.get(sending.id).status == 'temporary-failure'
     assert Notification.query.get(pending.id).status == 'temporary-failure'
     assert Notification.query.get(delivered.id).status == 'delivered'
-    assert len(technical_failure_notifications + temporary_failure_notifications) == 3
+    assert sorted((n.id, n.status) for n in timed_out_notifications) == sorted([
+        (created.id, 'technical-failure'),
+        (sending.id, 'temporary-failure'),
+        (pending.id, 'temporary-failure'),
+    ])
+
+
+def test_dao_timeout_notifications_updates_in_batches(sample_template):
+    with freeze_time(datetime.utcnow() - timedelta(minutes=2)):
+        created = [create_notification(sample_template, status='created') for _ in range(3)]
+        sending = [create_notification(sample_template, status='sending') for _ in range(2)]
+
+    timed_out_notifications = list(dao_timeout_notifications(1, batch_size=2))
+
+    assert sorted(n.id for n in timed_out_notifications) == sorted(n.id for n in created + sending)
+    assert all(n.service_id == sample_template.service_id for n in timed_out_notifications)
+    assert {n.status for n in Notification.query.all()} == {'technical-failure', 'temporary-failure'}
 
 
 def test_dao_timeout_notifications_only_updates_for_older_notifications(sample_template):
@@ -694,8 +761,7 @@ def test_dao_timeout_notifications_only_updates_for_older_notifications(sample_t
     assert Notification.query.get(sending.id).status == 'sending'
     assert Notification.query.get(pending.id).status == 'pending'
     assert Notification.query.get(delivered.id).status == 'delivered'
-    technical_failure_notifications, temporary_failure_notifications = dao_timeout_notifications(1)
-    assert len(technical_failure_notifications + temporary_failure_notifications) == 0
+    assert list(dao_timeout_notifications(1)) == []
 
 
 def test_dao_timeout_notifications_doesnt_affect_letters(sample_letter_template):
@@ -710,7 +776,7 @@ def test_dao_timeout_notifications_doesnt_affect_letters(sample_letter_template)
     assert Notification.query.get(pending.id).status == 'pending'
     assert Notification.query.get(delivered.id).status == 'delivered'
 
-    technical_failure_notifications, temporary_failure_notifications = dao_timeout_notifications(1)
+    assert list(dao_timeout_notifications(1)) == []
 
 
 def test_should_return_notifications_excluding_jobs_by_default(sample_template, sample_job, sample_api_key):
@@ -744,6 +810,62 @@ def test_should_return_notifications_including_one_offs_by_default(sample_user,
     assert len(include_one_offs_by_default) == 2
 
 
+def test_get_notifications_for_service_by_cursor_pages_through_notifications(sample_template):
+    created_at = datetime(2021, 4, 1, 12, 0)
+    # notifications created at the same instant are ordered by id, so none are skipped between pages
+    notifications = sorted(
+        [create_notification(sample_template, created_at=created_at) for _ in range(3)],
+        key=lambda n: n.id,
+        reverse=True
+    )
+    oldest = create_notification(sample_template, created_at=created_at - timedelta(seconds=1))
+
+    first_page = get_notifications_for_service_by_cursor(sample_template.service_id, page_size=2)
+    assert [n.id for n in first_page.items] == [notifications[0].id, notifications[1].id]
+    assert first_page.has_next
+    assert first_page.next_cursor == (created_at, notifications[1].id)
+
+    second_page = get_notifications_for_service_by_cursor(
+        sample_template.service_id, cursor=first_page.next_cursor, page_size=2
+    )
+    assert [n.id for n in second_page.items] == [notifications[2].id, oldest.id]
+    assert not second_page.has_next
+    assert second_page.next_cursor is None
+
+
+def test_get_notifications_for_service_by_cursor_resolves_older_than(sample_template):
+    older = create_notification(sample_template, created_at=datetime(2021, 4, 1, 12, 0))
+    newer = create_notification(sample_template, created_at=datetime(2021, 4, 1, 12, 1))
+
+    page = get_notifications_for_service_by_cursor(sample_template.service_id, older_than=newer.id)
+
+    assert [n.id for n in page.items] == [older.id]
+    assert not page.has_next
+
+
+def test_get_notifications_for_service_by_cursor_returns_nothing_if_older_than_does_not_exist(sample_template):
+    create_notification(sample_template)
+
+    page = get_notifications_for_service_by_cursor(sample_template.service_id, older_than=uuid.uuid4())
+
+    assert page.items == []
+    assert not page.has_next
+
+
+def test_get_notifications_for_service_by_cursor_applies_filters(sample_template, sample_email_template, sample_job):
+    create_notification(sample_template, job=sample_job)
+    create_notification(sample_template, key_type=KEY_TYPE_TEST)
+    create_notification(sample_email_template)
+    sms = create_notification(sample_template)
+
+    page = get_notifications_for_service_by_cursor(
+        sample_template.service_id,
+        filter_dict={'template_type': ['sms']},
+    )
+
+    assert [n.id for n in page.items] == [sms.id]
+
+
 def test_should_not_count_pages_when_given_a_flag(sample_user, sample_template):
     create_notification(sample_template)
     notification = create_notification(sample_template)
@@ -1102,6 +1224,47 @@ def test_dao_get_notifications_by_recipient_matches_partial_emails(sample_email_
     assert notification_2.id not in notification_ids
 
 
+def test_dao_get_notifications_by_recipient_matches_complete_email_address_exactly(sample_email_template):
+    notification = create_notification(
+        template=sample_email_template, to_field='jack@gmail.com', normalised_to='jack@gmail.com'
+    )
+    create_notification(
+        template=sample_email_template, to_field='flapjack@gmail.com', normalised_to='flapjack@gmail.com'
+    )
+    create_notification(
+        template=sample_email_template,
+        to_field='jill@gmail.com',
+        normalised_to='jill@gmail.com',
+        client_reference='for jack@gmail.com'
+    )
+
+    results = dao_get_notifications_by_recipient_or_reference(
+        notification.service_id, 'Jack@Gmail.com', notification_type='email'
+    )
+
+    assert len(results.items) == 2
+    assert notification.id in [n.id for n in results.items]
+    assert 'flapjack@gmail.com' not in [n.normalised_to for n in results.items]
+
+
+@pytest.mark.parametrize('search_term', [
+    '07700 900855',
+    '+44 7700 900855',
+    '447700900855',
+])
+def test_dao_get_notifications_by_recipient_matches_complete_phone_number_exactly(sample_template, search_term):
+    notification = create_notification(
+        template=sample_template, to_field='07700 900855', normalised_to='447700900855'
+    )
+    create_notification(template=sample_template, to_field='07700 900856', normalised_to='447700900856')
+
+    results = dao_get_notifications_by_recipient_or_reference(
+        notification.service_id, search_term, notification_type='sms'
+    )
+
+    assert [n.id for n in results.items] == [notification.id]
+
+
 @pytest.mark.parametrize('search_term, expected_result_count', [
     ('foobar', 1),
     ('foo', 2),
@@ -1647,6 +1810,100 @@ def test_dao_get_notification_or_history_by_reference_with_no_matches_raises_err
         dao_get_notification_or_history_by_reference('REF1')
 
 
+def test_dao_cache_notification_reference_stores_notification_id(sample_email_template, mocker):
+    mock_redis_set = mocker.patch('app.dao.notifications_dao.redis_store.set')
+    notification = create_notification(template=sample_email_template, reference='REF1')
+
+    dao_cache_notification_reference(notification)
+
+    mock_redis_set.assert_called_once_with(
+        'notification-reference-REF1', str(notification.id), ex=8 * 24 * 60 * 60
+    )
+
+
+def test_dao_cache_notification_reference_does_nothing_without_reference(sample_email_template, mocker):
+    mock_redis_set = mocker.patch('app.dao.notifications_dao.redis_store.set')
+    notification = create_notification(template=sample_email_template, reference=None)
+
+    dao_cache_notification_reference(notification)
+
+    assert not mock_redis_set.called
+
+
+def test_dao_get_notification_or_history_by_reference_uses_cached_notification_id(sample_email_template, mocker):
+    notification = create_notification_history(template=sample_email_template, reference='REF1')
+    mock_redis_get = mocker.patch(
+        'app.dao.notifications_dao.redis_store.get', return_value=str(notification.id).encode('utf-8')
+    )
+
+    assert dao_get_notification_or_history_by_reference('REF1').id == notification.id
+    mock_redis_get.assert_called_once_with('notification-reference-REF1')
+
+
+def test_dao_get_notification_or_history_by_reference_ignores_stale_cached_notification_id(
+    sample_email_template, mocker
+):
+    other_notification = create_notification(template=sample_email_template, reference='REF2')
+    notification = create_notification(template=sample_email_template, reference='REF1')
+    mocker.patch(
+        'app.dao.notifications_dao.redis_store.get', return_value=str(other_notification.id).encode('utf-8')
+    )
+
+    assert dao_get_notification_or_history_by_reference('REF1').id == notification.id
+
+
+@pytest.mark.parametrize('in_history, expected_counts', [
+    (False, (1, 0)),
+    (True, (0, 1)),
+])
+def test_dao_update_notifications_by_reference_uses_cached_notification_id(
+    sample_email_template, mocker, in_history, expected_counts
+):
+    create = create_notification_history if in_history else create_notification
+    notification = create(template=sample_email_template, reference='REF1', status='sending')
+    mocker.patch('app.dao.notifications_dao.redis_store.get', return_value=str(notification.id).encode('utf-8'))
+
+    assert dao_update_notifications_by_reference(['REF1'], {'status': 'delivered'}) == expected_counts
+
+    model = NotificationHistory if in_history else Notification
+    assert model.query.get(notification.id).status == 'delivered'
+
+
+def test_dao_update_notifications_by_reference_falls_back_to_reference_if_cached_id_is_stale(
+    sample_email_template, mocker
+):
+    other_notification = create_notification(template=sample_email_template, reference='REF2', status='sending')
+    notification = create_notification(template=sample_email_template, reference='REF1', status='sending')
+    mocker.patch(
+        'app.dao.notifications_dao.redis_store.get', return_value=str(other_notification.id).encode('utf-8')
+    )
+
+    assert dao_update_notifications_by_reference(['REF1'], {'status': 'delivered'}) == (1, 0)
+
+    assert Notification.query.get(notification.id).status == 'delivered'
+    assert Notification.query.get(other_notification.id).status == 'sending'
+
+
+def test_dao_update_notifications_by_reference_marks_the_jobs_statistics_as_stale(sample_job, mocker):
+    mock_mark_stale = mocker.patch('app.dao.notifications_dao.dao_mark_job_statistics_stale')
+    create_notification(template=sample_job.template, job=sample_job, reference='ref1')
+    create_notification(template=sample_job.template, job=sample_job, reference='ref2')
+    create_notification(template=sample_job.template, reference='ref3')
+
+    dao_update_notifications_by_reference(['ref1', 'ref2', 'ref3'], {'status': 'delivered'})
+
+    assert list(mock_mark_stale.call_args[0][0]) == [sample_job.id]
+
+
+def test_dao_update_notifications_by_reference_does_not_mark_jobs_stale_without_a_status(sample_job, mocker):
+    mock_mark_stale = mocker.patch('app.dao.notifications_dao.dao_mark_job_statistics_stale')
+    create_notification(template=sample_job.template, job=sample_job, reference='ref1')
+
+    dao_update_notifications_by_reference(['ref1'], {'billable_units': 2})
+
+    assert not mock_mark_stale.called
+
+
 @pytest.mark.parametrize("notification_type",
                          ["letter", "email", "sms"]
                          )
@@ -1661,9 +1918,12 @@ def test_notifications_not_yet_sent(sample_service, notification_type):
                         status='sending')
     create_notification(template=template, created_at=datetime.utcnow(), status='created')
 
-    results = notifications_not_yet_sent(older_than, notification_type)
+    results = list(notifications_not_yet_sent(older_than, notification_type))
     assert len(results) == 1
-    assert results[0] == old_notification
+    assert results[0].id == old_notification.id
+    assert results[0].key_type == old_notification.key_type
+    assert results[0].notification_type == notification_type
+    assert results[0].research_mode is False
 
 
 @pytest.mark.parametrize("notification_type",
@@ -1680,7 +1940,7 @@ def test_notifications_not_yet_sent_return_no_rows(sample_service, notification_
                         status='sending')
     create_notification(template=template, created_at=datetime.utcnow(), status='delivered')
 
-    results = notifications_not_yet_sent(older_than, notification_type)
+    results = list(notifications_not_yet_sent(older_than, notification_type))
     assert len(results) == 0
 
 
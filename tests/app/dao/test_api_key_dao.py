@@ -4,8 +4,10 @@ import pytest
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
+from app import encryption
 from app.dao.api_key_dao import (
     expire_api_key,
+    get_api_keys_for_authentication,
     get_model_api_keys,
     get_unsigned_secret,
     get_unsigned_secrets,
@@ -131,3 +133,23 @@ def test_should_not_return_revoked_api_keys_older_than_7_days(
     all_api_keys = get_model_api_keys(service_id=sample_service.id)
 
     assert len(all_api_keys) == expected_length
+
+
+@pytest.mark.parametrize('days_old, expected_length', [(5, 2), (8, 1)])
+def test_get_api_keys_for_authentication_matches_model_api_keys(sample_api_key, days_old, expected_length):
+    expired_api_key = ApiKey(**{'service': sample_api_key.service,
+                                'name': 'expired',
+                                'created_by': sample_api_key.created_by,
+                                'key_type': KEY_TYPE_NORMAL,
+                                'expiry_date': datetime.utcnow() - timedelta(days=days_old)})
+    save_model_api_key(expired_api_key)
+
+    keys = get_api_keys_for_authentication(sample_api_key.service_id)
+    model_keys = get_model_api_keys(service_id=sample_api_key.service_id)
+
+    assert len(keys) == expected_length
+    assert sorted(
+        (key.id, encryption.decrypt(key.secret), key.expiry_date, key.key_type) for key in keys
+    ) == sorted(
+        (key.id, key.secret, key.expiry_date, key.key_type) for key in model_keys
+    )
@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.dao.dao_utils import replica_safe
+from app.dao.uploads_dao import dao_get_uploads_by_service_id
+from app.models import Service
+from tests.app.db import create_job, create_service
+from tests.conftest import set_config
+
+APPLICATION_NAME_QUERY = text("SELECT current_setting('application_name')")
+
+
+@pytest.fixture
+def replica(notify_api, notify_db_session):
+    """
+    Points the replica bind at the test database with a different application_name, so we can tell which
+    connection a query was sent down without running a second postgres.
+    """
+    replica_uri = '{}?application_name=notify-replica'.format(notify_api.config['SQLALCHEMY_DATABASE_URI'])
+    db.replica_lag_checked_at = None
+
+    with set_config(notify_api, 'SQLALCHEMY_BINDS', {'replica': replica_uri}):
+        yield
+        db.session.remove()
+        db.get_engine(notify_api, bind='replica').dispose()
+
+    db.replica_lag_checked_at = None
+
+
+def _application_name():
+    return db.session.execute(APPLICATION_NAME_QUERY).scalar()
+
+
+def test_reading_from_replica_sends_queries_to_the_replica(replica):
+    assert _application_name() != 'notify-replica'
+
+    with db.reading_from_replica():
+        assert db.is_reading_from_replica()
+        assert _application_name() == 'notify-replica'
+
+    assert not db.is_reading_from_replica()
+    assert _application_name() != 'notify-replica'
+
+
+def test_replica_safe_reads_committed_data_from_the_replica(replica):
+    service = create_service()
+
+    @replica_safe
+    def get_service_name_and_application_name(service_id):
+        return Service.query.get(service_id).name, _application_name()
+
+    assert get_service_name_and_application_name(service.id) == (service.name, 'notify-replica')
+
+
+def test_replica_safe_dao_returns_results_from_the_replica(replica, sample_template):
+    create_job(sample_template)
+
+    assert dao_get_uploads_by_service_id(sample_template.service_id).total == 1
+
+
+def test_reading_from_replica_sends_flushes_to_the_primary(replica):
+    service = create_service(service_name='before')
+    service.name = 'after'
+
+    with db.reading_from_replica():
+        # the query autoflushes the change to the primary first
+        assert Service.query.filter(Service.name == 'after').count() == 0
+    db.session.commit()
+
+    assert Service.query.get(service.id).name == 'after'
+
+
+def test_reading_from_replica_uses_the_primary_if_there_is_no_replica(notify_api, notify_db_session):
+    with set_config(notify_api, 'SQLALCHEMY_BINDS', {}):
+        with db.reading_from_replica():
+            assert not db.is_reading_from_replica()
+            assert _application_name() != 'notify-replica'
+
+
+def test_reading_from_replica_uses_the_primary_if_the_replica_is_behind(notify_api, replica, mocker):
+    mock_warning = mocker.patch.object(notify_api.logger, 'warning')
+
+    with set_config(notify_api, 'SQLALCHEMY_REPLICA_MAX_LAG', -1):
+        with db.reading_from_replica():
+            assert _application_name() != 'notify-replica'
+
+    mock_warning.assert_called_once_with('Read replica is 0 seconds behind, reading from the primary')
+
+
+def test_reading_from_replica_uses_the_primary_if_the_replica_is_unavailable(notify_api, replica, mocker):
+    mock_exception = mocker.patch.object(notify_api.logger, 'exception')
+
+    with set_config(notify_api, 'SQLALCHEMY_BINDS', {'replica': 'postgresql://localhost:1/no_such_database'}):
+        with db.reading_from_replica():
+            assert not db.is_reading_from_replica()
+
+    mock_exception.assert_called_once_with('Could not check read replica lag, reading from the primary')
+
+
+def test_reading_from_replica_only_checks_lag_once_per_interval(notify_api, replica):
+    with set_config(notify_api, 'SQLALCHEMY_REPLICA_LAG_CHECK_INTERVAL', 60):
+        with db.reading_from_replica():
+            assert db.is_reading_from_replica()
+
+        with set_config(notify_api, 'SQLALCHEMY_REPLICA_MAX_LAG', -1):
+            with db.reading_from_replica():
+                assert db.is_reading_from_replica()
@@ -0,0 +1,115 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.dao.fact_monthly_snapshot_dao import (
+    get_whole_months_in_range,
+    split_date_range,
+    update_monthly_snapshot,
+)
+from app.models import (
+    FactBillingMonthly,
+    FactMonthlySnapshot,
+    FactNotificationStatusMonthly,
+)
+from tests.app.db import (
+    create_ft_billing,
+    create_ft_notification_status,
+    create_service,
+    create_template,
+)
+
+
+@pytest.mark.parametrize('start_date, end_date, expected_months', [
+    (date(2019, 4, 1), date(2019, 4, 30), [date(2019, 4, 1)]),
+    (date(2019, 4, 1), date(2019, 4, 29), []),
+    (date(2019, 4, 2), date(2019, 6, 30), [date(2019, 5, 1), date(2019, 6, 1)]),
+    (datetime(2019, 1, 1), datetime(2019, 3, 31), [date(2019, 1, 1), date(2019, 2, 1), date(2019, 3, 1)]),
+    (date(2019, 12, 1), date(2020, 1, 31), [date(2019, 12, 1), date(2020, 1, 1)]),
+    (date(2019, 5, 1), date(2019, 4, 1), []),
+])
+def test_get_whole_months_in_range(start_date, end_date, expected_months):
+    assert get_whole_months_in_range(start_date, end_date) == expected_months
+
+
+@pytest.mark.parametrize('start_date, end_date, expected_months, expected_day_ranges', [
+    (
+        date(2019, 4, 1), date(2020, 3, 31),
+        [date(2019, 5, 1), date(2019, 6, 1), date(2019, 8, 1)],
+        [(date(2019, 4, 1), date(2019, 4, 30)), (date(2019, 7, 1), date(2019, 7, 31)),
+         (date(2019, 9, 1), date(2020, 3, 31))],
+    ),
+    (
+        date(2019, 5, 15), date(2019, 7, 10),
+        [date(2019, 6, 1)],
+        [(date(2019, 5, 15), date(2019, 5, 31)), (date(2019, 7, 1), date(2019, 7, 10))],
+    ),
+    (
+        date(2019, 5, 1), date(2019, 6, 30),
+        [date(2019, 5, 1), date(2019, 6, 1)],
+        [],
+    ),
+    (
+        date(2019, 5, 2), date(2019, 5, 31),
+        [],
+        [(date(2019, 5, 2), date(2019, 5, 31))],
+    ),
+])
+def test_split_date_range(notify_db_session, start_date, end_date, expected_months, expected_day_ranges):
+    for month in [date(2019, 5, 1), date(2019, 6, 1), date(2019, 8, 1)]:
+        update_monthly_snapshot(month)
+
+    assert split_date_range(start_date, end_date) == (expected_months, expected_day_ranges)
+
+
+def test_update_monthly_snapshot_adds_up_the_month(notify_db_session):
+    service = create_service()
+    sms_template = create_template(service=service)
+    letter_template = create_template(service=service, template_type='letter')
+
+    create_ft_billing(bst_date=date(2019, 4, 30), template=sms_template, billable_unit=100, rate=0.11)
+    create_ft_billing(bst_date=date(2019, 5, 1), template=sms_template, billable_unit=2, rate=0.11)
+    create_ft_billing(
+        bst_date=date(2019, 5, 31), template=sms_template, billable_unit=3, rate_multiplier=2, rate=0.11, provider='mmg'
+    )
+    create_ft_billing(bst_date=date(2019, 5, 10), template=letter_template, notifications_sent=4, rate=0.5,
+                      postage='first')
+    create_ft_notification_status(date(2019, 5, 1), template=sms_template, count=2)
+    create_ft_notification_status(date(2019, 5, 31), template=sms_template, count=3)
+    create_ft_notification_status(date(2019, 6, 1), template=sms_template, count=100)
+
+    update_monthly_snapshot(date(2019, 5, 20))
+
+    billing = sorted(FactBillingMonthly.query.all(), key=lambda row: row.notification_type)
+    assert len(billing) == 2
+    assert billing[0].month == date(2019, 5, 1)
+    assert billing[0].notification_type == 'letter'
+    assert billing[0].postage == 'first'
+    assert billing[0].rate == Decimal('0.5')
+    assert billing[0].notifications_sent == 4
+    assert billing[1].notification_type == 'sms'
+    assert billing[1].rate == Decimal('0.11')
+    assert billing[1].billable_units == 8
+    assert billing[1].notifications_sent == 2
+
+    notification_status = FactNotificationStatusMonthly.query.one()
+    assert notification_status.month == date(2019, 5, 1)
+    assert notification_status.notification_type == 'sms'
+    assert notification_status.notification_status == 'delivered'
+    assert notification_status.notification_count == 5
+
+    assert FactMonthlySnapshot.query.one().month == date(2019, 5, 1)
+
+
+def test_update_monthly_snapshot_replaces_an_existing_snapshot(notify_db_session):
+    sms_template = create_template(service=create_service())
+    create_ft_billing(bst_date=date(2019, 5, 1), template=sms_template, billable_unit=2, rate=0.11)
+    update_monthly_snapshot(date(2019, 5, 1))
+
+    create_ft_billing(bst_date=date(2019, 5, 2), template=sms_template, billable_unit=3, rate=0.11)
+    update_monthly_snapshot(date(2019, 5, 1))
+
+    assert FactBillingMonthly.query.one().billable_units == 5
+    snapshot = FactMonthlySnapshot.query.one()
+    assert snapshot.updated_at is not None
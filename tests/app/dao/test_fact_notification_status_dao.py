@@ -5,7 +5,9 @@ import mock
 import pytest
 from freezegun import freeze_time
 
+from app.dao.fact_monthly_snapshot_dao import update_monthly_snapshot
 from app.dao.fact_notification_status_dao import (
+    delete_fact_template_usage_intraday_older_than,
     fetch_monthly_notification_statuses_per_service,
     fetch_monthly_template_usage_for_service,
     fetch_notification_status_for_day,
@@ -15,8 +17,10 @@ from app.dao.fact_notification_status_dao import (
     fetch_notification_status_totals_for_all_services,
     fetch_notification_statuses_for_job,
     fetch_stats_for_all_services_by_date_range,
+    get_total_notifications_for_all_time,
     get_total_notifications_for_date_range,
     update_fact_notification_status,
+    update_fact_template_usage_intraday,
 )
 from app.models import (
     EMAIL_TYPE,
@@ -34,6 +38,7 @@ from app.models import (
     NOTIFICATION_TEMPORARY_FAILURE,
     SMS_TYPE,
     FactNotificationStatus,
+    FactTemplateUsageIntraday,
 )
 from tests.app.db import (
     create_ft_notification_status,
@@ -292,6 +297,7 @@ def test_fetch_notification_status_by_template_for_service_for_today_and_7_previ
     # too early, shouldn't be included
     create_notification(service_1.templates[0], created_at=datetime(2018, 10, 30, 12, 0, 0), status='delivered')
 
+    update_fact_template_usage_intraday()
     results = fetch_notification_status_for_service_for_today_and_7_previous_days(service_1.id, by_template=True)
 
     assert [
@@ -483,6 +489,7 @@ def test_fetch_monthly_template_usage_for_service(sample_service):
                                   count=5)
     create_notification(template=template_three, created_at=datetime.utcnow() - timedelta(days=1))
     create_notification(template=template_three, created_at=datetime.utcnow())
+    update_fact_template_usage_intraday()
     results = fetch_monthly_template_usage_for_service(
         datetime(2017, 4, 1), datetime(2018, 3, 31), sample_service.id
     )
@@ -572,6 +579,7 @@ def test_fetch_monthly_template_usage_for_service_does_not_include_cancelled_sta
                                   notification_status='cancelled',
                                   count=15)
     create_notification(template=sample_template, created_at=datetime.utcnow(), status='cancelled')
+    update_fact_template_usage_intraday()
     results = fetch_monthly_template_usage_for_service(
         datetime(2018, 1, 1), datetime(2018, 3, 31), sample_template.service_id
     )
@@ -593,6 +601,7 @@ def test_fetch_monthly_template_usage_for_service_does_not_include_test_notifica
                         created_at=datetime.utcnow(),
                         status='delivered',
                         key_type='test',)
+    update_fact_template_usage_intraday()
     results = fetch_monthly_template_usage_for_service(
         datetime(2018, 1, 1), datetime(2018, 3, 31), sample_template.service_id
     )
@@ -600,6 +609,105 @@ def test_fetch_monthly_template_usage_for_service_does_not_include_test_notifica
     assert len(results) == 0
 
 
+@freeze_time('2018-03-30 14:00')
+def test_fetch_monthly_template_usage_for_service_uses_todays_rollup_not_notifications(sample_template):
+    create_notification(template=sample_template, created_at=datetime.utcnow())
+    update_fact_template_usage_intraday()
+    create_notification(template=sample_template, created_at=datetime.utcnow())
+
+    results = fetch_monthly_template_usage_for_service(
+        datetime(2018, 1, 1), datetime(2018, 3, 31), sample_template.service_id
+    )
+
+    assert [(row.name, row.month, row.year, row.count) for row in results] == [(sample_template.name, 3, 2018, 1)]
+
+
+@freeze_time('2018-03-30 14:00')
+def test_update_fact_template_usage_intraday_counts_todays_notifications(sample_service):
+    sms_template = create_template(service=sample_service, template_type=SMS_TYPE)
+    email_template = create_template(service=sample_service, template_type=EMAIL_TYPE)
+    create_notification(sms_template, created_at=datetime(2018, 3, 30, 9, 10), status='delivered')
+    create_notification(sms_template, created_at=datetime(2018, 3, 30, 9, 50), status='delivered')
+    create_notification(sms_template, created_at=datetime(2018, 3, 30, 10), status='delivered')
+    create_notification(sms_template, created_at=datetime(2018, 3, 30, 11), status='sending')
+    create_notification(email_template, created_at=datetime(2018, 3, 30, 12), status='created')
+    # yesterday and test key notifications aren't counted
+    create_notification(sms_template, created_at=datetime(2018, 3, 29, 12), status='delivered')
+    create_notification(sms_template, created_at=datetime(2018, 3, 30, 12), status='delivered', key_type=KEY_TYPE_TEST)
+
+    update_fact_template_usage_intraday()
+
+    rows = sorted(
+        (
+            row.template_id, row.created_hour, row.notification_type, row.notification_status,
+            row.notification_count, row.bst_date,
+        )
+        for row in FactTemplateUsageIntraday.query.all()
+    )
+    assert rows == sorted([
+        (sms_template.id, datetime(2018, 3, 30, 9), 'sms', 'delivered', 2, date(2018, 3, 30)),
+        (sms_template.id, datetime(2018, 3, 30, 10), 'sms', 'delivered', 1, date(2018, 3, 30)),
+        (sms_template.id, datetime(2018, 3, 30, 11), 'sms', 'sending', 1, date(2018, 3, 30)),
+        (email_template.id, datetime(2018, 3, 30, 12), 'email', 'created', 1, date(2018, 3, 30)),
+    ])
+
+
+def test_update_fact_template_usage_intraday_only_counts_hours_changed_since(sample_service):
+    template_1 = create_template(service=sample_service, template_name='one')
+    template_2 = create_template(service=sample_service, template_name='two')
+
+    with freeze_time('2018-03-30 12:00'):
+        create_notification(template_1, created_at=datetime(2018, 3, 30, 11), status='sending')
+        notification = create_notification(template_1, status='sending')
+        create_notification(template_2, status='sending')
+        update_fact_template_usage_intraday()
+
+    # rows that haven't changed since are never counted again, so their old counts are left alone
+    FactTemplateUsageIntraday.query.filter_by(created_hour=datetime(2018, 3, 30, 11)).update({'notification_count': 5})
+    FactTemplateUsageIntraday.query.filter_by(template_id=template_2.id).update({'notification_count': 5})
+
+    with freeze_time('2018-03-30 12:05'):
+        notification.status = 'delivered'
+        notification.updated_at = datetime.utcnow()
+        update_fact_template_usage_intraday(since=datetime(2018, 3, 30, 12, 1))
+
+    rows = sorted(
+        (row.template_id == template_1.id, row.created_hour, row.notification_status, row.notification_count)
+        for row in FactTemplateUsageIntraday.query.all()
+    )
+    assert rows == [
+        (False, datetime(2018, 3, 30, 12), 'sending', 5),
+        (True, datetime(2018, 3, 30, 11), 'sending', 5),
+        (True, datetime(2018, 3, 30, 12), 'delivered', 1),
+    ]
+
+
+def test_update_fact_template_usage_intraday_does_nothing_if_nothing_has_changed(sample_template):
+    with freeze_time('2018-03-30 12:00'):
+        create_notification(sample_template, status='sending')
+        update_fact_template_usage_intraday()
+
+    with freeze_time('2018-03-30 12:05'):
+        update_fact_template_usage_intraday(since=datetime(2018, 3, 30, 12, 1))
+
+    assert [(row.notification_status, row.notification_count) for row in FactTemplateUsageIntraday.query.all()] == [
+        ('sending', 1)
+    ]
+
+
+def test_delete_fact_template_usage_intraday_older_than(sample_template):
+    for day in [date(2018, 3, 28), date(2018, 3, 29), date(2018, 3, 30)]:
+        with freeze_time(day):
+            create_notification(sample_template)
+            update_fact_template_usage_intraday()
+
+    delete_fact_template_usage_intraday_older_than(date(2018, 3, 29))
+
+    assert sorted(row.bst_date for row in FactTemplateUsageIntraday.query.all()) == [
+        date(2018, 3, 29), date(2018, 3, 30)
+    ]
+
+
 @freeze_time('2019-05-10 14:00')
 def test_fetch_monthly_notification_statuses_per_service(notify_db_session):
     service_one = create_service(service_name='service one', service_id=UUID('e4e34c4e-73c1-4802-811c-3dd273f21da4'))
@@ -698,3 +806,44 @@ def test_get_total_notifications_for_date_range(sample_service):
 
     assert len(results) == 1
     assert results[0] == ("2021-03-01", 15, 20, 3)
+
+
+def test_get_total_notifications_for_all_time(sample_service):
+    template_sms = create_template(service=sample_service, template_type='sms', template_name='a')
+    template_email = create_template(service=sample_service, template_type='email', template_name='b')
+    template_letter = create_template(service=sample_service, template_type='letter', template_name='c')
+    create_ft_notification_status(bst_date=date(2021, 1, 10), template=template_email, count=15)
+    create_ft_notification_status(bst_date=date(2021, 1, 31), template=template_sms, count=20)
+    create_ft_notification_status(bst_date=date(2021, 2, 1), template=template_sms, count=5)
+    create_ft_notification_status(bst_date=date(2021, 2, 1), template=template_sms, key_type=KEY_TYPE_TEST, count=7)
+    create_ft_notification_status(bst_date=date(2021, 3, 1), template=template_letter, count=3)
+    update_monthly_snapshot(date(2021, 2, 1))
+
+    assert get_total_notifications_for_all_time() == (15, 25, 3)
+
+
+def test_get_total_notifications_for_all_time_if_nothing_sent(notify_db_session):
+    assert get_total_notifications_for_all_time() == (0, 0, 0)
+
+
+@pytest.mark.parametrize('start_date, end_date', [
+    (date(2018, 9, 1), date(2018, 10, 31)),
+    (date(2018, 9, 15), date(2018, 10, 31)),
+    (date(2018, 9, 10), date(2018, 10, 5)),
+])
+@freeze_time('2018-11-15 14:00')
+def test_fetch_notification_status_totals_for_all_services_is_the_same_with_monthly_snapshots(
+    notify_db_session, start_date, end_date
+):
+    sms_template = create_template(service=create_service())
+    email_template = create_template(service=sms_template.service, template_type=EMAIL_TYPE)
+    for bst_date in [date(2018, 9, 1), date(2018, 9, 14), date(2018, 9, 30), date(2018, 10, 3), date(2018, 10, 31)]:
+        create_ft_notification_status(bst_date, template=sms_template, count=2)
+        create_ft_notification_status(bst_date, template=sms_template, notification_status='failed')
+        create_ft_notification_status(bst_date, template=email_template, key_type=KEY_TYPE_TEST, count=3)
+    from_daily_tables = fetch_notification_status_totals_for_all_services(start_date, end_date)
+
+    update_monthly_snapshot(date(2018, 9, 1))
+    update_monthly_snapshot(date(2018, 10, 1))
+
+    assert fetch_notification_status_totals_for_all_services(start_date, end_date) == from_daily_tables
@@ -1,12 +1,14 @@
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 
 import pytest
 from freezegun import freeze_time
-from notifications_utils.timezones import convert_utc_to_bst
+from notifications_utils.timezones import convert_bst_to_utc, convert_utc_to_bst
 
 from app import db
 from app.dao.fact_billing_dao import (
+    _fetch_billing_data_for_services,
+    _query_for_billing_data,
     delete_billing_data_for_service_for_day,
     fetch_billing_data_for_day,
     fetch_billing_totals_for_year,
@@ -19,6 +21,7 @@ from app.dao.fact_billing_dao import (
     get_rate,
     get_rates_for_billing,
 )
+from app.dao.fact_monthly_snapshot_dao import update_monthly_snapshot
 from app.dao.organisation_dao import dao_add_service_to_organisation
 from app.models import NOTIFICATION_STATUS_TYPES, FactBilling
 from tests.app.db import (
@@ -318,6 +321,71 @@ def test_fetch_billing_data_for_day_bills_correctly_for_status(notify_db_session
     assert 3 == letter_results[0].notifications_sent
 
 
+def _set_up_billing_data_for_several_services(process_day):
+    services = []
+    for i, days_of_retention in enumerate([None, 3, 10, None]):
+        service = create_service(service_name='service {}'.format(i), service_permissions=['sms', 'email'])
+        services.append(service)
+        if days_of_retention:
+            create_service_data_retention(service, notification_type='sms', days_of_retention=days_of_retention)
+        sms_template = create_template(service=service, template_type='sms')
+        email_template = create_template(service=service, template_type='email')
+        letter_template = create_template(service=service, template_type='letter')
+        for create in (create_notification, create_notification_history):
+            create(template=sms_template, status='delivered', created_at=process_day, billable_units=i + 1)
+            create(template=sms_template, status='delivered', created_at=process_day, rate_multiplier=2)
+            create(template=email_template, status='delivered', created_at=process_day)
+            create(template=letter_template, status='delivered', created_at=process_day, postage='first')
+    services[1].crown = False
+    return services
+
+
+def _sorted_billing_rows(rows):
+    return sorted(tuple(str(value) for value in row) for row in rows)
+
+
+@freeze_time('2018-04-10 12:00:00')
+@pytest.mark.parametrize('check_permissions', [True, False])
+@pytest.mark.parametrize('days_ago', [0, 4, 8])
+def test_fetch_billing_data_for_day_returns_same_rows_as_querying_each_service(
+    notify_db_session, check_permissions, days_ago
+):
+    process_day = datetime(2018, 4, 10, 11, 0) - timedelta(days=days_ago)
+    services = _set_up_billing_data_for_several_services(process_day)
+    start_date = convert_bst_to_utc(datetime.combine(process_day.date(), time.min))
+    end_date = convert_bst_to_utc(datetime.combine(process_day.date() + timedelta(days=1), time.min))
+
+    results = fetch_billing_data_for_day(process_day.date(), check_permissions=check_permissions)
+    expected = _fetch_billing_data_for_services(
+        services, process_day.date(), start_date, end_date, check_permissions=check_permissions
+    )
+
+    assert len(results) > 0
+    assert _sorted_billing_rows(results) == _sorted_billing_rows(expected)
+
+
+@freeze_time('2018-04-10 12:00:00')
+def test_fetch_billing_data_for_day_queries_each_table_once_per_notification_type(notify_db_session, mocker):
+    process_day = datetime(2018, 4, 5, 11, 0)
+    _set_up_billing_data_for_several_services(process_day)
+    mock_query = mocker.patch(
+        'app.dao.fact_billing_dao._query_for_billing_data', wraps=_query_for_billing_data
+    )
+
+    fetch_billing_data_for_day(process_day.date())
+
+    # the service with three days sms retention has moved to notification history
+    assert sorted(
+        (call[1]['notification_type'], call[1]['table'].__name__, call[1]['service_ids'] is None)
+        for call in mock_query.call_args_list
+    ) == [
+        ('email', 'Notification', True),
+        ('letter', 'Notification', True),
+        ('sms', 'Notification', False),
+        ('sms', 'NotificationHistory', False),
+    ]
+
+
 def test_get_rates_for_billing(notify_db_session):
     create_rate(start_date=datetime.utcnow(), value=12, notification_type='email')
     create_rate(start_date=datetime.utcnow(), value=22, notification_type='sms')
@@ -422,18 +490,17 @@ def test_fetch_monthly_billing_for_year(notify_db_session):
 
 
 @freeze_time('2018-08-01 13:30:00')
-def test_fetch_monthly_billing_for_year_adds_data_for_today(notify_db_session):
+def test_fetch_monthly_billing_for_year_does_not_update_data_for_today(notify_db_session):
     service = create_service()
     template = create_template(service=service, template_type="email")
     for i in range(1, 32):
         create_ft_billing(bst_date='2018-07-{}'.format(i), template=template)
     create_notification(template=template, status='delivered')
 
-    assert db.session.query(FactBilling.bst_date).count() == 31
     results = fetch_monthly_billing_for_year(service_id=service.id,
                                              year=2018)
-    assert db.session.query(FactBilling.bst_date).count() == 32
-    assert len(results) == 2
+    assert db.session.query(FactBilling.bst_date).count() == 31
+    assert len(results) == 1
 
 
 def test_fetch_monthly_billing_for_year_return_financial_year(notify_db_session):
@@ -730,7 +797,7 @@ def test_fetch_usage_year_for_organisation(notify_db_session):
     assert second_row['emails_sent'] == 1100
 
 
-def test_fetch_usage_year_for_organisation_populates_ft_billing_for_today(notify_db_session):
+def test_fetch_usage_year_for_organisation_does_not_update_ft_billing_for_today(notify_db_session):
     create_letter_rate(start_date=datetime.utcnow() - timedelta(days=1))
     create_rate(start_date=datetime.utcnow() - timedelta(days=1), value=0.65, notification_type='sms')
     new_org = create_organisation(name='New organisation')
@@ -746,7 +813,7 @@ def test_fetch_usage_year_for_organisation_populates_ft_billing_for_today(notify
 
     results = fetch_usage_year_for_organisation(organisation_id=new_org.id, year=current_year)
     assert len(results) == 1
-    assert FactBilling.query.count() == 1
+    assert FactBilling.query.count() == 0
 
 
 @freeze_time('2020-02-27 13:30')
@@ -774,3 +841,47 @@ def test_fetch_usage_year_for_organisation_only_returns_data_for_live_services(n
     assert len(results) == 1
     assert results[str(live_service.id)]['sms_billable_units'] == 19
     assert results[str(live_service.id)]['emails_sent'] == 0
+
+
+@pytest.mark.parametrize('fetch_report', [
+    fetch_sms_billing_for_all_services,
+    fetch_letter_costs_for_all_services,
+    fetch_letter_line_items_for_all_services,
+])
+@pytest.mark.parametrize('start_date, end_date', [
+    (date(2019, 4, 1), date(2019, 6, 30)),
+    (date(2019, 5, 1), date(2019, 5, 31)),
+    (date(2019, 4, 25), date(2019, 6, 1)),
+    (date(2019, 5, 2), date(2019, 5, 30)),
+])
+def test_billing_reports_are_the_same_with_monthly_snapshots(notify_db_session, fetch_report, start_date, end_date):
+    set_up_usage_data(datetime(2019, 5, 1))
+    create_ft_billing(
+        bst_date=date(2019, 5, 10),
+        template=create_template(service=create_service(service_name='z - international')),
+        rate_multiplier=2,
+        international=True,
+        billable_unit=3,
+        rate=0.11,
+    )
+    from_daily_tables = fetch_report(start_date, end_date)
+
+    for month in [date(2019, 4, 1), date(2019, 5, 1), date(2019, 6, 1)]:
+        update_monthly_snapshot(month)
+
+    assert fetch_report(start_date, end_date) == from_daily_tables
+
+
+def test_fetch_sms_free_allowance_remainder_uses_monthly_snapshots(notify_db_session):
+    service = create_service()
+    template = create_template(service=service)
+    create_annual_billing(service_id=service.id, free_sms_fragment_limit=10, financial_year_start=2019)
+    create_ft_billing(bst_date=date(2019, 4, 20), template=template, billable_unit=2, rate_multiplier=2, rate=0.11)
+    create_ft_billing(bst_date=date(2019, 5, 20), template=template, billable_unit=1, rate=0.11)
+    update_monthly_snapshot(date(2019, 4, 1))
+    # an ft_billing row added after the snapshot was built isn't counted for the month
+    create_ft_billing(bst_date=date(2019, 4, 21), template=template, billable_unit=5, rate=0.11)
+
+    results = fetch_sms_free_allowance_remainder(datetime(2019, 5, 21)).all()
+
+    assert results == [(service.id, 10, 5, 5)]
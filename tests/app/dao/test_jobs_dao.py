@@ -1,24 +1,37 @@
 import uuid
 from datetime import datetime, timedelta
 from functools import partial
+from unittest.mock import call
 
 import pytest
 from freezegun import freeze_time
 from sqlalchemy.exc import IntegrityError
 
+from app.dao import jobs_dao
 from app.dao.jobs_dao import (
     can_letter_job_be_cancelled,
     dao_cancel_letter_job,
     dao_create_job,
+    dao_finish_job_resume_shard,
     dao_get_future_scheduled_job_by_id_and_service_id,
     dao_get_job_by_service_id_and_job_id,
+    dao_get_job_shard_progress,
+    dao_get_job_statistics,
     dao_get_jobs_by_service_id,
     dao_get_jobs_older_than_data_retention,
+    dao_get_jobs_to_reconcile,
     dao_get_notification_outcomes_for_job,
+    dao_get_saved_job_row_numbers,
+    dao_mark_job_statistics_stale,
+    dao_reconcile_job_statistics,
+    dao_record_job_notification_status_change,
+    dao_record_job_row_saved,
     dao_set_scheduled_jobs_to_pending,
+    dao_start_job_resume,
     dao_update_job,
     find_jobs_with_missing_rows,
     find_missing_row_for_job,
+    find_missing_rows_for_job,
 )
 from app.models import (
     EMAIL_TYPE,
@@ -370,6 +383,20 @@ def test_dao_cancel_letter_job_cancels_job_and_returns_number_of_cancelled_notif
     assert job.job_status == 'cancelled'
 
 
+def test_dao_cancel_letter_job_replaces_the_jobs_statistics(sample_letter_template, mock_redis):
+    job = create_job(template=sample_letter_template, notification_count=2, job_status='finished')
+    create_notification(template=job.template, job=job, status='created')
+    create_notification(template=job.template, job=job, status='created')
+
+    dao_cancel_letter_job(job)
+
+    mock_redis.pipeline.return_value.hset.assert_called_once_with(
+        'job-{}-statistics-reconciling'.format(job.id), mapping={'cancelled': 2, '_complete': 1}
+    )
+    mock_redis.hgetall.return_value = {b'_complete': b'1', b'cancelled': b'2'}
+    assert dao_get_job_statistics(job.service_id, job.id) == [(2, 'cancelled')]
+
+
 @freeze_time('2019-06-13 13:00')
 def test_can_letter_job_be_cancelled_returns_true_if_job_can_be_cancelled(sample_letter_template):
     job = create_job(template=sample_letter_template, notification_count=1, job_status='finished')
@@ -558,6 +585,152 @@ def test_find_missing_row_for_job_return_none_when_row_isnt_missing(sample_email
     assert len(results) == 0
 
 
+@pytest.fixture
+def mock_redis(mocker):
+    mocker.patch.object(jobs_dao.redis_store, 'active', True, create=True)
+    return mocker.patch.object(jobs_dao.redis_store, 'redis_store', create=True)
+
+
+def test_dao_record_job_row_saved_sets_the_rows_bit_and_counts_its_status(mock_redis, fake_uuid):
+    dao_record_job_row_saved(fake_uuid, 7, 'created')
+
+    pipeline = mock_redis.pipeline.return_value
+    pipeline.setbit.assert_called_once_with('job-{}-saved-rows'.format(fake_uuid), 7, 1)
+    pipeline.hincrby.assert_called_once_with('job-{}-statistics'.format(fake_uuid), 'created', 1)
+    assert pipeline.expire.call_args_list == [
+        call('job-{}-saved-rows'.format(fake_uuid), 172800),
+        call('job-{}-statistics'.format(fake_uuid), 345600),
+    ]
+    pipeline.execute.assert_called_once_with()
+
+
+def test_dao_record_job_notification_status_change(mock_redis, fake_uuid):
+    dao_record_job_notification_status_change(fake_uuid, 'sending', 'delivered')
+
+    pipeline = mock_redis.pipeline.return_value
+    assert pipeline.hincrby.call_args_list == [
+        call('job-{}-statistics'.format(fake_uuid), 'sending', -1),
+        call('job-{}-statistics'.format(fake_uuid), 'delivered', 1),
+    ]
+    pipeline.execute.assert_called_once_with()
+
+
+def test_dao_reconcile_job_statistics_replaces_the_counts(sample_job, mock_redis):
+    create_notification(sample_job.template, job=sample_job, status='delivered')
+    create_notification(sample_job.template, job=sample_job, status='delivered')
+    create_notification(sample_job.template, job=sample_job, status='sending')
+
+    dao_reconcile_job_statistics(sample_job)
+
+    pipeline = mock_redis.pipeline.return_value
+    pipeline.delete.assert_called_once_with('job-{}-statistics-reconciling'.format(sample_job.id))
+    pipeline.hset.assert_called_once_with(
+        'job-{}-statistics-reconciling'.format(sample_job.id), mapping={'delivered': 2, 'sending': 1, '_complete': 1}
+    )
+    pipeline.rename.assert_called_once_with(
+        'job-{}-statistics-reconciling'.format(sample_job.id), 'job-{}-statistics'.format(sample_job.id)
+    )
+    pipeline.execute.assert_called_once_with()
+
+
+def test_dao_mark_job_statistics_stale_adds_the_jobs_to_the_stale_set(mock_redis, fake_uuid):
+    dao_mark_job_statistics_stale([uuid.UUID(fake_uuid), fake_uuid, None])
+
+    mock_redis.sadd.assert_called_once_with('job-statistics-stale', fake_uuid)
+
+
+def test_dao_mark_job_statistics_stale_does_nothing_without_jobs(mock_redis):
+    dao_mark_job_statistics_stale([None])
+
+    assert not mock_redis.sadd.called
+
+
+@freeze_time('2021-04-29 12:00')
+def test_dao_get_jobs_to_reconcile_returns_recently_finished_and_stale_jobs(sample_template, mock_redis):
+    finished_job = create_job(sample_template, processing_finished=datetime(2021, 4, 29, 11, 40))
+    stale_job = create_job(sample_template, processing_finished=datetime(2021, 4, 25, 11, 0))
+    create_job(sample_template, processing_finished=datetime(2021, 4, 29, 11, 39))
+    create_job(sample_template, processing_finished=None)
+    mock_redis.pipeline.return_value.execute.return_value = [{str(stale_job.id).encode('utf-8')}, 1]
+
+    jobs = dao_get_jobs_to_reconcile(datetime(2021, 4, 29, 11, 40))
+
+    assert sorted(jobs) == sorted([
+        (finished_job.id, sample_template.service_id),
+        (stale_job.id, sample_template.service_id),
+    ])
+    mock_redis.pipeline.return_value.delete.assert_called_once_with('job-statistics-stale')
+
+
+def test_dao_get_jobs_to_reconcile_only_returns_recently_finished_jobs_without_redis(sample_template):
+    finished_job = create_job(sample_template, processing_finished=datetime.utcnow())
+    create_job(sample_template, processing_finished=datetime.utcnow() - timedelta(hours=1))
+
+    jobs = dao_get_jobs_to_reconcile(datetime.utcnow() - timedelta(minutes=20))
+
+    assert jobs == [(finished_job.id, sample_template.service_id)]
+
+
+def test_dao_get_job_statistics_reads_complete_counts_from_redis(sample_job, mock_redis):
+    create_notification(sample_job.template, job=sample_job, status='delivered')
+    mock_redis.hgetall.return_value = {b'_complete': b'1', b'sending': b'3', b'delivered': b'2', b'created': b'0'}
+
+    assert dao_get_job_statistics(sample_job.service_id, sample_job.id) == [(2, 'delivered'), (3, 'sending')]
+    mock_redis.hgetall.assert_called_once_with('job-{}-statistics'.format(sample_job.id))
+
+
+@pytest.mark.parametrize('cached_statistics', [
+    {},
+    # counting started after the job did
+    {b'sending': b'3'},
+])
+def test_dao_get_job_statistics_counts_notifications_without_complete_counts(
+    sample_job, mock_redis, cached_statistics
+):
+    create_notification(sample_job.template, job=sample_job, status='delivered')
+    mock_redis.hgetall.return_value = cached_statistics
+
+    assert dao_get_job_statistics(sample_job.service_id, sample_job.id) == [(1, 'delivered')]
+
+
+@pytest.mark.parametrize('saved_rows, job_size, expected_missing_rows', [
+    (b'\xff\xff', 16, []),
+    (b'\xf8', 5, []),
+    (b'\xd8', 5, [2]),
+    (b'\xff\x7f', 12, [8]),
+    # rows after the last bit that was set
+    (b'\xff', 10, [8, 9]),
+    (b'', 3, [0, 1, 2]),
+])
+def test_find_missing_rows_for_job_reads_the_bitmap(
+    sample_email_template, mock_redis, saved_rows, job_size, expected_missing_rows
+):
+    job = create_job(template=sample_email_template, notification_count=job_size)
+    mock_redis.get.return_value = saved_rows
+
+    assert find_missing_rows_for_job(job.id, job_size) == expected_missing_rows
+    mock_redis.get.assert_called_once_with('job-{}-saved-rows'.format(job.id))
+
+
+def test_find_missing_rows_for_job_ignores_rows_missing_from_the_bitmap_that_were_saved(
+    sample_email_template, mock_redis
+):
+    job = create_job(template=sample_email_template, notification_count=5)
+    create_notification(job=job, job_row_number=2)
+    mock_redis.get.return_value = b'\xc0'
+
+    assert find_missing_rows_for_job(job.id, 5) == [3, 4]
+
+
+def test_find_missing_rows_for_job_checks_notifications_if_there_is_no_bitmap(sample_email_template, mock_redis):
+    job = create_job(template=sample_email_template, notification_count=5)
+    for row_number in [0, 1, 4]:
+        create_notification(job=job, job_row_number=row_number)
+    mock_redis.get.return_value = None
+
+    assert find_missing_rows_for_job(job.id, 5) == [2, 3]
+
+
 def test_unique_key_on_job_id_and_job_row_number(sample_email_template):
     job = create_job(template=sample_email_template)
     create_notification(job=job, job_row_number=0)
@@ -572,3 +745,49 @@ def test_unique_key_on_job_id_and_job_row_number_no_error_if_row_number_for_diff
     job_2 = create_job(template=sample_email_template)
     create_notification(job=job_1, job_row_number=0)
     create_notification(job=job_2, job_row_number=0)
+
+
+def test_dao_get_saved_job_row_numbers(sample_job):
+    other_job = create_job(sample_job.template)
+    for row_number in [0, 3, 4, 6]:
+        create_notification(sample_job.template, job=sample_job, job_row_number=row_number)
+    create_notification(sample_job.template, job=other_job, job_row_number=5)
+
+    assert dao_get_saved_job_row_numbers(sample_job.id, 3, 5) == {3, 4}
+
+
+def test_dao_start_job_resume_counts_the_resumes_shards_and_makes_it_the_latest(mock_redis, fake_uuid):
+    resume_id = dao_start_job_resume(fake_uuid, 3)
+
+    pipeline = mock_redis.pipeline.return_value
+    assert pipeline.set.call_args_list == [
+        call('job-{}-resume-{}-shards'.format(fake_uuid, resume_id), 3, ex=172800),
+        call('job-{}-resume'.format(fake_uuid), resume_id, ex=172800),
+    ]
+    pipeline.execute.assert_called_once_with()
+
+
+@pytest.mark.parametrize('latest_resume_id, expected_shards_remaining', [
+    (b'resume-id', 0),
+    # the job has been resumed again, so the new resume's shards will complete it
+    (b'new-resume-id', None),
+    (None, None),
+])
+def test_dao_finish_job_resume_shard(mock_redis, fake_uuid, latest_resume_id, expected_shards_remaining):
+    pipeline = mock_redis.pipeline.return_value
+    pipeline.execute.return_value = [0, latest_resume_id]
+
+    assert dao_finish_job_resume_shard(fake_uuid, 'resume-id') == expected_shards_remaining
+    pipeline.decr.assert_called_once_with('job-{}-resume-resume-id-shards'.format(fake_uuid))
+    pipeline.get.assert_called_once_with('job-{}-resume'.format(fake_uuid))
+
+
+def test_dao_get_job_shard_progress_only_returns_shards_with_progress(mock_redis, fake_uuid):
+    mock_redis.mget.return_value = [b'9999', None, b'20500']
+
+    assert dao_get_job_shard_progress(fake_uuid, [0, 10000, 20000]) == {0: 9999, 20000: 20500}
+    mock_redis.mget.assert_called_once_with([
+        'job-{}-shard-0-progress'.format(fake_uuid),
+        'job-{}-shard-10000-progress'.format(fake_uuid),
+        'job-{}-shard-20000-progress'.format(fake_uuid),
+    ])
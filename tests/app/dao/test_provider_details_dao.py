@@ -4,7 +4,7 @@ import pytest
 from freezegun import freeze_time
 from sqlalchemy.sql import desc
 
-from app import notification_provider_clients
+from app import db, notification_provider_clients
 from app.dao.provider_details_dao import (
     _adjust_provider_priority,
     _get_sms_providers_for_update,
@@ -243,6 +243,27 @@ def test_reduce_sms_provider_priority_does_nothing_if_providers_have_recently_ch
     assert mock_adjust.called is False
 
 
+def test_reduce_sms_provider_priority_bumps_provider_details_version(mocker, restore_provider_details):
+    mocker.patch('app.dao.provider_details_dao._get_sms_providers_for_update', return_value=[])
+    mock_incr = mocker.patch('app.dao.provider_details_dao.redis_store.incr')
+
+    dao_reduce_sms_provider_priority('firetext', time_threshold=timedelta(minutes=5))
+
+    mock_incr.assert_called_once_with('provider-details-version')
+
+
+def test_update_provider_details_bumps_provider_details_version_after_commit(mocker, restore_provider_details):
+    mmg = get_provider_details_by_identifier('mmg')
+    mmg.active = False
+    calls = mocker.Mock()
+    calls.attach_mock(mocker.patch.object(db.session, 'commit', wraps=db.session.commit), 'commit')
+    calls.attach_mock(mocker.patch('app.dao.provider_details_dao.redis_store.incr'), 'incr')
+
+    dao_update_provider_details(mmg)
+
+    assert calls.mock_calls == [mocker.call.commit(), mocker.call.incr('provider-details-version')]
+
+
 @pytest.mark.parametrize('existing_mmg, existing_firetext, new_mmg, new_firetext', [
     (50, 50, 60, 40),  # not just 50/50 - 60/40 specifically
     (65, 35, 60, 40),  # doesn't overshoot if there's less than 10 difference
@@ -0,0 +1,92 @@
+import pytest
+from freezegun import freeze_time
+
+from app.dao.provider_details_dao import (
+    get_provider_details_by_identifier,
+    get_provider_details_by_notification_type,
+)
+from app.delivery.provider_routing import ProviderRoutingTable, RoutedProvider
+
+
+@pytest.fixture
+def mock_get_providers(mocker):
+    return mocker.patch(
+        'app.delivery.provider_routing.get_provider_details_by_notification_type',
+        wraps=get_provider_details_by_notification_type,
+    )
+
+
+@pytest.fixture
+def mock_get_version(mocker):
+    return mocker.patch('app.delivery.provider_routing.get_provider_details_version', return_value=b'1')
+
+
+def test_get_active_providers_returns_active_providers_with_priorities(restore_provider_details, mock_get_version):
+    mmg = get_provider_details_by_identifier('mmg')
+    firetext = get_provider_details_by_identifier('firetext')
+    mmg.priority, firetext.priority = 30, 70
+    firetext.active = False
+
+    assert ProviderRoutingTable().get_active_providers('sms') == [RoutedProvider('mmg', 30)]
+
+
+def test_get_active_providers_caches_per_notification_type(notify_db_session, mock_get_providers, mock_get_version):
+    routing_table = ProviderRoutingTable()
+
+    for _ in range(3):
+        routing_table.get_active_providers('sms')
+        routing_table.get_active_providers('sms', international=True)
+        routing_table.get_active_providers('email')
+
+    assert mock_get_providers.call_count == 3
+
+
+def test_get_active_providers_checks_version_at_most_once_per_interval(
+    notify_db_session, mock_get_providers, mock_get_version
+):
+    routing_table = ProviderRoutingTable(version_check_interval=1)
+
+    with freeze_time('2021-01-01 12:00:00') as frozen_time:
+        routing_table.get_active_providers('sms')
+        routing_table.get_active_providers('sms')
+        assert mock_get_version.call_count == 1
+
+        frozen_time.tick(2)
+        routing_table.get_active_providers('sms')
+        assert mock_get_version.call_count == 2
+
+    assert mock_get_providers.call_count == 1
+
+
+def test_get_active_providers_reloads_when_version_changes(
+    restore_provider_details, mock_get_providers, mock_get_version
+):
+    routing_table = ProviderRoutingTable(version_check_interval=1)
+
+    with freeze_time('2021-01-01 12:00:00') as frozen_time:
+        assert routing_table.get_active_providers('sms', international=True) == [RoutedProvider('mmg', 100)]
+
+        get_provider_details_by_identifier('mmg').active = False
+        mock_get_version.return_value = b'2'
+        frozen_time.tick(2)
+
+        assert routing_table.get_active_providers('sms', international=True) == []
+
+    assert mock_get_providers.call_count == 2
+
+
+def test_get_active_providers_reloads_after_max_age_without_redis(
+    notify_db_session, mock_get_providers, mock_get_version
+):
+    mock_get_version.return_value = None
+    routing_table = ProviderRoutingTable(version_check_interval=1, max_age=60)
+
+    with freeze_time('2021-01-01 12:00:00') as frozen_time:
+        routing_table.get_active_providers('sms')
+        frozen_time.tick(30)
+        routing_table.get_active_providers('sms')
+        assert mock_get_providers.call_count == 1
+
+        frozen_time.tick(31)
+        routing_table.get_active_providers('sms')
+        assert mock_get_providers.call_count == 2
@@ -12,8 +12,12 @@ from requests import HTTPError
 import app
 from app import firetext_client, mmg_client, notification_provider_clients
 from app.dao import notifications_dao
-from app.dao.provider_details_dao import get_provider_details_by_identifier
-from app.delivery import send_to_providers
+from app.dao.provider_details_dao import (
+    get_provider_details_by_identifier,
+    get_provider_details_by_notification_type,
+)
+from app.delivery import send_to_providers, template_cache
+from app.delivery.provider_routing import RoutedProvider, provider_routing_table
 from app.delivery.send_to_providers import get_html_email_options, get_logo_url
 from app.exceptions import NotificationTechnicalFailureException
 from app.models import (
@@ -41,7 +45,10 @@ from tests.app.db import (
 def setup_function(_function):
     # pytest will run this function before each test. It makes sure the
     # state of the cache is not shared between tests.
-    send_to_providers.provider_cache.clear()
+    provider_routing_table.clear()
+    template_cache.placeholders_cache.clear()
+    template_cache.sms_render_cache.clear()
+    template_cache.email_render_cache.clear()
 
 
 def test_provider_to_use_should_return_random_provider(mocker, notify_db_session):
@@ -49,48 +56,60 @@ def test_provider_to_use_should_return_random_provider(mocker, notify_db_session
     firetext = get_provider_details_by_identifier('firetext')
     mmg.priority = 25
     firetext.priority = 75
-    mock_choices = mocker.patch('app.delivery.send_to_providers.random.choices', return_value=[mmg])
+    mock_choices = mocker.patch(
+        'app.delivery.send_to_providers.random.choices',
+        return_value=[RoutedProvider('mmg', 25)],
+    )
 
     ret = send_to_providers.provider_to_use('sms', international=False)
 
-    mock_choices.assert_called_once_with([mmg, firetext], weights=[25, 75])
+    mock_choices.assert_called_once_with(
+        [RoutedProvider('mmg', 25), RoutedProvider('firetext', 75)],
+        weights=[25, 75],
+    )
     assert ret.get_name() == 'mmg'
 
 
-def test_provider_to_use_should_cache_repeated_calls(mocker, notify_db_session):
+def test_provider_to_use_should_choose_for_each_call_without_querying_again(mocker, notify_db_session):
+    mock_get_providers = mocker.patch(
+        'app.delivery.provider_routing.get_provider_details_by_notification_type',
+        wraps=get_provider_details_by_notification_type,
+    )
     mock_choices = mocker.patch(
         'app.delivery.send_to_providers.random.choices',
         wraps=send_to_providers.random.choices,
     )
 
-    results = [
+    for _ in range(10):
         send_to_providers.provider_to_use('sms', international=False)
-        for _ in range(10)
-    ]
 
-    assert all(result == results[0] for result in results)
-    assert len(mock_choices.call_args_list) == 1
+    assert len(mock_choices.call_args_list) == 10
+    mock_get_providers.assert_called_once_with('sms', False)
 
 
 def test_provider_to_use_should_only_return_mmg_for_international(mocker, notify_db_session):
-    mmg = get_provider_details_by_identifier('mmg')
-    mock_choices = mocker.patch('app.delivery.send_to_providers.random.choices', return_value=[mmg])
+    mock_choices = mocker.patch(
+        'app.delivery.send_to_providers.random.choices',
+        return_value=[RoutedProvider('mmg', 100)],
+    )
 
     ret = send_to_providers.provider_to_use('sms', international=True)
 
-    mock_choices.assert_called_once_with([mmg], weights=[100])
+    mock_choices.assert_called_once_with([RoutedProvider('mmg', 100)], weights=[100])
     assert ret.get_name() == 'mmg'
 
 
 def test_provider_to_use_should_only_return_active_providers(mocker, restore_provider_details):
     mmg = get_provider_details_by_identifier('mmg')
-    firetext = get_provider_details_by_identifier('firetext')
     mmg.active = False
-    mock_choices = mocker.patch('app.delivery.send_to_providers.random.choices', return_value=[firetext])
+    mock_choices = mocker.patch(
+        'app.delivery.send_to_providers.random.choices',
+        return_value=[RoutedProvider('firetext', 0)],
+    )
 
     ret = send_to_providers.provider_to_use('sms')
 
-    mock_choices.assert_called_once_with([firetext], weights=[0])
+    mock_choices.assert_called_once_with([RoutedProvider('firetext', 0)], weights=[0])
     assert ret.get_name() == 'firetext'
 
 
@@ -574,6 +593,18 @@ def test_update_notification_to_sending_does_not_update_status_from_a_final_stat
     assert notification.status == expected_status
 
 
+def test_update_notification_to_sending_caches_reference(sample_email_template, mocker):
+    mock_cache_reference = mocker.patch('app.delivery.send_to_providers.dao_cache_notification_reference')
+    notification = create_notification(template=sample_email_template, reference='ses-reference')
+
+    send_to_providers.update_notification_to_sending(
+        notification,
+        notification_provider_clients.get_client_by_name_and_type("ses", "email")
+    )
+
+    mock_cache_reference.assert_called_once_with(notification)
+
+
 def __update_notification(notification_to_update, research_mode, expected_status):
     if research_mode or notification_to_update.key_type == KEY_TYPE_TEST:
         notification_to_update.status = expected_status
@@ -857,6 +888,23 @@ def test_get_html_email_options_return_email_branding_from_serialised_service(
                              }
 
 
+def test_get_html_email_options_uses_email_branding_from_redis(mocker, sample_service):
+    branding = create_email_branding()
+    sample_service.email_branding = branding
+    service = SerialisedService.from_id(sample_service.id)
+    mocker.patch(
+        'app.redis_store.get',
+        return_value=json.dumps({'data': branding.serialize()}).encode('utf-8'),
+    )
+    mock_get_email_branding = mocker.patch('app.dao.email_branding_dao.dao_get_email_branding_by_id')
+
+    email_options = get_html_email_options(service)
+
+    assert mock_get_email_branding.called is False
+    assert email_options['brand_name'] == branding.name
+    assert email_options['brand_colour'] == branding.colour
+
+
 def test_get_html_email_options_add_email_branding_from_service(sample_service):
     branding = create_email_branding()
     sample_service.email_branding = branding
@@ -869,3 +917,53 @@ def test_get_html_email_options_add_email_branding_from_service(sample_service):
                              'brand_text': branding.text,
                              'brand_name': branding.name,
                              }
+
+
+def test_send_email_to_provider_renders_static_template_once(sample_email_template, mocker):
+    send_mock = mocker.patch('app.aws_ses_client.send_email', return_value='reference')
+    mock_html_email = mocker.patch(
+        'app.delivery.template_cache.HTMLEmailTemplate',
+        wraps=template_cache.HTMLEmailTemplate,
+    )
+
+    for _ in range(2):
+        send_to_providers.send_email_to_provider(create_notification(template=sample_email_template))
+
+    assert mock_html_email.call_count == 1
+    assert send_mock.call_count == 2
+    assert send_mock.call_args_list[0] == send_mock.call_args_list[1]
+    assert send_mock.call_args[0][2] == 'Email Subject'
+    assert send_mock.call_args[1]['body'] == 'This is a template\n'
+
+
+def test_send_email_to_provider_renders_personalised_template_each_time(
+    sample_email_template_with_placeholders, mocker
+):
+    send_mock = mocker.patch('app.aws_ses_client.send_email', return_value='reference')
+
+    for name in ['Jo', 'Sam']:
+        send_to_providers.send_email_to_provider(create_notification(
+            template=sample_email_template_with_placeholders,
+            personalisation={'name': name},
+        ))
+
+    assert [call[0][2] for call in send_mock.call_args_list] == ['Jo', 'Sam']
+    assert len(template_cache.email_render_cache) == 0
+
+
+def test_send_sms_to_provider_renders_static_template_once(sample_template, mocker):
+    send_mock = mocker.patch('app.mmg_client.send_sms')
+    mock_sms_template = mocker.patch(
+        'app.delivery.template_cache.SMSMessageTemplate',
+        wraps=template_cache.SMSMessageTemplate,
+    )
+
+    notifications = [create_notification(template=sample_template) for _ in range(2)]
+    for notification in notifications:
+        send_to_providers.send_sms_to_provider(notification)
+
+    assert mock_sms_template.call_count == 2
+    assert template_cache.sms_render_cache.hits == 1
+    assert template_cache.sms_render_cache.misses == 1
+    assert send_mock.call_args_list[0][1]['content'] == send_mock.call_args_list[1][1]['content']
+    assert [n.billable_units for n in notifications] == [1, 1]
@@ -0,0 +1,188 @@
+from datetime import datetime, timedelta
+
+import pytest
+from freezegun import freeze_time
+
+from app.delivery import sms_delivery_latency
+from app.delivery.sms_delivery_latency import (
+    LATENCY_BUCKETS,
+    DeliveryCounts,
+    DeliverySummary,
+    get_delivery_counts,
+    get_delivery_summary,
+    get_latency_percentile,
+    is_delivery_slow_for_providers,
+    record_sms_delivered,
+    record_sms_failed,
+    record_sms_sent,
+)
+
+
+def _latency_counts(**counts_by_bound):
+    """
+    eg _latency_counts(s30=2) puts two deliveries in the bucket whose upper bound is 30 seconds
+    """
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    for bound, count in counts_by_bound.items():
+        counts[LATENCY_BUCKETS.index(int(bound[1:]))] = count
+    return counts
+
+
+@pytest.fixture
+def mock_pipeline(mocker):
+    mocker.patch.object(sms_delivery_latency.redis_store, 'active', True, create=True)
+    mock_redis = mocker.patch.object(sms_delivery_latency.redis_store, 'redis_store', create=True)
+    return mock_redis.pipeline.return_value
+
+
+def test_record_sms_sent_increments_the_minute_it_was_sent_in(mock_pipeline):
+    record_sms_sent('mmg', datetime(2021, 1, 1, 12, 0, 59))
+
+    mock_pipeline.hincrby.assert_called_once_with('sms-delivery-latency-mmg-2021-01-01T12:00', 'sent', 1)
+    mock_pipeline.expire.assert_called_once_with('sms-delivery-latency-mmg-2021-01-01T12:00', 7200)
+    mock_pipeline.execute.assert_called_once_with()
+
+
+@pytest.mark.parametrize('latency, expected_field', [
+    (timedelta(seconds=0), 'latency-0'),
+    (timedelta(seconds=1), 'latency-1'),
+    (timedelta(seconds=29), 'latency-6'),
+    (timedelta(minutes=4), 'latency-13'),
+    (timedelta(hours=2), 'latency-19'),
+])
+def test_record_sms_delivered_increments_latency_bucket(mock_pipeline, latency, expected_field):
+    sent_at = datetime(2021, 1, 1, 12, 0, 0)
+
+    record_sms_delivered('firetext', sent_at, sent_at + latency)
+
+    mock_pipeline.hincrby.assert_called_once_with('sms-delivery-latency-firetext-2021-01-01T12:00', expected_field, 1)
+
+
+def test_record_sms_failed_increments_failed(mock_pipeline):
+    record_sms_failed('mmg', datetime(2021, 1, 1, 12, 0, 0))
+
+    mock_pipeline.hincrby.assert_called_once_with('sms-delivery-latency-mmg-2021-01-01T12:00', 'failed', 1)
+
+
+def test_record_sms_sent_does_nothing_if_redis_is_not_active(mocker):
+    mocker.patch.object(sms_delivery_latency.redis_store, 'active', False, create=True)
+    mock_redis = mocker.patch.object(sms_delivery_latency.redis_store, 'redis_store', create=True)
+
+    record_sms_sent('mmg', datetime(2021, 1, 1, 12, 0, 0))
+
+    assert mock_redis.pipeline.called is False
+
+
+def test_record_sms_sent_logs_redis_errors(mock_pipeline, mocker):
+    mock_pipeline.execute.side_effect = ConnectionError
+    mock_logger = mocker.patch('app.delivery.sms_delivery_latency.current_app.logger.exception')
+
+    record_sms_sent('mmg', datetime(2021, 1, 1, 12, 0, 0))
+
+    mock_logger.assert_called_once_with('Failed to record sms delivery for sms-delivery-latency-mmg-2021-01-01T12:00')
+
+
+def test_get_delivery_counts_returns_none_if_redis_is_not_active(mocker):
+    mocker.patch.object(sms_delivery_latency.redis_store, 'active', False, create=True)
+    mock_redis = mocker.patch.object(sms_delivery_latency.redis_store, 'redis_store', create=True)
+
+    assert get_delivery_counts('mmg', [datetime(2021, 1, 1, 12, 0)]) is None
+    assert mock_redis.pipeline.called is False
+
+
+def test_get_delivery_counts_returns_none_and_logs_redis_errors(mock_pipeline, mocker):
+    mock_pipeline.execute.side_effect = ConnectionError
+    mock_logger = mocker.patch('app.delivery.sms_delivery_latency.current_app.logger.exception')
+
+    assert get_delivery_counts('mmg', [datetime(2021, 1, 1, 12, 0)]) is None
+    mock_logger.assert_called_once_with('Failed to get sms delivery counts for mmg')
+
+
+def test_is_delivery_slow_for_providers_returns_none_if_delivery_counts_cant_be_read(mocker):
+    mocker.patch('app.delivery.sms_delivery_latency.get_delivery_counts', return_value=None)
+
+    assert is_delivery_slow_for_providers(
+        ['mmg', 'firetext'], threshold=0.3, window=timedelta(minutes=10), delivery_time=timedelta(minutes=4)
+    ) is None
+
+
+@freeze_time('2021-01-01 12:10:30')
+def test_get_delivery_summary_reads_every_minute_in_the_window(mock_pipeline):
+    mock_pipeline.execute.return_value = [{}] * 11
+
+    get_delivery_summary('mmg', window=timedelta(minutes=10), delivery_time=timedelta(minutes=4))
+
+    assert [call[0][0] for call in mock_pipeline.hgetall.call_args_list] == [
+        'sms-delivery-latency-mmg-2021-01-01T12:{:02}'.format(minute) for minute in range(0, 11)
+    ]
+
+
+@freeze_time('2021-01-01 12:10:30')
+def test_get_delivery_summary_counts_slow_and_overdue_notifications(mocker):
+    counts = [DeliveryCounts(0, 0, _latency_counts())] * 11
+    # sent over four minutes ago: 10 sent, 2 failed, 3 delivered quickly, 1 delivered slowly, 4 still waiting
+    counts[2] = DeliveryCounts(10, 2, _latency_counts(s30=3, s300=1))
+    # sent a minute ago: 5 sent, 1 delivered, 4 still waiting but not overdue yet
+    counts[9] = DeliveryCounts(5, 0, _latency_counts(s10=1))
+    mocker.patch('app.delivery.sms_delivery_latency.get_delivery_counts', return_value=counts)
+
+    summary = get_delivery_summary('mmg', window=timedelta(minutes=10), delivery_time=timedelta(minutes=4))
+
+    assert summary.total == 13
+    assert summary.slow == 5
+    assert summary.latency_counts == _latency_counts(s10=1, s30=3, s300=1)
+
+
+@freeze_time('2021-01-01 12:10:30')
+def test_get_delivery_summary_counts_receipts_without_sends(mocker):
+    counts = [DeliveryCounts(0, 0, _latency_counts())] * 11
+    counts[0] = DeliveryCounts(0, 0, _latency_counts(s5=2))
+    mocker.patch('app.delivery.sms_delivery_latency.get_delivery_counts', return_value=counts)
+
+    summary = get_delivery_summary('mmg', window=timedelta(minutes=10), delivery_time=timedelta(minutes=4))
+
+    assert summary == DeliverySummary(total=2, slow=0, latency_counts=_latency_counts(s5=2))
+
+
+@pytest.mark.parametrize('percentile, expected_seconds', [
+    (50, 10),
+    (90, 10),
+    (95, 60),
+    (99, 3600),
+])
+def test_get_latency_percentile(percentile, expected_seconds):
+    latency_counts = _latency_counts(s10=90, s60=5)
+    latency_counts[-1] = 5
+
+    assert get_latency_percentile(latency_counts, percentile) == expected_seconds
+
+
+def test_get_latency_percentile_returns_none_if_nothing_delivered():
+    assert get_latency_percentile(_latency_counts(), 50) is None
+
+
+def test_is_delivery_slow_for_providers(mocker):
+    summaries = {
+        'mmg': DeliverySummary(total=10, slow=3, latency_counts=_latency_counts(s10=7, s300=3)),
+        'firetext': DeliverySummary(total=10, slow=2, latency_counts=_latency_counts(s10=8, s300=2)),
+        'unused': DeliverySummary(total=0, slow=0, latency_counts=_latency_counts()),
+    }
+    mock_get_summary = mocker.patch(
+        'app.delivery.sms_delivery_latency.get_delivery_summary',
+        side_effect=lambda provider, window, delivery_time: summaries[provider],
+    )
+    mock_gauge = mocker.patch('app.delivery.sms_delivery_latency.statsd_client.gauge')
+
+    result = is_delivery_slow_for_providers(
+        providers=['mmg', 'firetext', 'unused'],
+        threshold=0.3,
+        window=timedelta(minutes=10),
+        delivery_time=timedelta(minutes=4),
+    )
+
+    assert result == {'mmg': True, 'firetext': False, 'unused': False}
+    mock_get_summary.assert_any_call('mmg', timedelta(minutes=10), timedelta(minutes=4))
+    mock_gauge.assert_any_call('sms-delivery-latency.mmg.p50', 10)
+    mock_gauge.assert_any_call('sms-delivery-latency.mmg.p95', 300)
+    mock_gauge.assert_any_call('sms-delivery-latency.firetext.p99', 300)
+    assert mock_gauge.call_count == 6
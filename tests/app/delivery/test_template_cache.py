@@ -0,0 +1,125 @@
+import uuid
+
+import pytest
+
+from app.delivery import template_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_template_caches():
+    template_cache.placeholders_cache.clear()
+    template_cache.sms_render_cache.clear()
+    template_cache.email_render_cache.clear()
+
+
+def _template_dict(template_type, content, subject=None, version=1):
+    return {
+        'id': str(uuid.uuid4()),
+        'version': version,
+        'template_type': template_type,
+        'content': content,
+        'subject': subject,
+    }
+
+
+def test_template_render_cache_counts_hits_and_misses(mocker):
+    mock_incr = mocker.patch('app.delivery.template_cache.statsd_client.incr')
+    cache = template_cache.TemplateRenderCache('test', maxsize=2)
+    render = mocker.Mock(return_value='rendered')
+
+    assert cache.get_or_render('key', render) == 'rendered'
+    assert cache.get_or_render('key', render) == 'rendered'
+
+    render.assert_called_once_with()
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert [call[0][0] for call in mock_incr.call_args_list] == [
+        'template-render-cache.test.miss',
+        'template-render-cache.test.hit',
+    ]
+
+
+def test_template_render_cache_is_bounded(mocker):
+    mocker.patch('app.delivery.template_cache.statsd_client.incr')
+    cache = template_cache.TemplateRenderCache('test', maxsize=2)
+
+    for key in range(3):
+        cache.get_or_render(key, lambda: 'rendered')
+
+    assert len(cache) == 2
+
+
+def test_render_sms_caches_static_templates():
+    template_dict = _template_dict('sms', 'Your appointment is tomorrow')
+
+    first = template_cache.render_sms(template_dict, {}, prefix='Service', show_prefix=True)
+    second = template_cache.render_sms(template_dict, {}, prefix='Service', show_prefix=True)
+
+    assert first == second == ('Service: Your appointment is tomorrow', 1)
+    assert template_cache.sms_render_cache.hits == 1
+
+
+def test_render_sms_keys_cache_on_prefix():
+    template_dict = _template_dict('sms', 'Your appointment is tomorrow')
+
+    with_prefix = template_cache.render_sms(template_dict, {}, prefix='Service', show_prefix=True)
+    without_prefix = template_cache.render_sms(template_dict, {}, prefix='Service', show_prefix=False)
+
+    assert with_prefix[0] == 'Service: Your appointment is tomorrow'
+    assert without_prefix[0] == 'Your appointment is tomorrow'
+    assert len(template_cache.sms_render_cache) == 2
+
+
+def test_render_sms_renders_personalised_templates_each_time():
+    template_dict = _template_dict('sms', 'Hello ((name))')
+
+    assert template_cache.render_sms(template_dict, {'name': 'Jo'}, prefix=None, show_prefix=False)[0] == 'Hello Jo'
+    assert template_cache.render_sms(template_dict, {'name': 'Sam'}, prefix=None, show_prefix=False)[0] == 'Hello Sam'
+    assert len(template_cache.sms_render_cache) == 0
+    assert template_cache.placeholders_cache.hits == 1
+
+
+@pytest.mark.parametrize('content, expected_fragment_count', [
+    ('a' * 160, 1),
+    ('a' * 161, 2),
+    ('ŵ' * 70, 1),
+    ('ŵ' * 71, 2),
+])
+def test_sms_fragment_count(content, expected_fragment_count):
+    template_dict = _template_dict('sms', content)
+
+    assert template_cache.sms_fragment_count(
+        template_dict, {}, prefix=None, show_prefix=False
+    ) == expected_fragment_count
+
+
+def test_sms_fragment_count_only_counts_fragments_of_personalised_templates(mocker):
+    mock_render_sms = mocker.patch('app.delivery.template_cache.render_sms')
+    template_dict = _template_dict('sms', 'Hello ((name))')
+
+    assert template_cache.sms_fragment_count(
+        template_dict, {'name': 'a' * 160}, prefix=None, show_prefix=False
+    ) == 2
+    assert mock_render_sms.called is False
+    assert len(template_cache.sms_render_cache) == 0
+
+
+def test_render_email_keys_cache_on_branding():
+    template_dict = _template_dict('email', 'This is a template', subject='Email Subject')
+
+    _, _, govuk_html = template_cache.render_email(
+        template_dict, {}, {'govuk_banner': True, 'brand_banner': False}
+    )
+    _, _, branded_html = template_cache.render_email(
+        template_dict, {}, {
+            'govuk_banner': False,
+            'brand_banner': True,
+            'brand_colour': '#000000',
+            'brand_logo': None,
+            'brand_text': 'Some org',
+            'brand_name': 'Some org',
+        }
+    )
+
+    assert govuk_html != branded_html
+    assert 'Some org' in branded_html
+    assert len(template_cache.email_render_cache) == 2
@@ -241,6 +241,19 @@ def test_post_update_email_branding_updates_field_with_text(admin_request, notif
         assert getattr(email_branding[0], key) == data_update[key]
 
 
+def test_post_update_email_branding_clears_cached_branding(admin_request, notify_db_session, mocker):
+    email_branding = create_email_branding()
+    mock_redis_delete = mocker.patch('app.email_branding.rest.redis_store.delete')
+
+    admin_request.post(
+        'email_branding.update_email_branding',
+        _data={'name': 'new name'},
+        email_branding_id=email_branding.id
+    )
+
+    mock_redis_delete.assert_called_once_with('email_branding-{}'.format(email_branding.id))
+
+
 def test_create_email_branding_reject_invalid_brand_type(admin_request):
     data = {
         'name': 'test email_branding',
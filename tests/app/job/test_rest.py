@@ -8,6 +8,7 @@ import pytz
 from freezegun import freeze_time
 
 import app.celery.tasks
+from app.dao.jobs_dao import JobStatistic
 from app.dao.templates_dao import dao_update_template
 from app.models import JOB_STATUS_PENDING, JOB_STATUS_TYPES
 from tests import create_authorization_header
@@ -636,6 +637,19 @@ def test_get_job_by_id(admin_request, sample_job):
     assert resp_json['data']['created_by']['name'] == 'Test User'
 
 
+def test_get_job_by_id_uses_the_job_statistics(admin_request, mocker, sample_job):
+    mock_dao = mocker.patch('app.job.rest.dao_get_job_statistics', return_value=[
+        JobStatistic(count=2, status='delivered'),
+    ])
+
+    resp_json = admin_request.get(
+        'job.get_job_by_service_and_job_id', service_id=sample_job.service_id, job_id=sample_job.id
+    )
+
+    assert resp_json['data']['statistics'] == [{'status': 'delivered', 'count': 2}]
+    mock_dao.assert_called_once_with(sample_job.service_id, str(sample_job.id))
+
+
 def test_get_job_by_id_should_return_summed_statistics(admin_request, sample_job):
     job_id = str(sample_job.id)
     service_id = sample_job.service.id
@@ -8,6 +8,7 @@ from freezegun import freeze_time
 from moto import mock_s3
 
 from app.letters.utils import (
+    LetterPDFIndex,
     LetterPDFNotFound,
     ScanErrorType,
     find_letter_pdf_in_s3,
@@ -76,6 +77,44 @@ def test_find_letter_pdf_in_s3_raises_if_not_found(sample_notification):
         find_letter_pdf_in_s3(sample_notification)
 
 
+@mock_s3
+def test_letter_pdf_index_finds_letters_by_reference(notify_api, mocker):
+    bucket_name = current_app.config['LETTERS_PDF_BUCKET_NAME']
+    s3 = boto3.client('s3', region_name='eu-west-1')
+    s3.create_bucket(
+        Bucket=bucket_name,
+        CreateBucketConfiguration={'LocationConstraint': 'eu-west-1'}
+    )
+    s3.put_object(Bucket=bucket_name, Key='2020-02-17/NOTIFY.REF1.D.2.C.20200217150000.PDF', Body=b'1')
+    s3.put_object(Bucket=bucket_name, Key='2020-02-17/NOTIFY.REF10.D.2.C.20200217150000.PDF', Body=b'22')
+    s3.put_object(Bucket=bucket_name, Key='2020-02-16/NOTIFY.REF2.D.1.C.20200216150000.PDF', Body=b'333')
+
+    index = LetterPDFIndex(bucket_name)
+    list_folder = mocker.spy(index, '_list_folder')
+
+    assert index.find('ref1', datetime(2020, 2, 17, 15)) == ('2020-02-17/NOTIFY.REF1.D.2.C.20200217150000.PDF', 1)
+    assert index.find('ref10', datetime(2020, 2, 17, 15)) == ('2020-02-17/NOTIFY.REF10.D.2.C.20200217150000.PDF', 2)
+    assert index.find('ref2', datetime(2020, 2, 16, 15)) == ('2020-02-16/NOTIFY.REF2.D.1.C.20200216150000.PDF', 3)
+
+    # each folder is only listed once
+    assert list_folder.call_count == 2
+
+
+@mock_s3
+def test_letter_pdf_index_raises_if_not_found(notify_api):
+    bucket_name = current_app.config['LETTERS_PDF_BUCKET_NAME']
+    s3 = boto3.client('s3', region_name='eu-west-1')
+    s3.create_bucket(
+        Bucket=bucket_name,
+        CreateBucketConfiguration={'LocationConstraint': 'eu-west-1'}
+    )
+    s3.put_object(Bucket=bucket_name, Key='2020-02-16/NOTIFY.REF1.D.2.C.20200216150000.PDF', Body=b'1')
+
+    with pytest.raises(LetterPDFNotFound):
+        # same reference, but a different day's folder
+        LetterPDFIndex(bucket_name).find('ref1', datetime(2020, 2, 17, 15))
+
+
 @pytest.mark.parametrize('created_at,folder', [
     (datetime(2017, 1, 1, 17, 29), '2017-01-01'),
     (datetime(2017, 1, 1, 17, 31), '2017-01-02'),
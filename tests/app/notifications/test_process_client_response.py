@@ -148,6 +148,57 @@ def test_process_sms_client_response_records_statsd_metrics(sample_notification,
     )
 
 
+@freeze_time('2021-01-01 12:00:30')
+def test_process_sms_client_response_records_delivery_latency(sample_notification, mocker):
+    mock_delivered = mocker.patch('app.celery.process_sms_client_response_tasks.record_sms_delivered')
+    mock_failed = mocker.patch('app.celery.process_sms_client_response_tasks.record_sms_failed')
+    sample_notification.status = 'sending'
+    sample_notification.sent_at = datetime(2021, 1, 1, 12, 0, 0)
+
+    process_sms_client_response('0', str(sample_notification.id), 'Firetext')
+
+    mock_delivered.assert_called_once_with('firetext', datetime(2021, 1, 1, 12, 0, 0), datetime(2021, 1, 1, 12, 0, 30))
+    assert mock_failed.called is False
+
+
+def test_process_sms_client_response_records_failed_delivery(sample_notification, mocker):
+    mock_delivered = mocker.patch('app.celery.process_sms_client_response_tasks.record_sms_delivered')
+    mock_failed = mocker.patch('app.celery.process_sms_client_response_tasks.record_sms_failed')
+    sample_notification.status = 'sending'
+    sample_notification.sent_at = datetime.utcnow()
+
+    process_sms_client_response('5', str(sample_notification.id), 'MMG')
+
+    mock_failed.assert_called_once_with('mmg', sample_notification.sent_at)
+    assert mock_delivered.called is False
+
+
+@pytest.mark.parametrize('key_type, sent_at', [
+    ('test', datetime(2021, 1, 1, 12, 0, 0)),
+    ('normal', None),
+])
+def test_process_sms_client_response_does_not_record_delivery_latency(sample_notification, mocker, key_type, sent_at):
+    mock_delivered = mocker.patch('app.celery.process_sms_client_response_tasks.record_sms_delivered')
+    sample_notification.status = 'sending'
+    sample_notification.key_type = key_type
+    sample_notification.sent_at = sent_at
+
+    process_sms_client_response('0', str(sample_notification.id), 'Firetext')
+
+    assert mock_delivered.called is False
+
+
+def test_process_sms_client_response_does_not_record_delivery_latency_for_research_mode(sample_notification, mocker):
+    mock_delivered = mocker.patch('app.celery.process_sms_client_response_tasks.record_sms_delivered')
+    sample_notification.status = 'sending'
+    sample_notification.sent_at = datetime(2021, 1, 1, 12, 0, 0)
+    sample_notification.service.research_mode = True
+
+    process_sms_client_response('0', str(sample_notification.id), 'Firetext')
+
+    assert mock_delivered.called is False
+
+
 def test_process_sms_updates_billable_units_if_zero(sample_notification):
     sample_notification.billable_units = 0
     process_sms_client_response('3', str(sample_notification.id), 'MMG')
@@ -21,6 +21,7 @@ from app.notifications.process_notifications import (
 from app.serialised_models import SerialisedTemplate
 from app.v2.errors import BadRequestError
 from tests.app.db import create_api_key, create_service, create_template
+from tests.conftest import set_config
 
 
 def test_create_content_for_notification_passes(sample_email_template):
@@ -358,6 +359,28 @@ def test_simulated_recipient(notify_api, to_address, notification_type, expected
     assert is_simulated_address == expected
 
 
+def test_simulated_recipient_formats_simulated_numbers_once(notify_api, mocker):
+    mock_format = mocker.patch(
+        'app.notifications.process_notifications.validate_and_format_phone_number',
+        wraps=validate_and_format_phone_number,
+    )
+
+    with set_config(notify_api, 'SIMULATED_SMS_NUMBERS', ('+447700900333', '07700 900444')):
+        assert simulated_recipient('447700900333', 'sms') is True
+        assert simulated_recipient('447700900444', 'sms') is True
+        assert simulated_recipient('447700900000', 'sms') is False
+
+    assert mock_format.call_count == 2
+
+
+def test_simulated_recipient_uses_current_config(notify_api):
+    with set_config(notify_api, 'SIMULATED_EMAIL_ADDRESSES', ('simulate-one@example.com',)):
+        assert simulated_recipient('simulate-one@example.com', 'email') is True
+
+    with set_config(notify_api, 'SIMULATED_EMAIL_ADDRESSES', ('simulate-two@example.com',)):
+        assert simulated_recipient('simulate-one@example.com', 'email') is False
+
+
 @pytest.mark.parametrize('recipient, expected_international, expected_prefix, expected_units', [
     ('7900900123', False, '44', 1),  # UK
     ('+447900900123', False, '44', 1),  # UK
@@ -1,5 +1,8 @@
 from datetime import date
 
+from flask import json, url_for
+
+from tests import create_authorization_header
 from tests.app.db import (
     create_ft_notification_status,
     create_process_time,
@@ -80,3 +83,48 @@ def test_performance_dashboard(sample_service, admin_request):
     assert results["live_service_count"] == 1
     assert results["services_using_notify"][0]["service_name"] == sample_service.name
     assert not results["services_using_notify"][0]["organisation_name"]
+
+
+def test_performance_dashboard_uses_cached_response(admin_request, mocker):
+    # the first get is for the version, the second for the response
+    mocker.patch('app.performance_dashboard.rest.redis_store.get', side_effect=[None, b'{"total_notifications": 1}'])
+    mock_get_stats = mocker.patch('app.performance_dashboard.rest.get_performance_dashboard_stats')
+
+    results = admin_request.get(endpoint="performance_dashboard.get_performance_dashboard",
+                                start_date='2021-03-01',
+                                end_date='2021-03-02')
+
+    assert results == {"total_notifications": 1}
+    assert mock_get_stats.called is False
+
+
+def test_performance_dashboard_caches_response(admin_request, notify_db_session, mocker):
+    mocker.patch('app.performance_dashboard.rest.redis_store.get', side_effect=[b'3', None])
+    mock_redis_set = mocker.patch('app.performance_dashboard.rest.redis_store.set')
+
+    results = admin_request.get(endpoint="performance_dashboard.get_performance_dashboard",
+                                start_date='2021-03-01',
+                                end_date='2021-03-02')
+
+    assert results['total_notifications'] == 0
+    assert mock_redis_set.call_args[0][0] == 'performance-dashboard-3-2021-03-01-2021-03-02'
+    assert json.loads(mock_redis_set.call_args[0][1]) == results
+    assert mock_redis_set.call_args[1] == {'ex': 3600}
+
+
+def test_performance_dashboard_returns_304_if_etag_matches(client, notify_db_session, mocker):
+    mocker.patch(
+        'app.performance_dashboard.rest.redis_store.get',
+        side_effect=[None, b'{"total_notifications": 1}'] * 2
+    )
+    url = url_for('performance_dashboard.get_performance_dashboard', start_date='2021-03-01', end_date='2021-03-02')
+
+    response = client.get(url, headers=[create_authorization_header()])
+    assert response.status_code == 200
+    assert response.headers['ETag']
+
+    response = client.get(
+        url, headers=[create_authorization_header(), ('If-None-Match', response.headers['ETag'])]
+    )
+    assert response.status_code == 304
+    assert response.get_data() == b''
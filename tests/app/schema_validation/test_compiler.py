@@ -0,0 +1,115 @@
+import pytest
+from freezegun import freeze_time
+from jsonschema import Draft7Validator, ValidationError
+
+from app import schema_validation
+from app.schema_validation import build_error_message, format_checker
+from app.schema_validation.compiler import (
+    UnsupportedSchemaError,
+    compile_schema,
+)
+from app.v2.notifications.notification_schemas import (
+    get_notifications_request,
+    post_email_request,
+    post_letter_request,
+    post_sms_request,
+)
+
+TEMPLATE_ID = '2ebe4da8-17be-49fe-b02f-dff2760261a0'
+
+
+def _describe(errors):
+    return [
+        (error.message, list(error.path), list(error.schema_path), str(error.cause) if error.cause else None)
+        for error in errors
+    ]
+
+
+@pytest.mark.parametrize('schema, instance', [
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID}),
+    (post_sms_request, {
+        'phone_number': '07515111111',
+        'template_id': TEMPLATE_ID,
+        'reference': 'reference from caller',
+        'personalisation': {'key': 'value'},
+        'scheduled_for': '2017-05-12 13:15',
+        'sms_sender_id': TEMPLATE_ID,
+    }),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID + '\n'}),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID[4:]}),
+    (post_sms_request, {'template_id': 'notUUID'}),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID, 'personalisation': 'not_a_dict'}),
+    (post_sms_request, {'phone_number': '08515111111', 'template_id': TEMPLATE_ID}),
+    (post_sms_request, {'phone_number': '07515111*11', 'template_id': TEMPLATE_ID}),
+    (post_sms_request, {'phone_number': 7700900001, 'template_id': TEMPLATE_ID}),
+    (post_sms_request, {'phone_number': None, 'template_id': TEMPLATE_ID}),
+    (post_sms_request, {'phone_number': [], 'template_id': TEMPLATE_ID}),
+    (post_sms_request, {'phone_number': {}, 'template_id': TEMPLATE_ID}),
+    (post_sms_request, {'phone_number': '08515111111'}),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': 1234}),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID, 'scheduled_for': None}),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID, 'scheduled_for': '2017-05-12'}),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID, 'scheduled_for': '2017-05-14'}),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID, 'scheduled_for': '2017-31-12'}),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID, 'email_address': 'a@b.com'}),
+    (post_sms_request, {'phone_number': '07515111111', 'template_id': TEMPLATE_ID, 'foo': 1, 'bar': 2, 'baz': 3}),
+    (post_sms_request, {}),
+    (post_sms_request, []),
+    (post_sms_request, 'not an object'),
+    (post_sms_request, None),
+    (post_email_request, {'email_address': 'test@example.gov.uk', 'template_id': TEMPLATE_ID}),
+    (post_email_request, {
+        'email_address': 'test@example.gov.uk',
+        'template_id': TEMPLATE_ID,
+        'reference': 'reference from caller',
+        'personalisation': {'key': 'value'},
+        'email_reply_to_id': TEMPLATE_ID,
+    }),
+    (post_email_request, {'template_id': 'bad_template'}),
+    (post_email_request, {'email_address': 'example', 'template_id': TEMPLATE_ID}),
+    (post_email_request, {'email_address': 'with(brackets)@example.com', 'template_id': TEMPLATE_ID}),
+    (post_email_request, {'email_address': 12345, 'template_id': TEMPLATE_ID}),
+    (post_email_request, {'email_address': 'test@example.gov.uk', 'template_id': TEMPLATE_ID, 'email_reply_to_id': 1}),
+    (post_email_request, {'email_address': 'test@example.gov.uk', 'template_id': TEMPLATE_ID, 'scheduled_for': 1}),
+    (post_letter_request, {'template_id': TEMPLATE_ID, 'personalisation': {'address_line_1': 'Her Majesty'}}),
+    (post_letter_request, {'template_id': TEMPLATE_ID}),
+    (post_letter_request, {'personalisation': 'not a dict', 'reference': None}),
+    (post_letter_request, {'template_id': TEMPLATE_ID, 'personalisation': {}, 'postage': 'first'}),
+])
+@freeze_time('2017-05-12 13:00:00')
+def test_compiled_validator_gives_the_same_errors_as_jsonschema(schema, instance):
+    expected = list(Draft7Validator(schema, format_checker=format_checker).iter_errors(instance))
+    actual = compile_schema(schema, format_checker)(instance)
+
+    assert _describe(actual) == _describe(expected)
+    if expected:
+        assert build_error_message(actual) == build_error_message(expected)
+
+
+@pytest.mark.parametrize('schema', [
+    get_notifications_request,
+    {'type': 'object', 'patternProperties': {'^a': {'type': 'string'}}},
+    {'type': 'object', 'additionalProperties': {'type': 'string'}},
+    {'type': 'date'},
+])
+def test_compile_schema_rejects_unsupported_schemas(schema):
+    with pytest.raises(UnsupportedSchemaError):
+        compile_schema(schema, format_checker)
+
+
+@pytest.mark.parametrize('compiled_schema_validation, expected_compiled', [
+    (True, True),
+    (False, False),
+])
+def test_init_app_compiles_schemas_if_enabled(notify_api, mocker, compiled_schema_validation, expected_compiled):
+    mocker.patch.dict(schema_validation.compiled_validators, clear=True)
+    mock_draft7_validator = mocker.patch('app.schema_validation.Draft7Validator', wraps=Draft7Validator)
+
+    mocker.patch.dict(notify_api.config, {'COMPILED_SCHEMA_VALIDATION': compiled_schema_validation})
+
+    schema_validation.init_app(notify_api, schemas=[post_sms_request])
+
+    with pytest.raises(ValidationError):
+        schema_validation.validate({}, post_sms_request)
+
+    assert mock_draft7_validator.called is not expected_compiled
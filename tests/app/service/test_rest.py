@@ -2,6 +2,7 @@ import json
 import uuid
 from datetime import date, datetime, timedelta
 from unittest.mock import ANY
+from urllib.parse import parse_qs, urlparse
 
 import pytest
 from flask import current_app, url_for
@@ -1881,6 +1882,60 @@ def test_get_notifications_for_service_without_page_count(
     assert resp['notifications'][0]['id'] == str(without_job.id)
 
 
+def test_get_notifications_for_service_by_cursor(admin_request, sample_template):
+    older = create_notification(sample_template, created_at=datetime(2021, 4, 1, 12, 0))
+    newer = create_notification(sample_template, created_at=datetime(2021, 4, 1, 12, 1))
+
+    first_page = admin_request.get(
+        'service.get_all_notifications_for_service',
+        service_id=sample_template.service_id,
+        page_size=1,
+        cursor='',
+    )
+    assert [n['id'] for n in first_page['notifications']] == [str(newer.id)]
+    assert first_page['total'] is None
+    assert 'cursor=' in first_page['links']['next']
+
+    cursor = parse_qs(urlparse(first_page['links']['next']).query)['cursor'][0]
+    second_page = admin_request.get(
+        'service.get_all_notifications_for_service',
+        service_id=sample_template.service_id,
+        page_size=1,
+        cursor=cursor,
+    )
+    assert [n['id'] for n in second_page['notifications']] == [str(older.id)]
+    assert second_page['links'] == {}
+
+
+def test_get_notifications_for_service_by_cursor_keeps_filters_in_next_link(admin_request, sample_template):
+    create_notification(sample_template)
+    create_notification(sample_template)
+
+    resp = admin_request.get(
+        'service.get_all_notifications_for_service',
+        service_id=sample_template.service_id,
+        page_size=1,
+        limit_days=7,
+        include_jobs=False,
+        cursor='',
+    )
+
+    next_link_args = parse_qs(urlparse(resp['links']['next']).query)
+    assert next_link_args['page_size'] == ['1']
+    assert next_link_args['limit_days'] == ['7']
+    assert next_link_args['include_jobs'] == ['False']
+
+
+def test_get_notifications_for_service_by_cursor_rejects_invalid_cursor(admin_request, sample_template):
+    resp = admin_request.get(
+        'service.get_all_notifications_for_service',
+        service_id=sample_template.service_id,
+        cursor='not-a-cursor',
+        _expected_status=400
+    )
+    assert resp['message'] == {'cursor': ['Invalid cursor']}
+
+
 @pytest.mark.parametrize('should_prefix', [
     True,
     False,
@@ -2856,6 +2911,22 @@ def test_update_service_reply_to_email_address(admin_request, sample_service):
     assert response['data'] == results[0].serialize()
 
 
+def test_update_service_reply_to_email_address_clears_cached_reply_to(admin_request, sample_service, mocker):
+    reply_to = create_reply_to_email(service=sample_service, email_address="some@email.com")
+    mock_redis_delete = mocker.patch('app.service.rest.redis_store.delete')
+
+    admin_request.post(
+        'service.update_service_reply_to_email_address',
+        service_id=sample_service.id,
+        reply_to_email_id=reply_to.id,
+        _data={"email_address": "changed@reply.com", "is_default": True},
+    )
+
+    mock_redis_delete.assert_called_once_with(
+        'service-{}-email-reply-to-{}'.format(sample_service.id, reply_to.id)
+    )
+
+
 def test_update_service_reply_to_email_address_returns_400_when_no_default(admin_request, sample_service):
     original_reply_to = create_reply_to_email(service=sample_service, email_address="some@email.com")
     data = {"email_address": "changed@reply.com", "is_default": False}
@@ -3101,6 +3172,23 @@ def test_delete_service_letter_contact_can_archive_letter_contact(admin_request,
     assert letter_contact.archived is True
 
 
+def test_delete_service_letter_contact_clears_cached_letter_contact(admin_request, notify_db_session, mocker):
+    service = create_service()
+    create_letter_contact(service=service, contact_block='Edinburgh, ED1 1AA')
+    letter_contact = create_letter_contact(service=service, contact_block='Swansea, SN1 3CC', is_default=False)
+    mock_redis_delete = mocker.patch('app.service.rest.redis_store.delete')
+
+    admin_request.post(
+        'service.delete_service_letter_contact',
+        service_id=service.id,
+        letter_contact_id=letter_contact.id,
+    )
+
+    mock_redis_delete.assert_called_once_with(
+        'service-{}-letter-contact-{}'.format(service.id, letter_contact.id)
+    )
+
+
 def test_delete_service_letter_contact_returns_200_if_archiving_template_default(admin_request, notify_db_session):
     service = create_service()
     create_letter_contact(service=service, contact_block='Edinburgh, ED1 1AA')
@@ -3238,6 +3326,24 @@ def test_update_service_sms_sender(client, notify_db_session):
     assert not resp_json['is_default']
 
 
+@pytest.mark.parametrize('endpoint, data', [
+    ('service.update_service_sms_sender', {"sms_sender": 'second', "is_default": False}),
+    ('service.delete_service_sms_sender', None),
+])
+def test_update_and_archive_service_sms_sender_clear_cached_sms_sender(
+    admin_request, notify_db_session, mocker, endpoint, data
+):
+    service = create_service()
+    service_sms_sender = create_service_sms_sender(service=service, sms_sender='1235', is_default=False)
+    mock_redis_delete = mocker.patch('app.service.rest.redis_store.delete')
+
+    admin_request.post(endpoint, service_id=service.id, sms_sender_id=service_sms_sender.id, _data=data)
+
+    mock_redis_delete.assert_called_once_with(
+        'service-{}-sms-sender-{}'.format(service.id, service_sms_sender.id)
+    )
+
+
 def test_update_service_sms_sender_switches_default(client, notify_db_session):
     service = create_service_with_defined_sms_sender(sms_sender_value='first')
     service_sms_sender = create_service_sms_sender(service=service, sms_sender='1235', is_default=False)
@@ -4,6 +4,9 @@ from datetime import date, datetime
 import pytest
 from freezegun import freeze_time
 
+from app.dao.fact_notification_status_dao import (
+    update_fact_template_usage_intraday,
+)
 from app.models import (
     EMAIL_TYPE,
     KEY_TYPE_NORMAL,
@@ -28,6 +31,7 @@ def test_get_template_usage_by_month_returns_correct_data(
 ):
     create_ft_notification_status(bst_date=date(2017, 4, 2), template=sample_template, count=3)
     create_notification(sample_template, created_at=datetime.utcnow())
+    update_fact_template_usage_intraday()
 
     resp_json = admin_request.get(
         'service.get_monthly_template_usage',
@@ -64,6 +68,7 @@ def test_get_template_usage_by_month_returns_two_templates(admin_request, sample
     create_ft_notification_status(bst_date=datetime(2017, 4, 1), template=template_one, count=1)
     create_ft_notification_status(bst_date=datetime(2017, 4, 1), template=sample_template, count=3)
     create_notification(sample_template, created_at=datetime.utcnow())
+    update_fact_template_usage_intraday()
 
     resp_json = admin_request.get(
         'service.get_monthly_template_usage',
@@ -5,6 +5,9 @@ from unittest.mock import Mock
 import pytest
 from freezegun import freeze_time
 
+from app.dao.fact_notification_status_dao import (
+    update_fact_template_usage_intraday,
+)
 from app.utils import DATETIME_FORMAT
 from tests.app.db import create_ft_notification_status, create_notification
 
@@ -46,6 +49,8 @@ def test_get_template_statistics_for_service_by_day_with_bad_arg_returns_400(adm
 
 
 def test_get_template_statistics_for_service_by_day_returns_template_info(admin_request, mocker, sample_notification):
+    update_fact_template_usage_intraday()
+
     json_resp = admin_request.get(
         'template_statistics.get_template_statistics_for_service_by_day',
         service_id=sample_notification.service_id,
@@ -68,6 +73,8 @@ def test_get_template_statistics_for_service_by_day_accepts_old_query_string(
     sample_notification,
     var_name
 ):
+    update_fact_template_usage_intraday()
+
     json_resp = admin_request.get(
         'template_statistics.get_template_statistics_for_service_by_day',
         service_id=sample_notification.service_id,
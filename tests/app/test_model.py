@@ -170,6 +170,38 @@ def test_notification_personalisation_setter_always_sets_empty_dict(input_value)
     assert noti._personalisation == encryption.encrypt({})
 
 
+def test_notification_personalisation_getter_decrypts_once(mocker):
+    noti = Notification()
+    noti.personalisation = {'name': 'Jo'}
+    mock_decrypt = mocker.patch('app.models.encryption.decrypt', return_value={'name': 'Jo'})
+
+    assert noti.personalisation == {'name': 'Jo'}
+    assert noti.personalisation == {'name': 'Jo'}
+
+    mock_decrypt.assert_called_once_with(noti._personalisation)
+
+
+def test_notification_personalisation_getter_returns_a_copy():
+    noti = Notification()
+    noti.personalisation = {'name': 'Jo'}
+
+    noti.personalisation['name'] = 'Sam'
+
+    assert noti.personalisation == {'name': 'Jo'}
+
+
+def test_notification_personalisation_setter_replaces_cached_value():
+    noti = Notification()
+    noti.personalisation = {'name': 'Jo'}
+    assert noti.personalisation == {'name': 'Jo'}
+
+    noti.personalisation = {'name': 'Sam'}
+    assert noti.personalisation == {'name': 'Sam'}
+
+    noti._personalisation = encryption.encrypt({'name': 'Alex'})
+    assert noti.personalisation == {'name': 'Alex'}
+
+
 def test_notification_subject_is_none_for_sms(sample_service):
     template = create_template(service=sample_service, template_type=SMS_TYPE)
     notification = create_notification(template=template)
@@ -183,6 +215,27 @@ def test_notification_subject_fills_in_placeholders(sample_service, template_typ
     assert notification.subject == 'hello'
 
 
+def test_notification_serialize_renders_template_once(sample_service, mocker):
+    template = create_template(
+        service=sample_service, template_type=EMAIL_TYPE, subject='Hi ((name))', content='Dear ((name))'
+    )
+    notification = create_notification(template=template, personalisation={'name': 'Jo'})
+    mock_decrypt = mocker.patch('app.models.encryption.decrypt', wraps=encryption.decrypt)
+    mock_render = mocker.patch.object(
+        type(notification.template),
+        '_as_utils_template_with_personalisation',
+        autospec=True,
+        side_effect=type(notification.template)._as_utils_template_with_personalisation,
+    )
+
+    res = notification.serialize()
+
+    assert res['body'] == 'Dear Jo'
+    assert res['subject'] == 'Hi Jo'
+    assert mock_render.call_count == 1
+    assert mock_decrypt.call_count <= 1
+
+
 def test_letter_notification_serializes_with_address(client, sample_letter_notification):
     sample_letter_notification.personalisation = {
         'address_line_1': 'foo',
@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy.orm.exc import NoResultFound
+
+from app.dao import service_sms_sender_dao, templates_dao
+from app.models import LETTER_TYPE, PRECOMPILED_TEMPLATE_NAME
+from app.serialised_models import (
+    SerialisedService,
+    SerialisedServiceEmailReplyTo,
+    SerialisedServiceLetterContact,
+    SerialisedServiceSmsSender,
+    SerialisedTemplateNameCollection,
+)
+from tests.app.db import (
+    create_letter_contact,
+    create_reply_to_email,
+    create_service,
+    create_service_sms_sender,
+    create_template,
+)
+
+
+def test_service_from_id_caches_uuids_and_strings_together(sample_service, mocker):
+    mock_get_dict = mocker.patch(
+        'app.serialised_models.SerialisedService.get_dict',
+        wraps=SerialisedService.get_dict,
+    )
+
+    SerialisedService.from_id(sample_service.id)
+    SerialisedService.from_id(str(sample_service.id))
+
+    mock_get_dict.assert_called_once_with(str(sample_service.id))
+
+
+def test_sms_sender_from_id_is_cached_in_memory(sample_service, mocker):
+    sms_sender = create_service_sms_sender(service=sample_service, sms_sender='07700900123', is_default=False)
+    mock_dao = mocker.spy(service_sms_sender_dao, 'dao_get_service_sms_senders_by_id')
+
+    for _ in range(3):
+        assert SerialisedServiceSmsSender.from_id(sample_service.id, str(sms_sender.id)).sms_sender == '07700900123'
+
+    mock_dao.assert_called_once_with(str(sample_service.id), str(sms_sender.id))
+
+
+def test_email_reply_to_from_id(sample_service):
+    reply_to = create_reply_to_email(service=sample_service, email_address='reply@example.com')
+
+    assert SerialisedServiceEmailReplyTo.from_id(
+        sample_service.id, reply_to.id
+    ).email_address == 'reply@example.com'
+
+
+def test_letter_contact_from_id(sample_service):
+    letter_contact = create_letter_contact(service=sample_service, contact_block='Swansea, SN1 3CC')
+
+    assert SerialisedServiceLetterContact.from_id(
+        sample_service.id, letter_contact.id
+    ).contact_block == 'Swansea, SN1 3CC'
+
+
+def test_sms_sender_from_id_raises_for_archived_sms_sender(sample_service):
+    sms_sender = create_service_sms_sender(service=sample_service, sms_sender='07700900123', is_default=False)
+    sms_sender.archived = True
+
+    with pytest.raises(NoResultFound):
+        SerialisedServiceSmsSender.from_id(sample_service.id, sms_sender.id)
+
+
+def test_template_names_are_cached_in_memory(notify_db_session, mocker):
+    service = create_service()
+    template = create_template(service, template_name='one')
+    precompiled = create_template(service, template_type=LETTER_TYPE, template_name=PRECOMPILED_TEMPLATE_NAME,
+                                  hidden=True)
+    mock_dao = mocker.spy(templates_dao, 'dao_get_template_names_for_service')
+
+    for _ in range(3):
+        templates = SerialisedTemplateNameCollection.from_service_id(service.id, {template.id}).by_id
+
+    assert templates[template.id].name == 'one'
+    assert templates[template.id].is_precompiled_letter is False
+    assert templates[precompiled.id].is_precompiled_letter is True
+    mock_dao.assert_called_once_with(service.id)
+
+
+def test_template_names_are_fetched_again_for_a_new_template(notify_db_session, mocker):
+    service = create_service()
+    create_template(service, template_name='one')
+    SerialisedTemplateNameCollection.from_service_id(service.id)
+
+    template = create_template(service, template_name='two')
+    mock_dao = mocker.spy(templates_dao, 'dao_get_template_names_for_service')
+
+    assert SerialisedTemplateNameCollection.from_service_id(service.id, {template.id}).by_id[template.id].name == 'two'
+    assert SerialisedTemplateNameCollection.from_service_id(service.id, {template.id}).by_id[template.id].name == 'two'
+    mock_dao.assert_called_once_with(service.id)
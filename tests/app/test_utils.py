@@ -1,3 +1,4 @@
+import uuid
 from datetime import date, datetime
 
 import pytest
@@ -5,6 +6,8 @@ from freezegun import freeze_time
 
 from app.models import Notification, NotificationHistory
 from app.utils import (
+    decode_cursor,
+    encode_cursor,
     format_sequential_number,
     get_london_midnight_in_utc,
     get_midnight_for_day_before,
@@ -103,3 +106,19 @@ def test_get_notification_table_to_use_checks_service_data_retention(sample_serv
 
 def test_format_sequential_number():
     assert format_sequential_number(123) == '0000007b'
+
+
+def test_encode_cursor_round_trips():
+    cursor = (datetime(2021, 4, 1, 12, 30, 5, 123456), uuid.uuid4())
+
+    assert decode_cursor(encode_cursor(cursor)) == cursor
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64 !',
+    'bm90IGEgY3Vyc29y',  # "not a cursor"
+    'MjAyMS0wNC0wMSAxMjozMDowNS4xMjM0NTZ8bm90LWEtdXVpZA==',  # valid date, invalid uuid
+])
+def test_decode_cursor_raises_for_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)